@@ -0,0 +1,71 @@
+import json
+
+# 默认允许的相对波动；基线文件里的 "tolerance" 可以按指标名覆盖
+DEFAULT_TOLERANCE = 0.2
+
+# 新建基线文件时写入的容差；过载的多面板用例里延迟抖动很大，放宽一些。
+# 帧队列交接的吞吐取决于两个线程交替的时机，同一台单核机器上几秒之内就能在
+# 7 万到 16 万项/秒之间变化，多测几次取最好的也会落进慢的时段，只拦明显的退化
+INITIAL_TOLERANCES = {
+    "default": DEFAULT_TOLERANCE,
+    "panels_latency_ms": 0.5,
+    "queue_items_per_s": 0.6,
+    "queue_handoff_ms": 1.0,
+}
+
+# 数值很小时相对波动没有意义，变化不超过这些绝对值的不算退化
+ABSOLUTE_FLOOR = {
+    "_ms": 0.5,
+    "_ratio": 0.02,
+    "_cores": 0.05,
+}
+
+
+def lower_is_better(metric):
+    return metric.endswith(("_ms", "_ratio", "_cores"))
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def tolerance_for(baseline, metric, override=None):
+    tolerances = baseline.get("tolerance", {})
+    if metric in tolerances:
+        return tolerances[metric]
+    if override is not None:
+        return override
+    return tolerances.get("default", DEFAULT_TOLERANCE)
+
+
+def compare(results, baseline, tolerance=None):
+    """
+    逐项与基线比较，返回 [(用例, 指标, 基线值, 当前值, 变化比例, 是否退化)]。
+    只比较两边都有的用例和指标。
+    """
+    rows = []
+    base_results = baseline.get("results", {})
+    for case, metrics in sorted(results.items()):
+        base = base_results.get(case)
+        if base is None:
+            continue
+        for metric, value in sorted(metrics.items()):
+            if metric not in base:
+                continue
+            ref = base[metric]
+            tol = tolerance_for(baseline, metric, tolerance)
+            change = (value - ref) / ref if ref else 0.0
+            floor = next((v for suffix, v in ABSOLUTE_FLOOR.items() if metric.endswith(suffix)), 0.0)
+            if lower_is_better(metric):
+                regressed = value > ref * (1 + tol) and value - ref > floor
+            else:
+                regressed = value < ref * (1 - tol)
+            rows.append((case, metric, ref, value, change, regressed))
+    return rows
@@ -0,0 +1,208 @@
+"""
+合成阶段的基准：没有显示器时用 QOffscreenSurface + FBO 作为渲染目标，
+分别驱动 MultiVideoWindow 的上传/网格合成和 VideoPanel 的 paintGL，
+N 路合成画面同时刷新，统计上传吞吐、每帧绘制耗时和每秒合成的帧数。
+
+没有 GPU 的 Linux 上用 Mesa llvmpipe 即可；offscreen 平台建不出 GL 上下文时
+（例如 Qt 的 offscreen 插件没有可用的 GLX），在 xvfb-run 下运行。
+"""
+import math
+import time
+
+import av
+from OpenGL import GL
+
+from benchmarks import media
+from player.video_decoder import frame_to_planar
+
+MB = 1024 * 1024
+
+# 合成目标（相当于一块 1080p 屏幕）
+CANVAS = (1920, 1080)
+# 每路轮流使用的合成帧数，保证每次上传的内容都不同
+FRAME_VARIANTS = 3
+WARMUP_FRAMES = 3
+# 每个用例最多计时这么多秒（大画面数 × 高分辨率时 llvmpipe 很慢）
+MAX_SECONDS = 10.0
+
+
+class GLTarget:
+    """离屏渲染目标：3.3 core 上下文 + QOffscreenSurface + 一个 FBO"""
+    def __init__(self):
+        from PySide6.QtGui import QOpenGLContext, QOffscreenSurface, QSurfaceFormat
+
+        fmt = QSurfaceFormat()
+        fmt.setVersion(3, 3)
+        fmt.setProfile(QSurfaceFormat.CoreProfile)
+        self.context = QOpenGLContext()
+        self.context.setFormat(fmt)
+        if not self.context.create():
+            raise RuntimeError("cannot create an OpenGL context")
+        self.surface = QOffscreenSurface()
+        self.surface.setFormat(self.context.format())
+        self.surface.create()
+        if not self.surface.isValid() or not self.context.makeCurrent(self.surface):
+            raise RuntimeError("cannot make the offscreen surface current")
+        self.fbo = None
+        renderer = GL.glGetString(GL.GL_RENDERER)
+        self.renderer = renderer.decode() if renderer else "unknown"
+
+    def bind(self, width, height):
+        """让上下文处于当前状态，并绑定 width × height 的 FBO"""
+        from PySide6.QtOpenGL import QOpenGLFramebufferObject
+
+        self.context.makeCurrent(self.surface)
+        if self.fbo is None or (self.fbo.width(), self.fbo.height()) != (width, height):
+            self.fbo = QOpenGLFramebufferObject(width, height)
+        self.fbo.bind()
+        GL.glViewport(0, 0, width, height)
+
+    def release(self):
+        if self.fbo is not None:
+            self.fbo.release()
+            self.fbo = None
+        self.context.doneCurrent()
+
+
+def open_target():
+    """建不出 GL 上下文时返回 None"""
+    try:
+        return GLTarget()
+    except RuntimeError as e:
+        print(f"[bench] compositor: {e}")
+        return None
+
+
+def grid(count):
+    """画面数对应的网格（列, 行）"""
+    cols = math.ceil(math.sqrt(count))
+    return cols, math.ceil(count / cols)
+
+
+def _rgb_frames(width, height):
+    return [media.pattern(width, height, i * 10) for i in range(FRAME_VARIANTS)]
+
+
+def _planar_frames(width, height):
+    frames = []
+    for img in _rgb_frames(width, height):
+        frame = av.VideoFrame.from_ndarray(img, format="rgb24").reformat(format="yuv420p")
+        frames.append(frame_to_planar(frame))
+    return frames
+
+
+def _measure(draw_frame, frame_bytes, frames):
+    """
+    draw_frame(i) 合成一帧并返回 (上传耗时, 总耗时)，总耗时包含 glFinish。
+    预热几帧后最多计时 frames 帧或 MAX_SECONDS 秒。
+    """
+    for i in range(WARMUP_FRAMES):
+        draw_frame(i)
+    upload = total = 0.0
+    count = 0
+    start = time.perf_counter()
+    while count < frames and time.perf_counter() - start < MAX_SECONDS:
+        u, t = draw_frame(WARMUP_FRAMES + count)
+        upload += u
+        total += t
+        count += 1
+    return {
+        "compositor_fps": count / total,
+        "compositor_frame_ms": total / count * 1000,
+        "compositor_upload_ms": upload / count * 1000,
+        "compositor_draw_ms": (total - upload) / count * 1000,
+        "compositor_upload_mb_per_s": frame_bytes * count / MB / upload if upload else 0.0,
+    }
+
+
+def bench_window(target, res, tiles, frames):
+    """
+    MultiVideoWindow：每帧把 tiles 路 RGB 数据经各自的 PBO 环上传到纹理数组，
+    再调用 composite() 一次实例化绘制画到 FBO 上。
+    """
+    from player.player_window import MultiVideoWindow
+
+    width, height = media.RESOLUTIONS[res]
+    # 与 push_frame 一样以 bytes 传入
+    sources = [img.tobytes() for img in _rgb_frames(width, height)]
+    window = MultiVideoWindow(tiles)
+    target.bind(*CANVAS)
+    window.initializeGL()
+
+    def draw_frame(i):
+        t0 = time.perf_counter()
+        for view in range(tiles):
+            window.upload_view(view, sources[(i + view) % len(sources)], width, height, "RGB")
+        t1 = time.perf_counter()
+        window.composite(*CANVAS)
+        GL.glFinish()
+        return t1 - t0, time.perf_counter() - t0
+
+    try:
+        return _measure(draw_frame, tiles * width * height * 3, frames)
+    finally:
+        for streamer in list(window.streamers.values()) + [window._streamer]:
+            streamer.release()
+        window.compositor.release()
+        GL.glDeleteTextures([window._texture_id])
+        window.deleteLater()
+
+
+def bench_panel(app, target, res, tiles, upload_format, frames):
+    """
+    VideoPanel：tiles 个面板按网格各占 FBO 的一块（相当于各自的窗口区域），
+    每帧换上新的合成帧后依次执行 paintGL。上传耗时取面板自己的统计计时。
+    """
+    from PySide6.QtCore import QEvent
+    from player.video_panel import VideoPanel
+    from player.telemetry import Telemetry
+
+    width, height = media.RESOLUTIONS[res]
+    path = media.ensure_clip("h264", res, "short", 1)
+    cfg = {"shared_decode": False, "loop_cache_seconds": 0,
+           "upload_format": upload_format, "decode_scale": "native"}
+    panels = [VideoPanel(path, dict(cfg), None, None, 1) for _ in range(tiles)]
+    # 只测绘制路径：停掉解码，画面由这里直接换上
+    for panel in panels:
+        panel.stop()
+    enabled, Telemetry.enabled = Telemetry.enabled, True
+
+    sources = _planar_frames(width, height) if upload_format == "yuv" else _rgb_frames(width, height)
+    frame_bytes = tiles * sources[0].nbytes
+    cols, rows = grid(tiles)
+    tile_w, tile_h = CANVAS[0] // cols, CANVAS[1] // rows
+    target.bind(*CANVAS)
+    for panel in panels:
+        panel.resize(tile_w, tile_h)
+        panel.initializeGL()
+    # paintGL 会清屏，限制在各自的格子里
+    GL.glEnable(GL.GL_SCISSOR_TEST)
+
+    def draw_frame(i):
+        t0 = time.perf_counter()
+        for k, panel in enumerate(panels):
+            x, y = (k % cols) * tile_w, (rows - 1 - k // cols) * tile_h
+            GL.glViewport(x, y, tile_w, tile_h)
+            GL.glScissor(x, y, tile_w, tile_h)
+            panel._frame = sources[(i + k) % len(sources)]
+            panel.paintGL()
+        GL.glFinish()
+        total = time.perf_counter() - t0
+        upload = 0.0
+        for panel in panels:
+            avg, _, count = panel.timings.take().get("upload", (0.0, 0.0, 0))
+            upload += avg * count
+        return upload, total
+
+    try:
+        return _measure(draw_frame, frame_bytes, frames)
+    finally:
+        GL.glDisable(GL.GL_SCISSOR_TEST)
+        Telemetry.enabled = enabled
+        for panel in panels:
+            panel._frame = None
+            panel._uploader.release()
+            GL.glDeleteTextures([panel._texture_id] + panel._plane_textures)
+            panel.deleteLater()
+        # 着色器程序随面板销毁，需在上下文仍为当前时处理
+        app.sendPostedEvents(None, QEvent.DeferredDelete)
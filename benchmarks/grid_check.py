@@ -0,0 +1,256 @@
+"""
+MultiVideoWindow 网格合成（GridCompositor）的正确性检查：在离屏帧缓冲上画出
+每路纯色的画面，读回像素逐格核对颜色和宽高比留边，覆盖纹理数组扩容、多种尺寸
+分组各自一批绘制、画面换尺寸换组、空出的层被复用、整组移除等情况。
+
+    python -m benchmarks.grid_check           # 只做检查，有错时退出码为 1
+    python -m benchmarks.grid_check --perf    # 再按 compositor 阶段的指标测一遍上传/合成
+
+不经过 Qt 的窗口系统：用 EGL surfaceless 直接建 3.3 core 上下文（Mesa llvmpipe 即可），
+没有显示器、也没有 Xvfb 的机器上也能跑。Qt 此时没有当前上下文，QOpenGLShaderProgram
+用不了，着色器改由 PyOpenGL 编译，其余（上传、纹理数组、实例化绘制）都是原来的代码。
+"""
+import os
+import sys
+import argparse
+
+# 必须在导入 OpenGL 之前设置
+os.environ["PYOPENGL_PLATFORM"] = "egl"
+os.environ.setdefault("EGL_PLATFORM", "surfaceless")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import time
+import numpy as np
+from OpenGL import EGL, GL
+from OpenGL.GL import shaders
+
+from benchmarks import media
+from benchmarks.compositor import CANVAS, _measure
+from player import grid_compositor
+from player.gl_upload import PBOStreamer
+
+# 与 MultiVideoWindow 一样，每路一条 2 块 PBO 的上传环
+STREAMER_PBOS = 2
+# 像素比较允许的误差（线性过滤 + 纯色，理论上应为 0）
+COLOR_TOLERANCE = 2
+
+
+def egl_context():
+    """建一个 surfaceless 的 3.3 core 上下文并设为当前，返回渲染器名称"""
+    display = EGL.eglGetDisplay(EGL.EGL_DEFAULT_DISPLAY)
+    if not EGL.eglInitialize(display, None, None):
+        raise RuntimeError("cannot initialize EGL")
+    EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+    attribs = (EGL.EGLint * 7)(EGL.EGL_CONTEXT_MAJOR_VERSION, 3,
+                               EGL.EGL_CONTEXT_MINOR_VERSION, 3,
+                               EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+                               EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT,
+                               EGL.EGL_NONE)
+    context = EGL.eglCreateContext(display, EGL.EGLConfig(), EGL.EGL_NO_CONTEXT, attribs)
+    if not context or not EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, context):
+        raise RuntimeError("cannot create a surfaceless OpenGL 3.3 context")
+    return GL.glGetString(GL.GL_RENDERER).decode()
+
+
+class ShaderProgram:
+    """代替 QOpenGLShaderProgram，只实现 GridCompositor 用到的几个方法"""
+    def __init__(self, parent=None):
+        self._shaders = []
+        self._program = None
+
+    def addShaderFromSourceCode(self, kind, source):
+        from PySide6.QtOpenGL import QOpenGLShader
+        stage = GL.GL_VERTEX_SHADER if kind == QOpenGLShader.Vertex else GL.GL_FRAGMENT_SHADER
+        self._shaders.append(shaders.compileShader(source, stage))
+        return True
+
+    def link(self):
+        self._program = shaders.compileProgram(*self._shaders, validate=False)
+        return True
+
+    def log(self):
+        return ""
+
+    def bind(self):
+        GL.glUseProgram(self._program)
+
+    def release(self):
+        GL.glUseProgram(0)
+
+    def setUniformValue(self, name, *values):
+        location = GL.glGetUniformLocation(self._program, name)
+        if len(values) == 2:
+            GL.glUniform2f(location, *values)
+        else:
+            GL.glUniform1i(location, values[0])
+
+
+class Target:
+    """CANVAS 大小的离屏帧缓冲"""
+    def __init__(self):
+        self.width, self.height = CANVAS
+        self.fbo = GL.glGenFramebuffers(1)
+        self.rbo = GL.glGenRenderbuffers(1)
+        GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, self.rbo)
+        GL.glRenderbufferStorage(GL.GL_RENDERBUFFER, GL.GL_RGBA8, self.width, self.height)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self.fbo)
+        GL.glFramebufferRenderbuffer(GL.GL_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0,
+                                     GL.GL_RENDERBUFFER, self.rbo)
+
+    def draw(self, compositor):
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self.fbo)
+        compositor.draw(self.width, self.height)
+        GL.glFinish()
+
+    def pixels(self):
+        """读回整个帧缓冲，行序自上而下"""
+        GL.glPixelStorei(GL.GL_PACK_ALIGNMENT, 1)
+        data = GL.glReadPixels(0, 0, self.width, self.height, GL.GL_RGB, GL.GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, np.uint8).reshape(self.height, self.width, 3)[::-1]
+
+    def release(self):
+        GL.glDeleteFramebuffers(1, [self.fbo])
+        GL.glDeleteRenderbuffers(1, [self.rbo])
+
+
+def view_color(view):
+    return np.array([(view * 53 + 40) % 256, (view * 97 + 80) % 256, (view * 29 + 160) % 256], np.uint8)
+
+
+class Scene:
+    """一组画面和它们当前的尺寸，负责上传和逐格核对"""
+    def __init__(self, target, max_views):
+        self.target = target
+        self.compositor = grid_compositor.GridCompositor(None, max_views)
+        self.compositor.initialize()
+        self.streamers = {}
+        self.sizes = {}
+        self.failures = 0
+
+    def upload(self, views):
+        for view in views:
+            width, height = self.sizes[view]
+            img = np.empty((height, width, 3), np.uint8)
+            img[:] = view_color(view)
+            streamer = self.streamers.setdefault(view, PBOStreamer(STREAMER_PBOS))
+            self.compositor.upload(view, streamer, img.tobytes(), width, height, GL.GL_RGB)
+
+    def check(self, label, blank=()):
+        """除 blank 里的画面外，每格中心和视频区域角上应为该路的颜色，宽高比留边应为黑色"""
+        self.target.draw(self.compositor)
+        img = self.target.pixels()
+        cols, rows = grid_compositor.grid_shape(self.compositor.max_views, *CANVAS)
+        cell_w, cell_h = CANVAS[0] / cols, CANVAS[1] / rows
+        errors = []
+        for view in range(self.compositor.max_views):
+            x, y = (view % cols) * cell_w, (view // cols) * cell_h
+            cx, cy = int(x + cell_w / 2), int(y + cell_h / 2)
+            size = self.sizes.get(view) if view not in blank else None
+            want = view_color(view) if size else np.zeros(3, np.uint8)
+            probes = [("center", cy, cx, want)]
+            if size:
+                scale = min(cell_w / size[0], cell_h / size[1])
+                video_w, video_h = size[0] * scale, size[1] * scale
+                x0, y0 = x + (cell_w - video_w) / 2, y + (cell_h - video_h) / 2
+                probes.append(("corner", int(y0 + 2), int(x0 + 2), want))
+                if video_w < cell_w - 4:
+                    probes.append(("pillarbox", cy, int(x + (cell_w - video_w) / 4), np.zeros(3, np.uint8)))
+                if video_h < cell_h - 4:
+                    probes.append(("letterbox", int(y + (cell_h - video_h) / 4), cx, np.zeros(3, np.uint8)))
+            for name, py, px, expected in probes:
+                got = img[py, px]
+                if np.abs(got.astype(int) - expected).max() > COLOR_TOLERANCE:
+                    errors.append(f"view {view} {name}: got {got.tolist()}, want {expected.tolist()}")
+        groups = {size: (group.capacity, len(group.layers)) for size, group in self.compositor._groups.items()}
+        print(f"[grid] {label}: {'ok' if not errors else 'FAILED'}; "
+              f"groups (capacity, used) {groups}, {len(self.compositor._batches)} batches")
+        for error in errors:
+            print(f"[grid]   {error}")
+        self.failures += bool(errors)
+
+    def release(self):
+        for streamer in self.streamers.values():
+            streamer.release()
+        self.compositor.release()
+
+
+def run_checks(target):
+    scene = Scene(target, 12)
+    # 6 路同尺寸：初始 4 层，第 5 路加入时扩到 8 层；另有正方形和竖屏两组
+    scene.sizes.update({view: (320, 180) for view in range(6)})
+    scene.sizes.update({view: (200, 200) for view in range(6, 9)})
+    scene.sizes[9] = (180, 320)
+
+    scene.upload(range(10))
+    # 扩容重新分配了纹理数组，0~3 路的内容丢失，要等它们的下一帧
+    scene.check("grow 4 -> 8 layers, first pass", blank=range(4))
+    scene.upload(range(10))
+    scene.check("three size groups, one batch each")
+
+    scene.sizes[2] = (640, 480)
+    scene.upload(range(10))
+    scene.check("view 2 changes size and moves to a new group")
+
+    scene.sizes[10] = scene.sizes[11] = (320, 180)
+    scene.upload(range(12))
+    scene.upload(range(12))
+    scene.check("new views reuse the freed layer")
+
+    for view in (6, 7, 8):
+        scene.compositor.remove(view)
+    scene.check("whole group removed", blank=(6, 7, 8))
+    if (200, 200) in scene.compositor._groups:
+        print("[grid]   removed group still holds a texture array")
+        scene.failures += 1
+
+    scene.release()
+    return scene.failures
+
+
+def run_perf(target, resolutions=("480p", "720p"), tiles_list=(1, 4, 9, 16), frames=30):
+    """与 compositor 阶段的 window_rgb 用例相同的工作量：每帧各路上传一次再合成一次"""
+    for res in resolutions:
+        width, height = media.RESOLUTIONS[res]
+        sources = [media.pattern(width, height, i * 10).tobytes() for i in range(3)]
+        for tiles in tiles_list:
+            compositor = grid_compositor.GridCompositor(None, tiles)
+            compositor.initialize()
+            streamers = [PBOStreamer(STREAMER_PBOS) for _ in range(tiles)]
+
+            def draw_frame(i):
+                t0 = time.perf_counter()
+                for view in range(tiles):
+                    compositor.upload(view, streamers[view], sources[(i + view) % len(sources)],
+                                      width, height, GL.GL_RGB)
+                t1 = time.perf_counter()
+                target.draw(compositor)
+                return t1 - t0, time.perf_counter() - t0
+
+            metrics = _measure(draw_frame, tiles * width * height * 3, frames)
+            print(f"[grid] window_rgb_{res}/x{tiles}: " + ", ".join(f"{k} {v:.2f}" for k, v in metrics.items()))
+            for streamer in streamers:
+                streamer.release()
+            compositor.release()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="GridCompositor pixel checks on a surfaceless GL context")
+    parser.add_argument("--perf", action="store_true", help="also time uploads and composition")
+    args = parser.parse_args(argv)
+
+    print(f"[grid] {egl_context()}")
+    grid_compositor.QOpenGLShaderProgram = ShaderProgram
+    target = Target()
+    failures = run_checks(target)
+    if args.perf:
+        run_perf(target)
+    target.release()
+    print(f"[grid] {failures} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
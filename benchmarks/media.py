@@ -0,0 +1,82 @@
+import os
+
+import av
+import numpy as np
+
+# 合成片段放在这里，生成一次后复用
+MEDIA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".media")
+
+# 编码格式 -> (编码器, 容器后缀, 编码选项)；选项偏向编码速度，生成片段不必太久
+CODECS = {
+    "h264": ("libx264", ".mp4", {"preset": "ultrafast", "bf": "2"}),
+    "hevc": ("libx265", ".mp4", {"preset": "ultrafast", "x265-params": "log-level=error"}),
+    "vp9": ("libvpx-vp9", ".webm", {"deadline": "realtime", "cpu-used": "8"}),
+}
+
+RESOLUTIONS = {
+    "480p": (854, 480),
+    "720p": (1280, 720),
+    "1080p": (1920, 1080),
+    "2160p": (3840, 2160),
+}
+
+# 关键帧间隔（帧）
+GOPS = {
+    "short": 12,
+    "long": 250,
+}
+
+FPS = 30
+
+
+def clip_name(codec, res, gop, seconds):
+    return f"{codec}_{res}_{gop}_{seconds}s"
+
+
+def clip_path(codec, res, gop, seconds):
+    return os.path.join(MEDIA_DIR, clip_name(codec, res, gop, seconds) + CODECS[codec][1])
+
+
+def pattern(width, height, index):
+    """
+    移动的渐变加上块状纹理：每帧都在变化，运动估计有事可做，
+    码率和解码开销接近真实画面，而不是纯色那样几乎不花时间。
+    """
+    x = np.arange(width, dtype=np.uint16)
+    y = np.arange(height, dtype=np.uint16)[:, None]
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[..., 0] = (x + index * 3) & 0xFF
+    img[..., 1] = (y + index * 2) & 0xFF
+    img[..., 2] = ((x // 32 + y // 32 + index // 4) * 37) & 0xFF
+    return img
+
+
+def ensure_clip(codec, res, gop, seconds):
+    """返回片段路径，不存在时用 PyAV 生成"""
+    path = clip_path(codec, res, gop, seconds)
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(MEDIA_DIR, exist_ok=True)
+    encoder, _, options = CODECS[codec]
+    width, height = RESOLUTIONS[res]
+    tmp = path + ".tmp" + CODECS[codec][1]
+    print(f"[bench] generating {os.path.basename(path)}")
+
+    container = av.open(tmp, "w")
+    try:
+        stream = container.add_stream(encoder, rate=FPS)
+        stream.width = width
+        stream.height = height
+        stream.pix_fmt = "yuv420p"
+        stream.options = dict(options, g=str(GOPS[gop]), keyint_min=str(GOPS[gop]))
+        for i in range(int(seconds * FPS)):
+            frame = av.VideoFrame.from_ndarray(pattern(width, height, i), format="rgb24")
+            for packet in stream.encode(frame):
+                container.mux(packet)
+        for packet in stream.encode():
+            container.mux(packet)
+    finally:
+        container.close()
+    os.replace(tmp, path)
+    return path
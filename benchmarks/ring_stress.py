@@ -0,0 +1,108 @@
+"""
+FrameSlotRing 的无锁交接压力检查：一个生产者线程不停地逐行写满槽并发布，
+一个消费者线程不停地取最新的帧并反复逐行核对内容。两边每写/读一行都 sleep(0)
+让出 GIL，切换间隔也调到 1 微秒，读写同一个槽的交错几乎每帧都会发生。
+交接协议有错时（例如生产者不管正在读的槽）5 秒内能报出上千次撕裂，正确时应为 0。
+
+    python -m benchmarks.ring_stress               # 默认跑 5 秒
+    python -m benchmarks.ring_stress --seconds 30
+
+检查项，任何一项不满足时退出码为 1：
+  - 读到的槽内容必须完整一致（整帧同一个值，且与槽的帧序号对应），读的过程中不被改写；
+  - 消费者看到的帧序号严格递增；
+  - presented + dropped 等于最后显示的帧序号（被覆盖的帧都计入了 dropped）。
+修改 FrameSlotRing 的交接协议后应重新跑一遍。
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from player.frame_slots import FrameSlotRing
+
+# 槽的尺寸：行数少，生产者一帧写得快，每秒交接的次数多
+WIDTH, HEIGHT = 64, 8
+# 消费者对同一个槽重复核对的次数，拉长读的时间窗口，让生产者在这期间写好几帧
+READ_PASSES = 10
+
+
+def run(seconds, slots=3):
+    ring = FrameSlotRing(slots)
+    running = [True]
+    errors = []
+    checked = [0]
+    last_seq = [0]
+
+    def consume():
+        while running[0]:
+            slot = ring.acquire()
+            if slot is None:
+                continue
+            seq = slot.seq
+            value = slot.data[0, 0, 0]
+            # 与生产者一样逐行核对：整块比较在 numpy 里一次做完，中间不会被打断
+            torn = int(value) != seq % 256
+            for _ in range(READ_PASSES):
+                for row in slot.data:
+                    if (row != value).any():
+                        torn = True
+                    time.sleep(0)
+            if torn:
+                errors.append(f"torn read of seq {seq}")
+            if seq <= last_seq[0]:
+                errors.append(f"seq went backwards: {last_seq[0]} -> {seq}")
+            last_seq[0] = seq
+            checked[0] += 1
+            ring.release()
+
+    def produce():
+        while running[0]:
+            index, dst = ring.begin_write(WIDTH, HEIGHT)
+            value = (ring.published + 1) % 256
+            # 逐行写，读写重叠时一定能看出来
+            for row in range(HEIGHT):
+                dst[row] = value
+                time.sleep(0)
+            ring.publish(index, WIDTH, HEIGHT)
+
+    switch = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=consume), threading.Thread(target=produce)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        running[0] = False
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(switch)
+
+    stats = ring.stats()
+    if stats["presented"] + stats["dropped"] != last_seq[0]:
+        errors.append(f"counters inconsistent: {stats} vs last seq {last_seq[0]}")
+    return checked[0], stats, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FrameSlotRing lock-free handoff stress check")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--slots", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    checked, stats, errors = run(args.seconds, args.slots)
+    print(f"[ring] {checked} frames checked, published {stats['published']}, "
+          f"presented {stats['presented']}, dropped {stats['dropped']}")
+    for error in errors[:20]:
+        print(f"[ring]   {error}")
+    print(f"[ring] {len(errors)} error(s)")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
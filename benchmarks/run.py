@@ -0,0 +1,240 @@
+"""
+无界面的性能基准：用 PyAV 生成合成片段，分别测量解复用、解码、像素转换、
+帧队列交接，1~36 个 VideoPanel 同时播放时的解码/呈现节拍，
+以及离屏 GL 上 MultiVideoWindow / VideoPanel 的上传与合成。
+
+    python -m benchmarks.run                       # 默认档，结果写到 benchmarks/results/
+    python -m benchmarks.run --profile quick       # 只跑最小的用例
+    python -m benchmarks.run --only decode,panels  # 只跑部分阶段
+    python -m benchmarks.run --save-baseline       # 把这次结果存为基线
+
+有基线时逐项比较，超出容差的指标列为退化，退出码为 1。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+
+# 与 main.py 一样从仓库根目录导入 player
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import av
+
+from benchmarks import media, stages, baseline, compositor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_FILE = os.path.join(HERE, "baseline.json")
+RESULTS_DIR = os.path.join(HERE, "results")
+
+STAGES = ("demux", "decode", "convert", "queue", "panels", "compositor")
+# 帧队列交接一次只要几十毫秒，但抖动大，多测几次取最好的
+QUEUE_REPEAT = 9
+
+# 各档的用例矩阵：codecs × resolutions × gops 的片段跑单路阶段，panel_clip 跑多面板，
+# compositor_resolutions × compositor_tiles 跑离屏合成
+PROFILES = {
+    "quick": {
+        "codecs": ["h264"],
+        "resolutions": ["480p"],
+        "gops": ["short"],
+        "clip_seconds": 3,
+        "repeat": 3,
+        "panel_clip": ("h264", "480p", "long"),
+        "panel_counts": [1, 4],
+        "panel_seconds": 3,
+        "compositor_resolutions": ["480p"],
+        "compositor_tiles": [1, 4],
+        "compositor_frames": 30,
+    },
+    "default": {
+        "codecs": ["h264", "hevc", "vp9"],
+        "resolutions": ["480p", "720p"],
+        "gops": ["short", "long"],
+        "clip_seconds": 3,
+        "repeat": 3,
+        "panel_clip": ("h264", "720p", "long"),
+        "panel_counts": [1, 4, 9],
+        "panel_seconds": 4,
+        "compositor_resolutions": ["480p", "720p"],
+        "compositor_tiles": [1, 4, 9],
+        "compositor_frames": 60,
+    },
+    "full": {
+        "codecs": ["h264", "hevc", "vp9"],
+        "resolutions": ["480p", "720p", "1080p", "2160p"],
+        "gops": ["short", "long"],
+        "clip_seconds": 3,
+        "repeat": 3,
+        "panel_clip": ("h264", "720p", "long"),
+        "panel_counts": [1, 4, 9, 16, 25, 36],
+        "panel_seconds": 5,
+        "compositor_resolutions": ["480p", "720p", "1080p"],
+        "compositor_tiles": [1, 4, 9, 16, 25, 36, 64],
+        "compositor_frames": 120,
+    },
+}
+
+
+def machine_info():
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "av": av.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def run_profile(profile, only):
+    results = {}
+    clips = [(c, r, g) for c in profile["codecs"] for r in profile["resolutions"] for g in profile["gops"]]
+    for codec, res, gop in clips:
+        path = media.ensure_clip(codec, res, gop, profile["clip_seconds"])
+        name = media.clip_name(codec, res, gop, profile["clip_seconds"])
+        for stage in ("demux", "decode", "convert"):
+            if stage in only:
+                bench = getattr(stages, f"bench_{stage}")
+                results[f"{stage}/{name}"] = _best(bench, profile["repeat"], path)
+                print(f"[bench] {stage}/{name}: {_brief(results[f'{stage}/{name}'])}")
+
+    if "queue" in only:
+        results["queue/720p"] = _best(stages.bench_queue, max(profile["repeat"], QUEUE_REPEAT))
+        print(f"[bench] queue/720p: {_brief(results['queue/720p'])}")
+
+    if "panels" in only:
+        # 面板播放的片段要比统计时长更长，避免中途循环
+        seconds = profile["panel_seconds"]
+        clip = profile["panel_clip"]
+        path = media.ensure_clip(*clip, seconds + 5)
+        name = media.clip_name(*clip, seconds + 5)
+        app = _offscreen_app()
+        for count in profile["panel_counts"]:
+            key = f"panels/{name}/x{count}"
+            results[key] = stages.bench_panels(app, path, count, seconds)
+            print(f"[bench] {key}: {_brief(results[key])}")
+
+    if "compositor" in only:
+        app = _offscreen_app()
+        target = compositor.open_target()
+        if target is None:
+            print("[bench] compositor: skipped (no OpenGL; try xvfb-run with QT_QPA_PLATFORM=xcb)")
+        else:
+            print(f"[bench] compositor: {target.renderer}")
+            results.update(run_compositor(app, target, profile))
+            target.release()
+    return results
+
+
+def run_compositor(app, target, profile):
+    results = {}
+    frames = profile["compositor_frames"]
+    for res in profile["compositor_resolutions"]:
+        for tiles in profile["compositor_tiles"]:
+            cases = {
+                f"window_rgb_{res}": lambda: compositor.bench_window(target, res, tiles, frames),
+                f"panel_rgb_{res}": lambda: compositor.bench_panel(app, target, res, tiles, "rgb", frames),
+                f"panel_yuv_{res}": lambda: compositor.bench_panel(app, target, res, tiles, "yuv", frames),
+            }
+            for name, bench in cases.items():
+                key = f"compositor/{name}/x{tiles}"
+                results[key] = bench()
+                print(f"[bench] {key}: {_brief(results[key])}")
+    return results
+
+
+def _best(bench, repeat, *args):
+    """重复测几次，每项指标取最好的一次，减少调度抖动的影响"""
+    runs = [bench(*args) for _ in range(repeat)]
+    return {metric: (min if baseline.lower_is_better(metric) else max)(run[metric] for run in runs)
+            for metric in runs[0]}
+
+
+def _offscreen_app():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+    from player.cache_dir import set_cache_dir
+    # 探测与关键帧索引缓存放在片段旁边，不污染仓库根目录
+    set_cache_dir(media.MEDIA_DIR)
+    return QApplication.instance() or QApplication([])
+
+
+def _brief(metrics):
+    return ", ".join(f"{k} {v:.2f}" for k, v in metrics.items())
+
+
+def print_comparison(rows):
+    regressions = [r for r in rows if r[5]]
+    for case, metric, ref, value, change, regressed in rows:
+        flag = "REGRESSED" if regressed else ""
+        print(f"{case:<40} {metric:<24} {ref:>10.2f} -> {value:>10.2f} {change:>+7.1%} {flag}")
+    print(f"[bench] {len(rows)} metrics compared, {len(regressions)} regressed")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless benchmark suite")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="default")
+    parser.add_argument("--only", default=",".join(STAGES),
+                        help=f"comma separated stages ({','.join(STAGES)})")
+    parser.add_argument("--out", help="result file (default: benchmarks/results/<time>.json)")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--tolerance", type=float, help="override the default relative tolerance")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="merge these results into the baseline file instead of comparing")
+    args = parser.parse_args(argv)
+
+    only = {s.strip() for s in args.only.split(",") if s.strip()}
+    unknown = only - set(STAGES)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    # 探测缓存等写到片段目录（面板阶段之外也会用到）
+    from player.cache_dir import set_cache_dir
+    set_cache_dir(media.MEDIA_DIR)
+    # 关键帧索引的整文件扫描与被测的解码/转换无关，不让它混进耗时
+    from player import video_decoder
+    video_decoder.BUILD_INDEX = False
+
+    results = run_profile(PROFILES[args.profile], only)
+    data = {
+        "meta": dict(machine_info(), profile=args.profile, time=time.strftime("%Y-%m-%d %H:%M:%S")),
+        "results": results,
+    }
+
+    out = args.out
+    if out is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out = os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    print(f"[bench] results written to {out}")
+
+    if args.save_baseline:
+        base = baseline.load(args.baseline) if os.path.exists(args.baseline) else {}
+        base.setdefault("tolerance", dict(baseline.INITIAL_TOLERANCES))
+        base.setdefault("results", {}).update(results)
+        base["meta"] = data["meta"]
+        baseline.save(args.baseline, base)
+        print(f"[bench] baseline updated: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("[bench] no baseline to compare against")
+        return 0
+    base = baseline.load(args.baseline)
+    if base.get("meta", {}).get("cpu_count") != os.cpu_count():
+        print("[bench] warning: baseline was recorded on a machine with a different CPU count")
+    rows = baseline.compare(results, base, args.tolerance)
+    return 1 if print_comparison(rows) else 0
+
+
+if __name__ == "__main__":
+    code = main()
+    # 跑过面板后 PySide6 偶尔在解释器退出时的垃圾回收里崩溃（bool_dealloc），
+    # 结果已经写完，直接退出，不让它把退出码变成崩溃
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(code)
@@ -0,0 +1,200 @@
+import gc
+import time
+import threading
+
+import av
+
+from player.video_decoder import VideoDecoder
+from player.frame_pool import FramePool
+from player.frame_queue import FrameQueue
+
+MB = 1024 * 1024
+
+
+def bench_demux(path):
+    """只解复用，不解码：每秒读出的包数和字节数"""
+    packets = 0
+    nbytes = 0
+    t0 = time.perf_counter()
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        for packet in container.demux(stream):
+            if packet.size:
+                packets += 1
+                nbytes += packet.size
+    dt = time.perf_counter() - t0
+    return {
+        "demux_packets_per_s": packets / dt,
+        "demux_mb_per_s": nbytes / MB / dt,
+    }
+
+
+def bench_decode(path):
+    """VideoDecoder.decode_raw：解码出原始帧，不做任何像素转换"""
+    decoder = VideoDecoder(path)
+    try:
+        frames = 0
+        t0 = time.perf_counter()
+        while True:
+            frame, _ = decoder.decode_raw()
+            if frame is None:
+                break
+            frames += 1
+        dt = time.perf_counter() - t0
+    finally:
+        decoder.close()
+    return {
+        "decode_fps": frames / dt,
+        "decode_ms": dt / max(frames, 1) * 1000,
+    }
+
+
+def bench_convert(path):
+    """
+    每帧解码后分别计时三种转换：PyAV 的 to_ndarray(rgb24)，
+    以及播放器实际使用的转换进帧池（RGB 模式和 YUV 平面模式）。
+    """
+    decoder = VideoDecoder(path)
+    stream = decoder.stream
+    rgb_pool = FramePool(2, "rgb24", stream.width, stream.height)
+    yuv_pool = FramePool(2, "yuv420p", stream.width, stream.height)
+    totals = {"to_ndarray_ms": 0.0, "convert_rgb_ms": 0.0, "convert_yuv_ms": 0.0}
+    frames = 0
+    try:
+        while True:
+            frame, pts = decoder.decode_raw()
+            if frame is None:
+                break
+            frames += 1
+
+            t0 = time.perf_counter()
+            frame.to_ndarray(format="rgb24")
+            t1 = time.perf_counter()
+            decoder.output_format = "rgb24"
+            buf, _ = decoder.convert(frame, pts, rgb_pool)
+            buf.release()
+            t2 = time.perf_counter()
+            decoder.output_format = "yuv"
+            buf, _ = decoder.convert(frame, pts, yuv_pool)
+            buf.release()
+            t3 = time.perf_counter()
+
+            totals["to_ndarray_ms"] += t1 - t0
+            totals["convert_rgb_ms"] += t2 - t1
+            totals["convert_yuv_ms"] += t3 - t2
+    finally:
+        decoder.close()
+    return {name: total / max(frames, 1) * 1000 for name, total in totals.items()}
+
+
+def bench_queue(width=1280, height=720, count=2000):
+    """
+    解码端与呈现端之间的交接：生产者从帧池取缓冲区放进 FrameQueue，
+    消费者在条件变量上等待、取出并归还，统计吞吐、从入队到出队的平均延迟，
+    以及帧池每取一块缓冲要新分配几块（只有开头预分配的那些，应接近 0）。
+    """
+    pool = FramePool(11, "rgb24", width, height)
+    queue = FrameQueue(maxsize=8)
+    latency = [0.0]
+
+    def consume():
+        for _ in range(count):
+            with queue.cond:
+                queue.cond.wait_for(lambda: not queue.empty())
+            (buf, put_at) = queue.pop()
+            latency[0] += time.perf_counter() - put_at
+            buf.release()
+
+    consumer = threading.Thread(target=consume)
+    t0 = time.perf_counter()
+    consumer.start()
+    for _ in range(count):
+        with queue.cond:
+            queue.cond.wait_for(lambda: not queue.full())
+        buf = pool.acquire("rgb24", width, height)
+        queue.put((buf, time.perf_counter()))
+    consumer.join()
+    dt = time.perf_counter() - t0
+    return {
+        "queue_items_per_s": count / dt,
+        "queue_handoff_ms": latency[0] / count * 1000,
+        "queue_pool_alloc_ratio": pool.stats()["allocs_per_frame"],
+    }
+
+
+def bench_panels(app, path, count, seconds, warmup=1.0, config=None):
+    """
+    在同一进程里创建 count 个 VideoPanel（不显示到屏幕，offscreen 平台），
+    由共享调度器驱动解码与呈现，预热后统计 seconds 秒。
+    没有 GL 上下文，paintGL 不会执行，这里衡量的是解码与呈现节拍。
+    统计期间帧池新分配的缓冲与取用次数之比应为 0，说明缓冲区都在复用。
+    """
+    from PySide6.QtCore import QTimer, QEvent
+    from player.video_panel import VideoPanel
+    from player.decode_scheduler import DecodeScheduler
+    from player.telemetry import Telemetry
+
+    cfg = {"shared_decode": False, "loop_cache_seconds": 0}
+    cfg.update(config or {})
+    panels = [VideoPanel(path, dict(cfg), None, None, 1) for _ in range(count)]
+    # 计时在统计打开时才记录；面板登记统计时可能刚创建 Telemetry 单例，之后再打开
+    enabled, Telemetry.enabled = Telemetry.enabled, True
+    for panel in panels:
+        panel.show()
+
+    marks = {}
+
+    def pool_counts():
+        stats = [p.frame_pool.stats() for p in panels]
+        return sum(s["allocations"] for s in stats), sum(s["acquires"] for s in stats)
+
+    def start():
+        for panel in panels:
+            panel.timings.take()
+        marks["start"] = (time.perf_counter(), time.process_time(),
+                          [dict(p.qos.counters) for p in panels], pool_counts())
+
+    def stop():
+        marks["stop"] = (time.perf_counter(), time.process_time(),
+                         [dict(p.qos.counters) for p in panels], pool_counts())
+        app.quit()
+
+    QTimer.singleShot(int(warmup * 1000), start)
+    QTimer.singleShot(int((warmup + seconds) * 1000), stop)
+    app.exec()
+
+    # 先停调度器再停面板，避免呈现线程在面板销毁时还在发信号
+    DecodeScheduler.shutdown_instance()
+    timings = [p.timings.take() for p in panels]
+    for panel in panels:
+        panel.stop()
+        panel.deleteLater()
+    # 事件循环已退出，手动处理 deleteLater，不把面板留到解释器退出时再回收
+    app.sendPostedEvents(None, QEvent.DeferredDelete)
+    del panels[:]
+    gc.collect()
+    Telemetry.enabled = enabled
+
+    (t0, c0, before, pool0), (t1, c1, after, pool1) = marks["start"], marks["stop"]
+    dt = t1 - t0
+    presented = [a["presented"] - b["presented"] for a, b in zip(after, before)]
+    late = sum(a["late"] - b["late"] for a, b in zip(after, before))
+    dropped = sum(a["dropped_upload"] + a["dropped_convert"]
+                  - b["dropped_upload"] - b["dropped_convert"] for a, b in zip(after, before))
+
+    def avg_ms(name):
+        total = sum(t[name][0] * t[name][2] for t in timings if name in t)
+        n = sum(t[name][2] for t in timings if name in t)
+        return total / n * 1000 if n else 0.0
+
+    return {
+        "panels_total_fps": sum(presented) / dt,
+        "panels_min_fps": min(presented) / dt,
+        "panels_late_ratio": late / max(sum(presented), 1),
+        "panels_drop_ratio": dropped / max(sum(presented) + dropped, 1),
+        "panels_latency_ms": avg_ms("latency"),
+        "panels_decode_ms": avg_ms("decode"),
+        "panels_convert_ms": avg_ms("convert"),
+        "panels_cpu_cores": (c1 - c0) / dt,
+        "panels_pool_alloc_ratio": (pool1[0] - pool0[0]) / max(pool1[1] - pool0[1], 1),
+    }
@@ -12,6 +12,13 @@ from PySide6.QtGui import QGuiApplication, QSurfaceFormat
 
 from player.player_window import VideoGLWindow,GLWindow,MultiVideoWindow
 from player.video_decoder import VideoPlayerManager,PyAVDecoder
+from player.cache_dir import set_cache_dir
+from player.decode_scheduler import DecodeScheduler
+from player.thread_budget import ThreadBudget
+from player.loop_cache import LoopCache
+from player.telemetry import Telemetry
+from player import startup_report
+from player.supervisor import Supervisor, ChildReporter, split_budget
 
 
 MY_FLAG = 0
@@ -25,9 +32,18 @@ def main():
         default="config.json", 
         help="Path to the configuration JSON file (default: config.json)"
     )
+    parser.add_argument(
+        "--multi-process",
+        action="store_true",
+        help="Run each screen in its own player process (same as \"multi_process\": true)"
+    )
+    # 多进程模式下由监督进程传给子进程：只播放这一块屏幕，预算按进程数平分
+    parser.add_argument("--screen", type=str, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--process-count", type=int, default=1, help=argparse.SUPPRESS)
     args = parser.parse_args()
 
     # 2. 加载配置
+    startup_report.start()
     config_path = args.file
     if not os.path.exists(config_path):
         print(f"[ERROR] Configuration file not found: {config_path}")
@@ -43,6 +59,39 @@ def main():
         print(f"[ERROR] Unexpected error loading config: {e}")
         return
 
+    startup_report.mark("config loaded")
+
+    # 关键帧索引等缓存放在配置文件旁边
+    set_cache_dir(os.path.dirname(os.path.abspath(config_path)))
+
+    # 多进程模式：本进程只做监督，每块屏幕一个子进程
+    if args.screen is None and (args.multi_process or cfg.get("multi_process")):
+        if "screens" not in cfg:
+            print("[ERROR] No 'screens' defined in config.")
+            return
+        sys.exit(Supervisor(config_path, list(cfg["screens"])).run())
+    if args.screen is not None:
+        cfg["screens"] = {sid: v for sid, v in cfg.get("screens", {}).items() if sid == args.screen}
+    count = args.process_count
+    cpu = os.cpu_count() or 4
+
+    # 所有画面共用的解码线程数，与画面数量无关
+    DecodeScheduler.configure(split_budget(cfg.get("decode_workers"), min(8, cpu), count))
+    # 所有解码器共用的编解码线程总数
+    ThreadBudget.configure(split_budget(cfg.get("codec_threads"), cpu, count))
+    # 循环片段缓存的内存/磁盘预算（MB）
+    LoopCache.configure(split_budget(cfg.get("loop_cache_ram_mb"), 512, count),
+                        split_budget(cfg.get("loop_cache_disk_mb"), 2048, count))
+    # 流水线统计定期导出（相对路径相对于配置文件所在目录）
+    export = cfg.get("telemetry_export")
+    if export and not os.path.isabs(export):
+        export = os.path.join(os.path.dirname(os.path.abspath(config_path)), export)
+    if export and args.screen is not None:
+        # 各屏幕的进程各写各的文件：stats.csv -> stats.screen0.csv
+        root, ext = os.path.splitext(export)
+        export = f"{root}.screen{args.screen}{ext}"
+    Telemetry.configure(export, cfg.get("telemetry_interval"))
+
     # 3. 初始化 Qt 环境
     #QApplication.setAttribute(Qt.AA_NativeWindows)
     # 强制启用软件/硬件合成优化
@@ -59,6 +108,9 @@ def main():
 
     # 处理 Ctrl+C
     signal.signal(signal.SIGINT, lambda *args: app.quit()) 
+    if hasattr(signal, "SIGBREAK"):
+        # Windows 上监督进程用 CTRL_BREAK_EVENT 通知子进程退出
+        signal.signal(signal.SIGBREAK, lambda *args: app.quit())
 
     # 定时器确保 Python 能捕获信号
     timer = QTimer()
@@ -125,6 +177,15 @@ def main():
 
 
 
+    startup_report.mark("windows shown")
+
+    reporter = None
+    if args.screen is not None:
+        if not players:
+            # 屏幕不存在：正常退出，监督进程不再重启
+            return
+        reporter = ChildReporter(args.screen, players)
+
     # 5. 运行并清理
     exit_code = app.exec()
     
@@ -134,9 +195,12 @@ def main():
     if MY_FLAG==1:
         manager.stop_all()
     else:
+        if reporter is not None:
+            reporter.timer.stop()
         for p in players:
             if hasattr(p, 'stop'):
                 p.stop()
+        DecodeScheduler.shutdown_instance()
     
 
     sys.exit(exit_code)
@@ -0,0 +1,36 @@
+import os
+import json
+import hashlib
+
+# 缓存目录，默认放在配置文件旁边（由 main 设置）
+_cache_dir = None
+
+
+def set_cache_dir(path):
+    global _cache_dir
+    _cache_dir = os.path.join(path, ".player_cache")
+
+
+def cache_dir():
+    path = _cache_dir or os.path.join(os.getcwd(), ".player_cache")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_signature(path):
+    """(绝对路径, 大小, 修改时间)，任意一项变化都视为另一个文件"""
+    st = os.stat(path)
+    return [os.path.abspath(path), st.st_size, st.st_mtime_ns]
+
+
+def cache_path(path, suffix):
+    key = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir(), key + suffix)
+
+
+def write_json_atomic(path, data):
+    """先写临时文件再替换，避免多个进程同时写坏缓存"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
@@ -0,0 +1,135 @@
+import os
+import time
+import threading
+
+
+class DecodeScheduler:
+    """
+    所有 VideoPanel 共用的解码调度器。
+
+    固定数量的工作线程负责解码：每次从可解码的面板中挑出截止时间最早的一个
+    （下一帧需要显示的时刻，队列越空越优先），解码一步后放回。
+    另有一个呈现线程按各面板队首帧的 PTS 统一推进显示。
+    所有面板共享同一个条件变量，线程数与面板数无关。
+    """
+    _instance = None
+    _workers_default = min(8, os.cpu_count() or 4)
+
+    @classmethod
+    def configure(cls, workers):
+        """在创建第一个面板之前调用，设置解码线程数"""
+        if workers:
+            cls._workers_default = max(1, int(workers))
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(cls._workers_default)
+        return cls._instance
+
+    @classmethod
+    def shutdown_instance(cls):
+        if cls._instance is not None:
+            cls._instance.shutdown()
+            cls._instance = None
+
+    def __init__(self, workers):
+        self.cond = threading.Condition()
+        self.running = True
+        self._panels = []
+        self._busy = set()
+
+        # 统计
+        self.decode_steps = 0
+        self.wakeups = 0
+
+        self._threads = [threading.Thread(target=self._worker_loop, name=f"decode-{i}", daemon=True)
+                         for i in range(workers)]
+        self._threads.append(threading.Thread(target=self._present_loop, name="present", daemon=True))
+        for t in self._threads:
+            t.start()
+
+    def register(self, panel):
+        with self.cond:
+            self._panels.append(panel)
+            self.cond.notify_all()
+
+    def unregister(self, panel):
+        """移除面板，等它正在进行的解码步骤结束后返回"""
+        with self.cond:
+            if panel in self._panels:
+                self._panels.remove(panel)
+            self.cond.wait_for(lambda: panel not in self._busy, timeout=2.0)
+            self.cond.notify_all()
+
+    def wake(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def _pick(self):
+        """在可解码的面板中选截止时间最早的（需持有 self.cond）"""
+        best = None
+        best_key = None
+        for panel in self._panels:
+            if panel in self._busy or not panel.decode_ready():
+                continue
+            key = (panel.decode_deadline(), len(panel.frame_queue))
+            if best is None or key < best_key:
+                best, best_key = panel, key
+        return best
+
+    def _worker_loop(self):
+        while True:
+            with self.cond:
+                panel = None
+                while self.running:
+                    panel = self._pick()
+                    if panel is not None:
+                        break
+                    self.cond.wait()
+                    self.wakeups += 1
+                if not self.running:
+                    return
+                self._busy.add(panel)
+
+            try:
+                panel.decode_step()
+            except Exception as e:
+                print(f"[scheduler] decode error in {panel.decoder.path}: {e}")
+            finally:
+                with self.cond:
+                    self._busy.discard(panel)
+                    self.decode_steps += 1
+                    self.cond.notify_all()
+
+    def _present_loop(self):
+        """统一的呈现节拍：取出所有到期的帧，然后睡到下一个最早的 PTS"""
+        while True:
+            due = []
+            with self.cond:
+                if not self.running:
+                    return
+                now = time.perf_counter()
+                next_at = None
+                for panel in self._panels:
+                    item = panel.take_due_frame(now)
+                    if item is not None:
+                        due.append((panel, item))
+                    at = panel.next_present_at()
+                    if at is not None and (next_at is None or at < next_at):
+                        next_at = at
+                if not due:
+                    timeout = None if next_at is None else max(0.0, next_at - now)
+                    self.cond.wait(timeout)
+                    self.wakeups += 1
+
+            # 换帧与发信号不占用全局锁，避免与 GUI 线程的上传互相阻塞
+            for panel, (frame, pts) in due:
+                panel.show_frame(frame, pts)
+
+    def shutdown(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=1.0)
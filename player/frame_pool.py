@@ -0,0 +1,127 @@
+import threading
+import numpy as np
+
+from .video_decoder import PlanarFrame
+
+
+def plane_layout(fmt, width, height):
+    """返回每个平面的 (高, 宽, 通道数)，与 PlanarFrame.planes 的形状一致"""
+    cw, ch = (width + 1) // 2, (height + 1) // 2
+    if fmt == "rgb24":
+        return [(height, width, 3)]
+    if fmt == "nv12":
+        return [(height, width, 1), (ch, cw, 2)]
+    if fmt == "yuv420p":
+        return [(height, width, 1), (ch, cw, 1), (ch, cw, 1)]
+    raise ValueError(f"unsupported pool format: {fmt}")
+
+
+class FrameBuffer(PlanarFrame):
+    """帧池中的一块预分配缓冲区，所有平面连续存放在同一块内存里"""
+    def __init__(self, pool, generation, fmt, width, height):
+        layout = plane_layout(fmt, width, height)
+        self.data = np.empty(sum(h * w * c for h, w, c in layout), dtype=np.uint8)
+
+        planes = []
+        offset = 0
+        for h, w, c in layout:
+            size = h * w * c
+            planes.append(self.data[offset:offset + size].reshape(h, w, c))
+            offset += size
+
+        super().__init__(fmt, width, height, planes, [w for _, w, _ in layout],
+                         "bt709", False)
+        self.pool = pool
+        self.generation = generation
+        self.pts = None
+
+    def release(self):
+        self.pool.release(self)
+
+
+class FramePool:
+    """
+    解码线程与渲染之间复用的帧缓冲环。
+    解码器直接写入缓冲区，经 frame_queue 交给渲染，显示完后归还，不再重复分配。
+    """
+    def __init__(self, count, fmt, width, height, wait_timeout=1.0):
+        self.count = count
+        self.wait_timeout = wait_timeout
+
+        self._cond = threading.Condition()
+        self._free = []
+        self._outstanding = 0
+        self._closed = False
+
+        self.fmt = fmt
+        self.width = width
+        self.height = height
+        self._generation = 0
+
+        # 统计信息
+        self.allocations = 0
+        self.acquires = 0
+        self.overflow = 0
+
+        for _ in range(count):
+            self._free.append(self._allocate())
+
+    def _allocate(self):
+        self.allocations += 1
+        return FrameBuffer(self, self._generation, self.fmt, self.width, self.height)
+
+    def _reconfigure(self, fmt, width, height):
+        # 尺寸或格式变化：丢弃空闲的旧缓冲，使用中的旧缓冲在归还时换成新规格的（见 release）
+        self.fmt, self.width, self.height = fmt, width, height
+        self._generation += 1
+        self._free = [self._allocate() for _ in range(max(0, self.count - self._outstanding))]
+
+    def acquire(self, fmt, width, height):
+        """取一块指定规格的缓冲区；池已关闭时返回 None"""
+        with self._cond:
+            if (fmt, width, height) != (self.fmt, self.width, self.height):
+                self._reconfigure(fmt, width, height)
+
+            if not self._free and not self._closed:
+                self._cond.wait_for(lambda: self._free or self._closed, self.wait_timeout)
+            if self._closed:
+                return None
+
+            if self._free:
+                buf = self._free.pop()
+            else:
+                # 消费者长时间不归还：临时多分配一块，避免解码线程死锁
+                self.overflow += 1
+                buf = self._allocate()
+
+            self._outstanding += 1
+            self.acquires += 1
+            return buf
+
+    def release(self, buf):
+        with self._cond:
+            self._outstanding -= 1
+            if buf.generation != self._generation:
+                # 旧规格的缓冲：补一块新规格的，池子不会因为重新配置而一直少几块
+                if self._closed or len(self._free) + self._outstanding >= self.count:
+                    return
+                buf = self._allocate()
+            if len(self._free) < self.count:
+                self._free.append(buf)
+                self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        """分配次数统计，稳定运行时 allocs_per_frame 应趋近于 0"""
+        with self._cond:
+            return {
+                "allocations": self.allocations,
+                "acquires": self.acquires,
+                "overflow": self.overflow,
+                "outstanding": self._outstanding,
+                "allocs_per_frame": self.allocations / max(1, self.acquires),
+            }
@@ -0,0 +1,51 @@
+import threading
+import collections
+
+
+class FrameQueue:
+    """
+    解码与呈现之间的有界帧队列。
+    入队、出队以及暂停/seek 等状态变化都通过同一个条件变量唤醒等待方，
+    两边都不需要 sleep 轮询。
+    """
+    def __init__(self, maxsize, cond=None):
+        self.maxsize = maxsize
+        # 可以与调度器共用条件变量，这样任何面板的状态变化都能唤醒调度线程
+        self.cond = cond if cond is not None else threading.Condition()
+        self._items = collections.deque()
+
+    def __len__(self):
+        return len(self._items)
+
+    def full(self):
+        return len(self._items) >= self.maxsize
+
+    def empty(self):
+        return not self._items
+
+    def peek(self):
+        """查看队首 (frame, pts)，队列为空时返回 None"""
+        return self._items[0] if self._items else None
+
+    def put(self, item):
+        with self.cond:
+            self._items.append(item)
+            self.cond.notify_all()
+
+    def pop(self):
+        with self.cond:
+            item = self._items.popleft()
+            self.cond.notify_all()
+            return item
+
+    def clear(self):
+        """清空并返回队列中的全部元素"""
+        with self.cond:
+            items = list(self._items)
+            self._items.clear()
+            self.cond.notify_all()
+            return items
+
+    def notify(self):
+        with self.cond:
+            self.cond.notify_all()
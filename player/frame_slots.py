@@ -0,0 +1,107 @@
+import numpy as np
+
+
+class FrameSlot:
+    """环中的一个帧槽：预分配的 RGB 图像，和写入它的帧序号"""
+    __slots__ = ("data", "width", "height", "fmt", "seq")
+
+    def __init__(self):
+        self.data = None
+        self.width = 0
+        self.height = 0
+        self.fmt = "RGB"
+        self.seq = 0          # -1 表示生产者正在写
+
+
+class FrameSlotRing:
+    """
+    单生产者/单消费者的帧槽环，用于 PyAVDecoder 与 MultiVideoWindow 之间交接画面。
+
+    解码线程把帧直接写进预分配的槽，GUI 线程从槽的内存直接上传纹理，信号里只带槽号，
+    不再为每一帧拷出 bytes 再经 Qt 封送。不加锁：
+      - 生产者先把槽标成写入中再检查消费者是否在读它，消费者先登记要读的槽再检查
+        是否在写，两边都检查到冲突时各自让开，不会同时读写同一个槽；
+      - 生产者永远跳过消费者正在读的槽，3 个槽时总有一个可写，解码线程不会阻塞；
+      - 同一时刻最多有一个未处理的通知，事件队列里不会堆积帧。
+    消费者每次取最新发布的帧，两次显示之间被覆盖掉的帧计入 dropped。
+    """
+    def __init__(self, count=3):
+        self.slots = [FrameSlot() for _ in range(max(count, 3))]
+        self._head = 0           # 生产者下一个尝试写的位置
+        self._latest = -1        # 最近发布的槽（生产者写、消费者读）
+        self._reading = -1       # 消费者正在读的槽（消费者写、生产者读）
+        self._notify_pending = False
+        self._last_seq = 0       # 消费者最后显示的帧序号
+
+        # 统计
+        self.published = 0
+        self.presented = 0
+        self.dropped = 0
+
+    # ------------------------------------------------------------
+    # 生产者（解码线程）
+    # ------------------------------------------------------------
+    def begin_write(self, width, height):
+        """取一个可写的槽，返回 (槽号, 形状为 (h, w, 3) 的 ndarray)；写完调用 publish()"""
+        count = len(self.slots)
+        while True:
+            index = self._head % count
+            self._head += 1
+            slot = self.slots[index]
+            seq, slot.seq = slot.seq, -1
+            if self._reading != index:
+                break
+            # 消费者正在读这个槽，恢复原状换下一个
+            slot.seq = seq
+        if slot.data is None or slot.data.shape[:2] != (height, width):
+            slot.data = np.empty((height, width, 3), dtype=np.uint8)
+        return index, slot.data
+
+    def publish(self, index, width, height, fmt="RGB"):
+        """发布写好的槽；返回 True 表示需要发信号通知消费者"""
+        slot = self.slots[index]
+        slot.width = width
+        slot.height = height
+        slot.fmt = fmt
+        self.published += 1
+        slot.seq = self.published
+        self._latest = index
+        if self._notify_pending:
+            return False
+        self._notify_pending = True
+        return True
+
+    # ------------------------------------------------------------
+    # 消费者（GUI 线程）
+    # ------------------------------------------------------------
+    def acquire(self):
+        """
+        取最新发布的帧，没有新帧（或恰好在被改写）时返回 None。
+        返回的槽在调用 release() 之前不会被改写。
+        """
+        # 先清通知再读最新槽：之后发布的帧一定会再发一次通知
+        self._notify_pending = False
+        index = self._latest
+        if index < 0:
+            return None
+        self._reading = index
+        slot = self.slots[index]
+        seq = slot.seq
+        if seq <= self._last_seq:
+            # -1：生产者正在写；否则这一帧已经显示过
+            self._reading = -1
+            return None
+        self.dropped += seq - self._last_seq - 1
+        self._last_seq = seq
+        self.presented += 1
+        return slot
+
+    def release(self):
+        self._reading = -1
+
+    def ack(self):
+        """收到通知但这次不取帧（例如窗口还没初始化）：之后的新帧仍会再发通知"""
+        self._notify_pending = False
+
+    def stats(self):
+        return {"published": self.published, "presented": self.presented, "dropped": self.dropped}
@@ -0,0 +1,181 @@
+import ctypes
+import numpy as np
+
+from OpenGL import GL
+
+
+class PlaneUpload:
+    """一个平面的上传描述：源数据 + 目标纹理规格"""
+    __slots__ = ("texture", "data", "width", "height", "row_length", "internal", "fmt", "layer")
+
+    def __init__(self, texture, data, width, height, row_length, internal, fmt, layer=None):
+        self.texture = texture
+        self.data = data              # ndarray 或 bytes
+        self.width = width
+        self.height = height
+        self.row_length = row_length  # 每行像素数（含对齐填充），0 表示与 width 相同
+        self.internal = internal
+        self.fmt = fmt
+        # 不为 None 时目标是 GL_TEXTURE_2D_ARRAY 的这一层，存储由调用方分配
+        self.layer = layer
+
+
+def _upload_layer(plane, source):
+    """更新纹理数组中的一层；source 为 PBO 内的偏移或内存数据"""
+    GL.glBindTexture(GL.GL_TEXTURE_2D_ARRAY, plane.texture)
+    GL.glTexSubImage3D(GL.GL_TEXTURE_2D_ARRAY, 0, 0, 0, plane.layer, plane.width, plane.height, 1,
+                       plane.fmt, GL.GL_UNSIGNED_BYTE, source)
+
+
+def _as_array(data):
+    if isinstance(data, np.ndarray):
+        return data if data.flags.c_contiguous else np.ascontiguousarray(data)
+    return np.frombuffer(data, dtype=np.uint8)
+
+
+class PBOStreamer:
+    """
+    双/三缓冲的 PBO 纹理流式上传。
+
+    每一帧写入环中的下一块 PBO，再由 glTexSubImage2D 从 PBO 异步拷到纹理，
+    CPU 填充下一帧时 GPU 仍可以消费上一块 PBO。每块 PBO 用 fence 保护，
+    fence 未就绪时退回到 orphaning（重新 glBufferData）而不是阻塞等待。
+    纹理存储只在尺寸或格式变化时用 glTexImage2D 重新分配。
+    必须在持有 GL 上下文的线程中调用。
+    """
+    def __init__(self, count=3):
+        self.count = count
+        self.pbos = []
+        self.fences = [None] * count
+        self.capacity = 0
+        self.index = 0
+        self._tex_sizes = {}   # 纹理 id -> (w, h, 内部格式)
+        self._has_sync = bool(GL.glFenceSync)
+
+        # 统计
+        self.bytes_uploaded = 0
+        self.orphaned = 0
+
+    def _ensure_buffers(self, nbytes):
+        if not self.pbos:
+            ids = GL.glGenBuffers(self.count)
+            self.pbos = [int(i) for i in np.atleast_1d(ids)]
+        if nbytes <= self.capacity:
+            return
+        # 容量不足时一次性重新分配全部 PBO，之后一直复用
+        for i, pbo in enumerate(self.pbos):
+            self._drop_fence(i)
+            GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, pbo)
+            GL.glBufferData(GL.GL_PIXEL_UNPACK_BUFFER, nbytes, None, GL.GL_STREAM_DRAW)
+        self.capacity = nbytes
+
+    def _drop_fence(self, i):
+        if self.fences[i] is not None:
+            GL.glDeleteSync(self.fences[i])
+            self.fences[i] = None
+
+    def _wait_slot(self, i):
+        """PBO 仍被 GPU 使用时返回 False，由调用方改用 orphaning"""
+        fence = self.fences[i]
+        if fence is None:
+            return True
+        status = GL.glClientWaitSync(fence, GL.GL_SYNC_FLUSH_COMMANDS_BIT, 0)
+        self._drop_fence(i)
+        return status in (GL.GL_ALREADY_SIGNALED, GL.GL_CONDITION_SATISFIED)
+
+    def upload(self, planes):
+        """把若干平面依次写入同一块 PBO，再分别更新到各自的纹理"""
+        arrays = [_as_array(p.data) for p in planes]
+        nbytes = sum(a.nbytes for a in arrays)
+
+        self._ensure_buffers(nbytes)
+        i = self.index
+        self.index = (self.index + 1) % self.count
+
+        GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, self.pbos[i])
+        if not (self._has_sync and self._wait_slot(i)):
+            # orphaning：让驱动换一块新存储，旧存储在 GPU 用完后自动回收
+            GL.glBufferData(GL.GL_PIXEL_UNPACK_BUFFER, self.capacity, None, GL.GL_STREAM_DRAW)
+            self.orphaned += 1
+
+        ptr = GL.glMapBufferRange(GL.GL_PIXEL_UNPACK_BUFFER, 0, nbytes,
+                                  GL.GL_MAP_WRITE_BIT | GL.GL_MAP_INVALIDATE_RANGE_BIT)
+        offsets = []
+        offset = 0
+        for arr in arrays:
+            ctypes.memmove(ptr + offset, arr.ctypes.data, arr.nbytes)
+            offsets.append(offset)
+            offset += arr.nbytes
+        GL.glUnmapBuffer(GL.GL_PIXEL_UNPACK_BUFFER)
+
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        for plane, offset in zip(planes, offsets):
+            GL.glPixelStorei(GL.GL_UNPACK_ROW_LENGTH, plane.row_length)
+            if plane.layer is not None:
+                _upload_layer(plane, ctypes.c_void_p(offset))
+                continue
+            GL.glBindTexture(GL.GL_TEXTURE_2D, plane.texture)
+            self._ensure_texture(plane, self.pbos[i])
+            GL.glTexSubImage2D(GL.GL_TEXTURE_2D, 0, 0, 0, plane.width, plane.height,
+                               plane.fmt, GL.GL_UNSIGNED_BYTE, ctypes.c_void_p(offset))
+        GL.glPixelStorei(GL.GL_UNPACK_ROW_LENGTH, 0)
+
+        if self._has_sync:
+            self.fences[i] = GL.glFenceSync(GL.GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, 0)
+        self.bytes_uploaded += nbytes
+
+    def _ensure_texture(self, plane, pbo):
+        key = (plane.width, plane.height, plane.internal)
+        if self._tex_sizes.get(plane.texture) == key:
+            return
+        # 分配存储时临时解绑 PBO，data=None 表示只分配不填充
+        GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, 0)
+        GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, plane.internal, plane.width, plane.height, 0,
+                        plane.fmt, GL.GL_UNSIGNED_BYTE, None)
+        GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, pbo)
+        self._tex_sizes[plane.texture] = key
+
+    def release(self):
+        """释放 PBO 与 fence，需在 GL 上下文中调用"""
+        for i in range(len(self.fences)):
+            self._drop_fence(i)
+        if self.pbos:
+            GL.glDeleteBuffers(len(self.pbos), self.pbos)
+        self.pbos = []
+        self.capacity = 0
+        self._tex_sizes.clear()
+
+
+class DirectUploader:
+    """不使用 PBO 的同步上传，接口与 PBOStreamer 相同，用于不支持 PBO 的驱动"""
+    def __init__(self):
+        self._tex_sizes = {}
+        self.bytes_uploaded = 0
+
+    def upload(self, planes):
+        GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, 1)
+        for plane in planes:
+            data = _as_array(plane.data)
+            GL.glPixelStorei(GL.GL_UNPACK_ROW_LENGTH, plane.row_length)
+            self.bytes_uploaded += data.nbytes
+            if plane.layer is not None:
+                _upload_layer(plane, data)
+                continue
+            GL.glBindTexture(GL.GL_TEXTURE_2D, plane.texture)
+            key = (plane.width, plane.height, plane.internal)
+            if self._tex_sizes.get(plane.texture) != key:
+                GL.glTexImage2D(GL.GL_TEXTURE_2D, 0, plane.internal, plane.width, plane.height, 0,
+                                plane.fmt, GL.GL_UNSIGNED_BYTE, data)
+                self._tex_sizes[plane.texture] = key
+            else:
+                GL.glTexSubImage2D(GL.GL_TEXTURE_2D, 0, 0, 0, plane.width, plane.height,
+                                   plane.fmt, GL.GL_UNSIGNED_BYTE, data)
+        GL.glPixelStorei(GL.GL_UNPACK_ROW_LENGTH, 0)
+
+    def release(self):
+        self._tex_sizes.clear()
+
+
+def create_uploader(use_pbo=True, count=3):
+    return PBOStreamer(count) if use_pbo else DirectUploader()
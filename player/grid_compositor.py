@@ -0,0 +1,243 @@
+import os
+import math
+import ctypes
+import numpy as np
+
+from OpenGL import GL
+from PySide6.QtOpenGL import QOpenGLShaderProgram, QOpenGLShader
+
+from .gl_upload import PlaneUpload
+
+# 每个实例的数据：格子 x, y, 宽, 高（NDC），视频宽、高，纹理层
+INSTANCE_FLOATS = 7
+INSTANCE_STRIDE = INSTANCE_FLOATS * 4
+# 纹理数组的初始层数，不够时翻倍
+INITIAL_LAYERS = 4
+
+
+def grid_shape(count, fb_w, fb_h, aspect=16 / 9):
+    """count 个画面在 fb_w × fb_h 上排成 (列, 行)：取每个画面能显示得最大的排法，一样大时取列多的"""
+    best, best_scale = (1, max(count, 1)), -1.0
+    for cols in range(1, max(count, 1) + 1):
+        rows = math.ceil(count / cols)
+        scale = min(fb_w / cols / aspect, fb_h / rows)
+        if scale >= best_scale:
+            best, best_scale = (cols, rows), scale
+    return best
+
+
+class _LayerGroup:
+    """同一尺寸的画面共用一个 GL_TEXTURE_2D_ARRAY，每路占一层"""
+    def __init__(self, width, height, capacity):
+        self.width = width
+        self.height = height
+        self.capacity = capacity
+        self.layers = {}          # view_id -> 层
+        self.texture = int(GL.glGenTextures(1))
+        self._allocate()
+
+    def _allocate(self):
+        GL.glBindTexture(GL.GL_TEXTURE_2D_ARRAY, self.texture)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D_ARRAY, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D_ARRAY, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D_ARRAY, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexParameteri(GL.GL_TEXTURE_2D_ARRAY, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
+        GL.glTexImage3D(GL.GL_TEXTURE_2D_ARRAY, 0, GL.GL_RGB, self.width, self.height, self.capacity,
+                        0, GL.GL_RGB, GL.GL_UNSIGNED_BYTE, None)
+        GL.glBindTexture(GL.GL_TEXTURE_2D_ARRAY, 0)
+
+    def add(self, view_id, max_layers):
+        """分配一层；层数不够时扩容，返回 True 表示旧内容已丢失"""
+        used = set(self.layers.values())
+        free = next((i for i in range(self.capacity) if i not in used), None)
+        grown = False
+        if free is None:
+            # 纹理数组不能原地扩容，重新分配后各层要等下一帧重新上传
+            free = self.capacity
+            self.capacity = min(max(self.capacity * 2, free + 1), max(max_layers, free + 1))
+            self._allocate()
+            grown = True
+        self.layers[view_id] = free
+        return grown
+
+    def release(self):
+        GL.glDeleteTextures([self.texture])
+        self.texture = None
+
+
+class GridCompositor:
+    """
+    MultiVideoWindow 的网格合成：所有画面一次实例化绘制画完。
+
+    同尺寸的画面放在同一个纹理数组里，每路一层；每个实例的格子位置、视频尺寸和层号
+    放在实例缓冲里，宽高比适配在顶点着色器里按实例计算。布局只在画面增减、尺寸
+    或网格变化时重建，之后每帧的调用次数只和尺寸种类数有关，与画面数无关。
+    必须在持有 GL 上下文的线程中调用。
+    """
+    def __init__(self, parent, max_views):
+        self.parent = parent
+        self.max_views = max_views
+        self.program = None
+        self.vao = None
+        self.quad_vbo = None
+        self.ebo = None
+        self.instance_vbo = None
+
+        self._groups = {}         # (w, h) -> _LayerGroup
+        self._view_group = {}     # view_id -> _LayerGroup
+        self._valid = set()       # 已经有画面的 view_id
+        self._batches = []        # [(纹理, 起始实例, 实例数)]
+        self._layout_key = None
+        self._dirty = True
+
+    def initialize(self):
+        self.program = QOpenGLShaderProgram(self.parent)
+        self.program.addShaderFromSourceCode(QOpenGLShader.Vertex, _load_shader("grid.vert"))
+        self.program.addShaderFromSourceCode(QOpenGLShader.Fragment, _load_shader("grid.frag"))
+        if not self.program.link():
+            raise RuntimeError(f"Link Error: {self.program.log()}")
+
+        # 单位矩形：Pos(x,y) 以左下角为原点，Tex(u,v) 以左上角为原点
+        vertices = np.array([
+            0.0, 1.0,  0.0, 0.0,
+            0.0, 0.0,  0.0, 1.0,
+            1.0, 0.0,  1.0, 1.0,
+            1.0, 1.0,  1.0, 0.0,
+        ], dtype=np.float32)
+        indices = np.array([0, 1, 2, 0, 2, 3], dtype=np.uint32)
+
+        self.vao = GL.glGenVertexArrays(1)
+        self.quad_vbo = GL.glGenBuffers(1)
+        self.ebo = GL.glGenBuffers(1)
+        self.instance_vbo = GL.glGenBuffers(1)
+
+        GL.glBindVertexArray(self.vao)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.quad_vbo)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL.GL_STATIC_DRAW)
+        GL.glBindBuffer(GL.GL_ELEMENT_ARRAY_BUFFER, self.ebo)
+        GL.glBufferData(GL.GL_ELEMENT_ARRAY_BUFFER, indices.nbytes, indices, GL.GL_STATIC_DRAW)
+        GL.glVertexAttribPointer(0, 2, GL.GL_FLOAT, GL.GL_FALSE, 16, ctypes.c_void_p(0))
+        GL.glEnableVertexAttribArray(0)
+        GL.glVertexAttribPointer(1, 2, GL.GL_FLOAT, GL.GL_FALSE, 16, ctypes.c_void_p(8))
+        GL.glEnableVertexAttribArray(1)
+
+        # 实例属性：每个实例前进一次
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.instance_vbo)
+        GL.glEnableVertexAttribArray(2)
+        GL.glVertexAttribDivisor(2, 1)
+        GL.glEnableVertexAttribArray(3)
+        GL.glVertexAttribDivisor(3, 1)
+        GL.glBindVertexArray(0)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+
+    def upload(self, view_id, uploader, data, width, height, gl_fmt):
+        """把一路画面上传到它在纹理数组中的那一层"""
+        group = self._view_group.get(view_id)
+        if group is None or (group.width, group.height) != (width, height):
+            group = self._assign(view_id, width, height)
+        uploader.upload([PlaneUpload(group.texture, data, width, height, 0, GL.GL_RGB, gl_fmt,
+                                     layer=group.layers[view_id])])
+        if view_id not in self._valid:
+            self._valid.add(view_id)
+            self._dirty = True
+
+    def _assign(self, view_id, width, height):
+        self.remove(view_id)
+        group = self._groups.get((width, height))
+        if group is None:
+            group = _LayerGroup(width, height, min(INITIAL_LAYERS, self.max_views))
+            self._groups[(width, height)] = group
+        if group.add(view_id, self.max_views):
+            # 扩容后同组其它画面的内容没了，等它们的下一帧
+            self._valid.difference_update(group.layers)
+        self._view_group[view_id] = group
+        self._dirty = True
+        return group
+
+    def remove(self, view_id):
+        """画面停止或换了尺寸：让出它占的层"""
+        group = self._view_group.pop(view_id, None)
+        if group is None:
+            return
+        group.layers.pop(view_id, None)
+        self._valid.discard(view_id)
+        if not group.layers:
+            group.release()
+            del self._groups[(group.width, group.height)]
+        self._dirty = True
+
+    def _rebuild(self, fb_w, fb_h):
+        """按网格重新生成实例数据，同一纹理数组的实例排在一起，一组一次绘制"""
+        cols, rows = grid_shape(self.max_views, fb_w, fb_h)
+        cell_w, cell_h = 2.0 / cols, 2.0 / rows
+        data = []
+        self._batches = []
+        for group in self._groups.values():
+            start = len(data)
+            for view_id, layer in sorted(group.layers.items()):
+                if view_id not in self._valid:
+                    continue
+                col, row = view_id % cols, view_id // cols
+                data.append((-1.0 + col * cell_w, 1.0 - (row + 1) * cell_h, cell_w, cell_h,
+                             group.width, group.height, layer))
+            if len(data) > start:
+                self._batches.append((group.texture, start, len(data) - start))
+
+        instances = np.array(data, dtype=np.float32).reshape(-1, INSTANCE_FLOATS)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.instance_vbo)
+        GL.glBufferData(GL.GL_ARRAY_BUFFER, max(instances.nbytes, INSTANCE_STRIDE),
+                        instances if data else None, GL.GL_DYNAMIC_DRAW)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        self._layout_key = (fb_w, fb_h)
+        self._dirty = False
+
+    def draw(self, fb_w, fb_h):
+        """把所有画面画到当前绑定的帧缓冲（fb_w × fb_h 像素）上"""
+        if self._dirty or self._layout_key != (fb_w, fb_h):
+            self._rebuild(fb_w, fb_h)
+
+        GL.glViewport(0, 0, fb_w, fb_h)
+        GL.glClearColor(0, 0, 0, 1)
+        GL.glClear(GL.GL_COLOR_BUFFER_BIT | GL.GL_DEPTH_BUFFER_BIT)
+        if not self._batches:
+            return
+
+        self.program.bind()
+        self.program.setUniformValue("viewportSize", float(fb_w), float(fb_h))
+        self.program.setUniformValue("frames", 0)
+        GL.glActiveTexture(GL.GL_TEXTURE0)
+        GL.glBindVertexArray(self.vao)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, self.instance_vbo)
+        for texture, start, count in self._batches:
+            # GL 3.3 没有 base instance，通过属性指针的偏移选中这一组实例
+            offset = start * INSTANCE_STRIDE
+            GL.glVertexAttribPointer(2, 4, GL.GL_FLOAT, GL.GL_FALSE, INSTANCE_STRIDE,
+                                     ctypes.c_void_p(offset))
+            GL.glVertexAttribPointer(3, 3, GL.GL_FLOAT, GL.GL_FALSE, INSTANCE_STRIDE,
+                                     ctypes.c_void_p(offset + 16))
+            GL.glBindTexture(GL.GL_TEXTURE_2D_ARRAY, texture)
+            GL.glDrawElementsInstanced(GL.GL_TRIANGLES, 6, GL.GL_UNSIGNED_INT, None, count)
+        GL.glBindTexture(GL.GL_TEXTURE_2D_ARRAY, 0)
+        GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
+        GL.glBindVertexArray(0)
+        self.program.release()
+
+    def release(self):
+        """释放纹理数组和缓冲，需在 GL 上下文中调用"""
+        for group in self._groups.values():
+            group.release()
+        self._groups.clear()
+        self._view_group.clear()
+        self._valid.clear()
+        self._batches = []
+        self._dirty = True
+        if self.vao is not None:
+            GL.glDeleteBuffers(3, [self.quad_vbo, self.ebo, self.instance_vbo])
+            GL.glDeleteVertexArrays(1, [self.vao])
+            self.vao = None
+
+
+def _load_shader(name):
+    path = os.path.join(os.path.dirname(__file__), "..", "shaders", name)
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,120 @@
+import av
+import json
+import time
+import bisect
+import threading
+from concurrent.futures import Future
+
+from .cache_dir import file_signature, cache_path, write_json_atomic
+
+_lock = threading.Lock()
+_loading = {}   # (路径, 大小, 修改时间) -> Future，结果为 KeyframeIndex，失败时为 None
+
+
+class KeyframeIndex:
+    """
+    单个文件的关键帧/PTS 索引，只做解复用扫描（不解码）。
+    结果按 路径+大小+修改时间 缓存在磁盘上，文件不变时秒开。
+    PTS 均为视频流 time_base 下的整数。
+    """
+    VERSION = 1
+
+    def __init__(self, keyframes, frames):
+        self.keyframes = keyframes    # 已排序的关键帧 PTS
+        self.frames = frames          # 已排序的全部帧 PTS
+
+    @classmethod
+    def build(cls, path):
+        keyframes = []
+        frames = []
+        with av.open(path) as container:
+            stream = container.streams.video[0]
+            for packet in container.demux(stream):
+                if packet.pts is None:
+                    continue
+                frames.append(packet.pts)
+                if packet.is_keyframe:
+                    keyframes.append(packet.pts)
+        keyframes.sort()
+        frames.sort()
+        return cls(keyframes, frames)
+
+    @classmethod
+    def shared(cls, path):
+        """
+        在后台读取或建立索引，返回 Future。同一文件（路径+大小+修改时间）只建一次，
+        重复的画面、分出去的解码器和重新打开的解码器都拿到同一个 Future，
+        冷缓存时不会有多个线程同时把整个文件解复用一遍。
+        """
+        key = tuple(file_signature(path))
+        with _lock:
+            future = _loading.get(key)
+            if future is None:
+                future = _loading[key] = Future()
+                threading.Thread(target=cls._load, args=(path, future), daemon=True).start()
+        return future
+
+    @classmethod
+    def _load(cls, path, future):
+        try:
+            future.set_result(cls.load_or_build(path))
+        except Exception as e:
+            print(f"[index] build failed for {path}: {e}")
+            future.set_result(None)
+
+    @classmethod
+    def load_or_build(cls, path):
+        signature = file_signature(path)
+        index_file = cache_path(path, ".keyframes.json")
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == cls.VERSION and data.get("signature") == signature:
+                return cls(data["keyframes"], data["frames"])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        t0 = time.perf_counter()
+        index = cls.build(path)
+        print(f"[index] {path}: {len(index.keyframes)} keyframes / {len(index.frames)} frames, "
+              f"scan {time.perf_counter() - t0:.2f}s")
+        try:
+            write_json_atomic(index_file, {
+                "version": cls.VERSION,
+                "signature": signature,
+                "keyframes": index.keyframes,
+                "frames": index.frames,
+            })
+        except OSError as e:
+            print(f"[index] failed to save {index_file}: {e}")
+        return index
+
+    def keyframe_before(self, pts):
+        """不晚于 pts 的最后一个关键帧"""
+        i = bisect.bisect_right(self.keyframes, pts) - 1
+        return self.keyframes[max(i, 0)] if self.keyframes else 0
+
+    def nearest_keyframe(self, pts):
+        """离 pts 最近的关键帧（前后都算）"""
+        if not self.keyframes:
+            return 0
+        i = bisect.bisect_left(self.keyframes, pts)
+        candidates = self.keyframes[max(i - 1, 0):i + 1]
+        return min(candidates, key=lambda k: abs(k - pts))
+
+    def frames_between(self, start, end):
+        """PTS 落在 [start, end) 内的帧数，即从 start 解码到 end 需要丢弃的帧数"""
+        return max(0, bisect.bisect_left(self.frames, end) - bisect.bisect_left(self.frames, start))
+
+    def seek_point(self, target, position=None):
+        """
+        选择代价最小的起点，返回 (起点 PTS, 需要解码丢弃的帧数, 是否需要 seek)。
+        position 为解码器当前位置：若它和目标在同一个 GOP 内且在目标之前，继续往前解码更便宜。
+        """
+        keyframe = self.keyframe_before(target)
+        cost = self.frames_between(keyframe, target)
+        if position is not None and keyframe <= position < target:
+            forward = self.frames_between(position, target)
+            if forward <= cost:
+                return position, forward, False
+        return keyframe, cost, True
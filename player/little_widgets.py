@@ -104,7 +104,7 @@ class SpeedMenu(PopUpContainer):
     def __init__(self, parent=None, callback=None):
         super().__init__(parent)
         layout = QVBoxLayout(self)
-        self.speeds = ["3倍", "2倍", "1.5倍", "1倍"]
+        self.speeds = ["8倍", "4倍", "3倍", "2倍", "1.5倍", "1倍"]
         self.btns = []
         for s in self.speeds:
             btn = QPushButton(s)
@@ -113,6 +113,13 @@ class SpeedMenu(PopUpContainer):
             layout.addWidget(btn)
             self.btns.append(btn)
 
+    def select(self, val):
+        """高亮当前倍速"""
+        for btn in self.btns:
+            btn.setProperty("class", "selected" if btn.text() == val else "")
+            btn.style().unpolish(btn)
+            btn.style().polish(btn)
+
 # ==========================================================
 # 3. 具体弹出内容：音量条
 # ==========================================================
@@ -0,0 +1,290 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from .cache_dir import cache_dir
+
+MB = 1024 * 1024
+
+
+def _pid_alive(pid):
+    """pid 对应的是否是另一个仍在运行的进程（本进程返回 False，它的旧文件可以删）"""
+    if pid == os.getpid():
+        return False
+    if os.name == "nt":
+        # Windows 上 os.kill 会结束进程；其它进程仍在映射的文件本来就删不掉，删除时自然跳过
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # 没有权限发信号：进程存在
+        return True
+    return True
+
+
+class LoopSpan:
+    """
+    一段连续解码的帧：从一次循环/区间跳转的 seek 开始，到文件结尾或下一次跳转为止。
+    帧数据就是帧池缓冲区的原始字节（upload_format 为 yuv 时即紧凑的平面 YUV），
+    放在内存里，或者被挤出内存后放在磁盘上的 mmap 文件里。
+    """
+    def __init__(self, key):
+        self.key = key
+        self.fmt = None           # 规格取第一帧的
+        self.width = 0
+        self.height = 0
+        self.frames = []          # [(pts, 数据, matrix, full_range)]
+        self.nbytes = 0
+        self.complete = False
+        self.end = None           # "eof"：录到文件结尾；"jump"：被区间跳转打断
+        self.jump_to = None       # 被跳转打断时跳去的位置
+        self.tier = "ram"
+        self.file = None
+
+    @property
+    def end_pts(self):
+        return self.frames[-1][0] if self.frames else None
+
+
+class LoopRecorder:
+    """解码线程在第一次循环时把送进队列的帧逐帧记下来"""
+    def __init__(self, cache, span):
+        self.cache = cache
+        self.span = span
+
+    def add(self, frame, pts):
+        """记录一帧；规格变化或超出预算时放弃整段，返回 False"""
+        span = self.span
+        if span.fmt is None:
+            span.fmt, span.width, span.height = frame.fmt, frame.width, frame.height
+        elif (frame.fmt, frame.width, frame.height) != (span.fmt, span.width, span.height):
+            self.abort()
+            return False
+        if not self.cache._reserve(span, frame.data.nbytes):
+            self.abort()
+            return False
+        span.frames.append((pts, frame.data.copy(), frame.matrix, frame.full_range))
+        span.nbytes += frame.data.nbytes
+        return True
+
+    def finish(self, end, jump_to=None):
+        if self.span.frames:
+            self.span.jump_to = jump_to
+            self.cache._finish(self.span, end)
+        else:
+            self.abort()
+
+    def abort(self):
+        self.cache._drop(self.span)
+
+
+class LoopReplay:
+    """从缓存的一段帧按顺序回放，拷进帧池缓冲区，不再解码"""
+    def __init__(self, span):
+        self.span = span
+        self.index = 0
+
+    def read(self, pool, accept=None):
+        """
+        返回 (缓冲区, pts)；放完返回 (None, None)，池已关闭时缓冲区为 None。
+        传入 accept(pts) 时，不需要的帧不拷贝，缓冲区为 None。
+        """
+        span = self.span
+        if self.index >= len(span.frames):
+            return None, None
+        pts, data, matrix, full_range = span.frames[self.index]
+        self.index += 1
+        if accept is not None and not accept(pts):
+            return None, pts
+
+        buf = pool.acquire(span.fmt, span.width, span.height)
+        if buf is None:
+            return None, pts
+        np.copyto(buf.data, data)
+        buf.matrix = matrix
+        buf.full_range = full_range
+        buf.pts = pts
+        return buf, pts
+
+
+class LoopCache:
+    """
+    循环短片段的解码帧缓存，所有面板共用一份内存/磁盘预算。
+
+    第一次循环时录下每段的帧，之后的循环直接回放，几乎不再消耗解码 CPU。
+    内存超出预算时按 LRU 把最久未用的片段挪到磁盘（mmap），磁盘也放不下时丢弃。
+    同一文件、同一输出规格的片段在面板之间共享。
+    """
+    _instance = None
+    _ram_default = 512 * MB
+    _disk_default = 2048 * MB
+
+    @classmethod
+    def configure(cls, ram_mb, disk_mb):
+        """在创建第一个面板之前调用，设置内存与磁盘预算（MB），0 表示不使用该层"""
+        if ram_mb is not None:
+            cls._ram_default = max(0, int(ram_mb)) * MB
+        if disk_mb is not None:
+            cls._disk_default = max(0, int(disk_mb)) * MB
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(cls._ram_default, cls._disk_default)
+        return cls._instance
+
+    def __init__(self, ram_budget, disk_budget):
+        self.ram_budget = ram_budget
+        self.disk_budget = disk_budget
+        self._lock = threading.Lock()
+        self._spans = OrderedDict()   # key -> LoopSpan，按最近使用排序
+        self.ram_used = 0
+        self.disk_used = 0
+
+        # 统计
+        self.hits = 0
+        self.recorded = 0
+        self.spilled = 0
+        self.evicted = 0
+
+        if self.disk_budget > 0:
+            self.clear_files()
+
+    @property
+    def enabled(self):
+        return self.ram_budget > 0
+
+    def _dir(self):
+        path = os.path.join(cache_dir(), "loop_frames")
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def lookup(self, key):
+        """取已录完的片段，命中时标记为最近使用"""
+        with self._lock:
+            span = self._spans.get(key)
+            if span is None or not span.complete:
+                return None
+            self._spans.move_to_end(key)
+            self.hits += 1
+            return span
+
+    def begin(self, key):
+        """开始录制一段；同一段已在缓存或正在被其它面板录制时返回 None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            if key in self._spans:
+                return None
+            span = LoopSpan(key)
+            self._spans[key] = span
+            return LoopRecorder(self, span)
+
+    def _reserve(self, span, nbytes):
+        """为录制中的片段预留内存，必要时把其它片段挤到磁盘或丢弃"""
+        with self._lock:
+            if span.key not in self._spans:
+                return False
+            while self.ram_used + nbytes > self.ram_budget:
+                victim = next((s for s in self._spans.values()
+                               if s.tier == "ram" and s.complete and s is not span), None)
+                if victim is None:
+                    return False
+                self._spill(victim)
+            self.ram_used += nbytes
+            return True
+
+    def _spill(self, span):
+        """把片段挪到磁盘；磁盘预算不足时按 LRU 丢弃磁盘上的片段，还不够就直接丢弃（需持有锁）"""
+        self.ram_used -= span.nbytes
+        if span.nbytes > self.disk_budget:
+            self._remove(span)
+            return
+        while self.disk_used + span.nbytes > self.disk_budget:
+            victim = next(s for s in self._spans.values() if s.tier == "disk")
+            self._remove(victim)
+
+        # 带上进程号：多进程模式下各屏幕的进程可能缓存同一片段
+        name = hashlib.sha1(repr(span.key).encode("utf-8")).hexdigest() + f".{os.getpid()}.yuv"
+        span.file = os.path.join(self._dir(), name)
+        try:
+            mm = np.memmap(span.file, dtype=np.uint8, mode="w+", shape=(span.nbytes,))
+        except OSError as e:
+            print(f"[loop-cache] spill failed: {e}")
+            span.file = None
+            self._remove(span)
+            return
+        offset = 0
+        frames = []
+        for pts, data, matrix, full_range in span.frames:
+            view = mm[offset:offset + data.nbytes]
+            view[:] = data
+            frames.append((pts, view, matrix, full_range))
+            offset += data.nbytes
+        mm.flush()
+        span.frames = frames
+        span.tier = "disk"
+        self.disk_used += span.nbytes
+        self.spilled += 1
+
+    def _remove(self, span, evicted=True):
+        """从缓存中移除（需持有锁）；正在回放的面板仍持有引用，放完后才真正释放"""
+        if self._spans.get(span.key) is span:
+            del self._spans[span.key]
+        if span.tier == "disk":
+            self.disk_used -= span.nbytes
+            try:
+                os.remove(span.file)
+            except OSError:
+                pass   # Windows 上仍被映射的文件删不掉，下次启动时清理
+        if evicted:
+            self.evicted += 1
+
+    def _finish(self, span, end):
+        with self._lock:
+            if self._spans.get(span.key) is not span:
+                return
+            span.end = end
+            span.complete = True
+            self.recorded += 1
+            print(f"[loop-cache] cached {len(span.frames)} frames "
+                  f"({span.nbytes / MB:.1f} MB) of {span.key[0][0]} @ {span.key[-1]:.2f}s")
+
+    def _drop(self, span):
+        with self._lock:
+            if span.tier == "ram" and self._spans.get(span.key) is span:
+                self.ram_used -= span.nbytes
+            self._remove(span, evicted=False)
+
+    def clear_files(self):
+        """
+        删除上次运行遗留的磁盘片段。文件名带写入进程的 pid，只删本进程和已经退出的进程的；
+        多进程模式下其它播放进程还在用的文件保留（Linux 上删掉仍在映射的文件不会报错，
+        不能靠删除失败来跳过）。
+        """
+        path = self._dir()
+        for name in os.listdir(path):
+            parts = name.split(".")
+            if len(parts) == 3 and parts[1].isdigit() and _pid_alive(int(parts[1])):
+                continue
+            try:
+                os.remove(os.path.join(path, name))
+            except OSError:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "spans": len(self._spans),
+                "ram_mb": self.ram_used / MB,
+                "disk_mb": self.disk_used / MB,
+                "hits": self.hits,
+                "recorded": self.recorded,
+                "spilled": self.spilled,
+                "evicted": self.evicted,
+            }
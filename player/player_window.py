@@ -122,8 +122,9 @@ class GLWindow(QOpenGLWindow):
 from PySide6.QtCore import Signal, Slot, Qt, QSize
 
 import sys
+import time
 import numpy as np
-from PySide6.QtCore import Signal, Slot, Qt, QSize
+from PySide6.QtCore import Signal, Slot, Qt, QSize, QTimer
 # from PySide6.QtGui import QOpenGLWindow, QMatrix4x4, QVector3D, QSurfaceFormat
 # from PySide6.QtOpenGL import QOpenGLShaderProgram, QOpenGLShader
 # from PySide6.QtWidgets import QApplication
@@ -133,6 +134,9 @@ from PySide6.QtCore import Signal, Slot, Qt, QSize
 from OpenGL.GL import *
 import ctypes
 
+from .gl_upload import PlaneUpload, PBOStreamer
+from .grid_compositor import GridCompositor
+
 class VideoGLWindow(QOpenGLWindow):
     # 【关键修改 1】定义信号：参数为 (图像数据bytes, 宽, 高, 格式)
     sig_frame_ready = Signal(int,bytes, int, int, str)
@@ -161,6 +165,7 @@ class VideoGLWindow(QOpenGLWindow):
 
         self._initialized = False
         self._frame_vaild = None
+        self._streamer = None
 
         # 【关键修改 2】连接信号到槽函数
         # Qt.QueuedConnection 确保槽函数一定在接收者所在的线程（主线程）执行
@@ -182,6 +187,7 @@ class VideoGLWindow(QOpenGLWindow):
         glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
 
         glClearColor(0.0, 0.0, 0.0, 1.0)
+        self._streamer = PBOStreamer()
         self._initialized = True
 
     def _init_shader(self):
@@ -326,17 +332,14 @@ class VideoGLWindow(QOpenGLWindow):
 
         # 此时已经在主线程，可以安全地操作 OpenGL
         self.makeCurrent()
-        
-        glBindTexture(GL_TEXTURE_2D, self.texture_id)
-        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
 
         gl_fmt = GL_RGB
         if fmt == "BGR": gl_fmt = GL_BGR
         elif fmt == "RGBA": gl_fmt = GL_RGBA
         elif fmt == "BGRA": gl_fmt = GL_BGRA
 
-        # 上传纹理
-        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, gl_fmt, GL_UNSIGNED_BYTE, data_bytes)
+        # 经 PBO 异步上传，尺寸不变时只做 glTexSubImage2D
+        self._streamer.upload([PlaneUpload(self._texture_id, data_bytes, width, height, 0, GL_RGB, gl_fmt)])
         
         glBindTexture(GL_TEXTURE_2D, 0)
 
@@ -357,13 +360,37 @@ class VideoGLWindow(QOpenGLWindow):
             self.showNormal()
 
 class MultiVideoWindow(VideoGLWindow): # 继承你之前的类
+    # (view_id, 槽号)：该路的帧槽环里有新帧
+    sig_slot_ready = Signal(int, int)
+
+    # 每隔多少秒打印一次 GUI 线程的 GL 统计
+    STATS_INTERVAL = 10
+
     def __init__(self, max_views=4):
         super().__init__()
         self.max_views = max_views
-        # 存储多个画面的数据 {index: texture_id}
-        self.textures = {} 
+        # 所有画面的纹理数组与一次实例化绘制
+        self.compositor = None
         # 存储每个画面的宽和高
         self.frame_info = {} 
+        # 每个画面一条 PBO 上传环
+        self.streamers = {}
+        # 每个画面与解码线程之间的帧槽环 {view_id: FrameSlotRing}
+        self.rings = {}
+        self.sig_slot_ready.connect(self.upload_slot, Qt.QueuedConnection)
+
+        # 新帧先记下来，等下一次刷新时在 paintGL 里一次性上传：
+        # 每次刷新只进入一次 GL 上下文，同一路在两次刷新之间的多帧只传最新的一帧
+        self._dirty_views = set()
+        self._pending_bytes = {}   # view_id -> (data_bytes, w, h, fmt)，经 sig_frame_ready 送来的帧
+
+        # GUI 线程的 GL 统计
+        self.gl_stats = {"gl_entries": 0, "uploads": 0, "unchanged": 0, "superseded": 0}
+        self._stats_mark = (time.perf_counter(), dict(self.gl_stats))
+        self._stats_timer = QTimer(self)
+        self._stats_timer.setInterval(self.STATS_INTERVAL * 1000)
+        self._stats_timer.timeout.connect(self._report_stats)
+        self._stats_timer.start()
 
         self.video_width = 0
         self.video_height = 0
@@ -372,14 +399,11 @@ class MultiVideoWindow(VideoGLWindow): # 继承你之前的类
 
         print("MultiVideoWindow initializeGL....")
         super().initializeGL()
-        # 初始化时预生成多个纹理ID
+        self.compositor = GridCompositor(self, self.max_views)
+        self.compositor.initialize()
         for i in range(self.max_views):
-            tex_id = int(glGenTextures(1))
-            glBindTexture(GL_TEXTURE_2D, tex_id)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
-            glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
-            self.textures[i] = tex_id
             self.frame_info[i] = (False,0, 0,None,"RGB")
+            self.streamers[i] = PBOStreamer(2)
 
     @Slot(int, bytes, int, int, str)
     def upload_texture_slot(self, view_id, data_bytes, width, height, fmt):
@@ -391,31 +415,75 @@ class MultiVideoWindow(VideoGLWindow): # 继承你之前的类
 
         # # 请求重绘
         # self.update()
-        if view_id not in self.textures: return
+        if view_id >= self.max_views: return
 
-        self.makeCurrent() # 必须在操作 GL 前调用
-        
-        # 1. 获取该通道缓存的状态
-        # 我们需要存储宽高来判断是否需要用 SubImage2D
-        valid, old_w, old_h, _, old_fmt = self.frame_info.get(view_id, (False, 0, 0, None, "RGB"))
-        
-        glBindTexture(GL_TEXTURE_2D, self.textures[view_id])
-        glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
+        # 只缓存，上传推迟到下一次刷新；上一帧还没来得及上传就被新帧替换
+        if view_id in self._pending_bytes:
+            self.gl_stats["superseded"] += 1
+        self._pending_bytes[view_id] = (data_bytes, width, height, fmt)
+        self._dirty_views.add(view_id)
+        self.update()
+
+    def attach_ring(self, view_id, ring):
+        self.rings[view_id] = ring
 
+    @Slot(int, int)
+    def upload_slot(self, view_id, slot_index):
+        """
+        帧槽环有新帧：标记该路待上传并请求一次刷新（多次请求由 Qt 合并）。
+        真正上传时取的是那一刻最新的槽，中间被覆盖的帧由帧槽环计为丢弃。
+        在上传之前不清除通知，这一路在两次刷新之间最多只发一次信号。
+        """
+        if view_id in self.rings:
+            self._dirty_views.add(view_id)
+            self.update()
+
+    def _flush_uploads(self):
+        """在 paintGL 里（上下文已是当前的）上传所有有新帧的画面"""
+        dirty, self._dirty_views = self._dirty_views, set()
+        for view_id in dirty:
+            if view_id not in self.streamers:
+                continue
+            pending = self._pending_bytes.pop(view_id, None)
+            if pending is not None:
+                self.upload_view(view_id, *pending)
+                self.gl_stats["uploads"] += 1
+            ring = self.rings.get(view_id)
+            if ring is None:
+                continue
+            slot = ring.acquire()
+            if slot is None:
+                # 通知之后没有更新的帧（已经上传过），内容没变，跳过
+                self.gl_stats["unchanged"] += 1
+                continue
+            try:
+                # 上传时数据已拷进 PBO（或同步拷进纹理），之后槽就可以交还给解码线程
+                self.upload_view(view_id, slot.data, slot.width, slot.height, slot.fmt)
+                self.gl_stats["uploads"] += 1
+            finally:
+                ring.release()
+
+    def _report_stats(self):
+        now = time.perf_counter()
+        t0, before = self._stats_mark
+        self._stats_mark = (now, dict(self.gl_stats))
+        dt = now - t0
+        rate = {k: (v - before[k]) / dt for k, v in self.gl_stats.items()}
+        dropped = sum(r.dropped for r in self.rings.values())
+        print(f"[multi] {rate['gl_entries']:.1f} GL entries/s, {rate['uploads']:.1f} uploads/s, "
+              f"{rate['unchanged']:.1f} unchanged/s, {rate['superseded']:.1f} superseded/s, "
+              f"{dropped} frames dropped in slot rings")
+
+    def upload_view(self, view_id, data_bytes, width, height, fmt):
+        """把一路画面上传到它在纹理数组中的那一层；调用方负责让 GL 上下文处于当前状态"""
         gl_fmt = GL_BGR if fmt == "BGR" else GL_RGB
 
-        # 2. 性能分水岭：如果是第一次或分辨率变了，执行 glTexImage2D (买新房)
-        if not valid or old_w != width or old_h != height:
-            glTexImage2D(GL_TEXTURE_2D, 0, GL_RGB, width, height, 0, gl_fmt, GL_UNSIGNED_BYTE, data_bytes)
-        else:
-            # 3. 绝大多数情况下执行 glTexSubImage2D (换家具)，效率极高
-            glTexSubImage2D(GL_TEXTURE_2D, 0, 0, 0, width, height, gl_fmt, GL_UNSIGNED_BYTE, data_bytes)
+        # 写入该通道的 PBO 环后异步拷到纹理数组；分辨率变化时换到对应尺寸的数组
+        self.compositor.upload(view_id, self.streamers[view_id], data_bytes, width, height, gl_fmt)
 
         # 4. 存储状态，注意：这里不再把 data_bytes 存进内存字典，避免内存爆涨
         # 我们只存宽高给 Shader 用
         self.frame_info[view_id] = (True, width, height, None, fmt)
-        
-        self.update()
 
     def paintGL(self):
         # glClearColor(0, 0, 0, 1)
@@ -502,49 +570,20 @@ class MultiVideoWindow(VideoGLWindow): # 继承你之前的类
         # glBindVertexArray(0)
         # self.program.release()
 
-        glClearColor(0, 0, 0, 1)
-        glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-
-        self.program.bind()
-        glBindVertexArray(self.vao)
-
+        # 每次刷新唯一一次进入 GL：先上传所有有新帧的画面，再合成
+        self.gl_stats["gl_entries"] += 1
+        if self.compositor is None:
+            return
+        self._flush_uploads()
         dpr = self.devicePixelRatio()
-        fb_w, fb_h = int(self.width() * dpr), int(self.height() * dpr)
-
-        cols = 3
-        col_n = (self.max_views + cols - 1) // cols
-        cell_w, cell_h = fb_w / cols, fb_h / col_n
+        self.composite(int(self.width() * dpr), int(self.height() * dpr))
 
-        for i in range(self.max_views):
-            # 从缓存读取该画面的属性
-            valid, vw, vh, _, _ = self.frame_info.get(i, (False, 0, 0, None, None))
-            if not valid: continue
-
-            # 计算网格坐标 (OpenGL y轴从底向上)
-            row_idx = i // cols
-            grid_y = (col_n - 1 - row_idx) * cell_h 
-            grid_x = (i % cols) * cell_w
-
-            # --- 设置 Shader 需要的三个关键 Uniform ---
-            # 1. 视口大小（当前格子的像素宽和高）
-            glViewport(int(grid_x), int(grid_y), int(cell_w), int(cell_h))
-            
-            # 2. 传递给你的 Shader 进行比例计算
-            self.program.setUniformValue("videoSize", float(vw), float(vh))
-            self.program.setUniformValue("widgetSize", float(cell_w), float(cell_h))
-
-            # 3. 纹理绑定
-            glActiveTexture(GL_TEXTURE0)
-            glBindTexture(GL_TEXTURE_2D, self.textures[i])
-            #self.program.setUniformValue("tex", 0)
-
-            glDrawElements(GL_TRIANGLES, 6, GL_UNSIGNED_INT, None)
-
-        glBindVertexArray(0)
-        self.program.release()
+    def composite(self, fb_w, fb_h):
+        """把各路画面按网格画到当前绑定的帧缓冲（fb_w × fb_h 像素）上，一次实例化绘制"""
+        self.compositor.draw(fb_w, fb_h)
 
     def stop(self):
-        pass
+        self._stats_timer.stop()
 
     def closeEvent(self, event):
         self.sig_stop.emit()
@@ -0,0 +1,96 @@
+import os
+import json
+import threading
+
+import av
+
+from .cache_dir import cache_dir, file_signature, write_json_atomic
+
+PROBE_FILE = "probe_cache.json"
+VERSION = 1
+
+_lock = threading.Lock()
+_entries = None   # 绝对路径 -> {"signature": [...], "info": {...}}
+
+
+def _cache_file():
+    return os.path.join(cache_dir(), PROBE_FILE)
+
+
+def _load():
+    global _entries
+    if _entries is not None:
+        return _entries
+    _entries = {}
+    try:
+        with open(_cache_file(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == VERSION:
+            _entries = data.get("entries", {})
+    except (OSError, ValueError):
+        pass
+    return _entries
+
+
+def probe_container(path):
+    """真正打开容器读取视频流信息，不解码"""
+    with av.open(path) as container:
+        stream = container.streams.video[0]
+        ctx = stream.codec_context
+
+        if stream.duration is not None:
+            duration = float(stream.duration * stream.time_base)
+        elif container.duration is not None:
+            duration = container.duration / av.time_base
+        else:
+            duration = 0.0
+
+        fps = float(stream.average_rate) if stream.average_rate else 0.0
+        rotation = int(float(stream.metadata.get("rotate", 0) or 0))
+
+        return {
+            "width": stream.width,
+            "height": stream.height,
+            "duration": duration,
+            "fps": fps,
+            "codec": ctx.name,
+            "pix_fmt": ctx.pix_fmt,
+            "rotation": rotation,
+        }
+
+
+def probe(path):
+    """
+    读取视频信息（宽、高、时长、帧率、编码、像素格式、旋转角度）。
+    结果按 路径+大小+修改时间 缓存在配置文件旁边，文件不变时不再打开容器。
+    """
+    key = os.path.abspath(path)
+    signature = file_signature(path)
+    with _lock:
+        entry = _load().get(key)
+        if entry is not None and entry.get("signature") == signature:
+            return dict(entry["info"])
+
+    info = probe_container(path)
+
+    with _lock:
+        entries = _load()
+        entries[key] = {"signature": signature, "info": info}
+        try:
+            write_json_atomic(_cache_file(), {"version": VERSION, "entries": entries})
+        except OSError as e:
+            print(f"[probe] failed to save probe cache: {e}")
+    return dict(info)
+
+
+def cached_resolution(path):
+    """
+    只查探测缓存、不访问视频文件，返回上次探测到的 (宽, 高)，没有时为 None。
+    文件可能已经变了，结果只用来在真正探测完之前先排版。
+    """
+    with _lock:
+        entry = _load().get(os.path.abspath(path))
+    if entry is None:
+        return None
+    info = entry["info"]
+    return info["width"], info["height"]
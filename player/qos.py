@@ -0,0 +1,95 @@
+class FrameQoS:
+    """
+    单个面板的迟帧 QoS：解码跟不上时逐级丢帧，让画面追上时钟。
+
+    每显示一帧记录它比应显示的时刻晚了多少，每 WINDOW 帧统计一次：
+    迟到的比例超过 LATE_RATIO 就升一级，连续 RECOVER_WINDOWS 个窗口没有迟到就降一级。
+      0 normal        正常显示每一帧
+      1 drop-upload   到期的帧后面还有到期的帧时不上传，直接换下一帧
+      2 drop-convert  已经落后时钟的原始帧不做像素转换
+      3 skip-nonref   编解码器跳过非参考帧（共享解码的面板不用这一级）
+    到了最高一级仍落后 RESYNC_SECONDS 以上时，时钟直接对齐到当前帧，不再无限落后。
+    """
+    LEVELS = ("normal", "drop-upload", "drop-convert", "skip-nonref")
+    DROP_UPLOAD = 1
+    DROP_CONVERT = 2
+    SKIP_NONREF = 3
+
+    WINDOW = 30
+    LATE_RATIO = 0.2
+    RECOVER_WINDOWS = 3
+    # 晚了超过这么多帧间隔算迟到
+    LATE_FRAMES = 1.5
+    RESYNC_SECONDS = 1.0
+
+    def __init__(self, name, frame_interval, max_level=SKIP_NONREF):
+        self.name = name
+        self.frame_interval = frame_interval
+        self.max_level = max_level
+        self.level = 0
+        self._window = 0
+        self._window_late = 0
+        self._clean = 0
+
+        # 统计
+        self.counters = {
+            "presented": 0,
+            "late": 0,
+            "dropped_upload": 0,
+            "dropped_convert": 0,
+            "escalations": 0,
+            "resyncs": 0,
+        }
+        self.max_lateness = 0.0
+
+    def on_present(self, lateness):
+        """显示一帧时调用（lateness 单位秒）；返回 True 表示应把时钟对齐到这一帧"""
+        counters = self.counters
+        counters["presented"] += 1
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+        if lateness > self.LATE_FRAMES * self.frame_interval:
+            counters["late"] += 1
+            self._window_late += 1
+
+        self._window += 1
+        if self._window >= self.WINDOW:
+            ratio = self._window_late / self._window
+            self._window = 0
+            self._window_late = 0
+            if ratio > self.LATE_RATIO:
+                self._clean = 0
+                if self.level < self.max_level:
+                    self._set_level(self.level + 1)
+                    counters["escalations"] += 1
+            elif ratio == 0:
+                self._clean += 1
+                if self._clean >= self.RECOVER_WINDOWS and self.level > 0:
+                    self._clean = 0
+                    self._set_level(self.level - 1)
+            else:
+                self._clean = 0
+
+        if self.level >= self.max_level and lateness > self.RESYNC_SECONDS:
+            counters["resyncs"] += 1
+            return True
+        return False
+
+    def _set_level(self, level):
+        print(f"[qos] {self.name}: {self.LEVELS[self.level]} -> {self.LEVELS[level]}")
+        self.level = level
+
+    def set_max_level(self, level):
+        """共享解码时不能单独跳帧，最高只到 drop-convert"""
+        self.max_level = level
+        if self.level > level:
+            self._set_level(level)
+
+    def drop_upload(self):
+        self.counters["dropped_upload"] += 1
+
+    def drop_convert(self):
+        self.counters["dropped_convert"] += 1
+
+    def stats(self):
+        return dict(self.counters, level=self.LEVELS[self.level], max_lateness=self.max_lateness)
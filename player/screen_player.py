@@ -1,16 +1,22 @@
 import math
-import av
+from concurrent.futures import ThreadPoolExecutor
 
 from PySide6.QtCore import Qt, Signal,QTimer,QPoint,QRect
-from PySide6.QtWidgets import QWidget, QGridLayout,QPushButton,QSizePolicy,QHBoxLayout,QSpacerItem
+from PySide6.QtWidgets import QWidget, QGridLayout,QPushButton,QSizePolicy,QHBoxLayout,QSpacerItem,QLabel
 from PySide6.QtGui import QGuiApplication
 import subprocess
 from .video_player import VideoPlayer
+from .video_panel import VideoPanel
+from .probe_cache import probe, cached_resolution
+from . import startup_report
 
 from .frameless_window import FramelessDraggableWindow
 from PySide6.QtOpenGLWidgets import QOpenGLWidget
 
 
+# 所有屏幕共用的线程池：并行探测视频、打开容器
+OPEN_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="open")
+
 FLAG_FULL_WINDOW = 0b0001  # 1
 FLAG_FULL_SCREEN = 0b0010  # 2
 
@@ -18,9 +24,8 @@ FLAG_FULL_SCREEN = 0b0010  # 2
 # 工具函数：读取视频分辨率
 # ------------------------------------------------------------
 def get_video_size(path):
-    container = av.open(path)
-    stream = container.streams.video[0]
-    return stream.width, stream.height
+    info = probe(path)
+    return info["width"], info["height"]
 
 
 # ------------------------------------------------------------
@@ -57,8 +62,24 @@ def probe_resolution(path):
     return get_video_size(path)
     return int(w), int(h)
 
+# 可以写在屏幕级别、被该屏幕下所有视频继承的配置项
+INHERITED_KEYS = ("upload_format", "pbo_upload", "decode_scale", "present_mode", "thread_type",
+                  "loop_cache_seconds", "shared_decode")
+
+def video_config(screen_cfg, video):
+    """合并屏幕级别的默认配置，视频自身的配置优先"""
+    cfg = dict(video)
+    for key in INHERITED_KEYS:
+        if key in screen_cfg and key not in cfg:
+            cfg[key] = screen_cfg[key]
+    return cfg
+
 TITLE_BAR_HEIGHT = 30
 class ScreenPlayer(FramelessDraggableWindow):
+    # 后台任务完成的通知：(序号, 结果或异常)
+    _probed = Signal(int, object)
+    _decoder_ready = Signal(int, object)
+
     def __init__(self, screen, videos, hwaccel,flag = 0):
         super().__init__(None,flag)
 
@@ -67,6 +88,8 @@ class ScreenPlayer(FramelessDraggableWindow):
         # 屏幕尺寸
         self.screen_w = screen.width
         self.screen_h = screen.height
+        self.screen_x = screen.x
+        self.screen_y = screen.y
 
         self.full_screen = False
         self.full_window = False
@@ -122,23 +145,78 @@ class ScreenPlayer(FramelessDraggableWindow):
         title_bar_layout.setContentsMargins(0,0,0,0)
 
 
-        # 读取所有视频分辨率
-        video_infos = []
-        for video in videos["video"]:
-            print("video:",video)
-            path = video["path"]
-            vw, vh = probe_resolution(path)
-            video_infos.append({
-                "path": path,
-                "w": vw,
-                "h": vh,
-                "ar": vw / vh,
-                "config":video
-            })
+        # 探测和打开解码器都放到线程池里并行进行。窗口先按探测缓存里上次的分辨率
+        # （没有时按 16:9）排好占位格子；每个视频探测完立即开始打开它的解码器，
+        # 不等其它视频，真实分辨率让网格列数变化时才重新排版。哪个解码器先准备好就先创建哪个画面
+        self.hwaccel = hwaccel
+        self.flag = flag
+        self.cols_override = videos.get("cols")
+        self._stopped = False
+        self._video_cfgs = [video_config(videos, video) for video in videos["video"]]
+        self.video_infos = [None] * len(self._video_cfgs)
+        self._sizes = [cached_resolution(cfg["path"]) for cfg in self._video_cfgs]   # 排版用的分辨率
+        self._cols = None
+        self._cells = {}          # 序号 -> (row, col)
+        self._placeholders = {}   # 序号 -> 占位控件
+        self._players = {}        # 序号 -> 已创建的画面
+
+        self._probed.connect(self._on_probed)
+        self._decoder_ready.connect(self._on_decoder_ready)
+
+        self._build_layout()
+        for i, cfg in enumerate(self._video_cfgs):
+            print("video:",cfg)
+            startup_report.expect(self._startup_key(i))
+            OPEN_POOL.submit(self._probe_job, i, cfg["path"])
+
+    # ------------------------------------------------------------
+    # 后台任务（在线程池中执行，结果通过信号回到 GUI 线程）
+    # ------------------------------------------------------------
+    def _probe_job(self, i, path):
+        try:
+            self._probed.emit(i, probe_resolution(path))
+        except Exception as e:
+            self._probed.emit(i, e)
+
+    def _open_job(self, i, cfg):
+        try:
+            self._decoder_ready.emit(i, VideoPanel.create_decoder(cfg["path"], cfg, self.hwaccel))
+        except Exception as e:
+            self._decoder_ready.emit(i, e)
+
+    def _on_probed(self, i, result):
+        if self._stopped:
+            return
+        cfg = self._video_cfgs[i]
+        if isinstance(result, Exception):
+            print(f"[ERROR] probe failed for {cfg['path']}: {result}")
+            self._placeholders[i].setText("加载失败")
+            key = self._startup_key(i)
+            startup_report.done(key, f"failed {key}")
+            return
 
+        vw, vh = result
+        self.video_infos[i] = {
+            "path": cfg["path"],
+            "w": vw,
+            "h": vh,
+            "ar": vw / vh,
+            "config": cfg
+        }
+        startup_report.mark(f"probed {cfg['path']}")
+        OPEN_POOL.submit(self._open_job, i, cfg)
+
+        if self._sizes[i] != (vw, vh):
+            self._sizes[i] = (vw, vh)
+            self._update_grid()
+
+    def _grid_cols(self):
+        """按目前已知的分辨率计算网格列数（还不知道的按 16:9）"""
+        if self.cols_override:
+            return self.cols_override
+        video_infos = [{"w": size[0], "h": size[1]} if size else {"w": 16, "h": 9}
+                       for size in self._sizes]
         n = len(video_infos)
-        if n == 0:
-            return
 
         # 枚举所有 rows / cols 组合，寻找面积最大方案
         best = None
@@ -167,27 +245,87 @@ class ScreenPlayer(FramelessDraggableWindow):
                     "area": total_area
                 }
 
-        rows = best["rows"]
-        cols = best["cols"]
+        return best["cols"]
+
+    def _cell(self, i):
+        return i // self._cols + 1, i % self._cols
+
+    def _build_layout(self):
+        """按目前已知的分辨率计算布局，立即放好所有占位格子"""
+        if self._video_cfgs:
+            self._cols = self._grid_cols()
+        for i in range(len(self._video_cfgs)):
+            self._cells[i] = self._cell(i)
+            placeholder = QLabel("加载中...", self)
+            placeholder.setAlignment(Qt.AlignCenter)
+            placeholder.setStyleSheet("background-color: black; color: gray;")
+            self.layout.addWidget(placeholder, *self._cells[i])
+            self._placeholders[i] = placeholder
+        startup_report.mark(f"layout {self._layout_key()}")
+
+    def _update_grid(self):
+        """某一路的真实分辨率与排版时的假设不同：网格列数变了才把格子挪到新位置"""
+        cols = self._grid_cols()
+        if cols == self._cols:
+            return
+        print(f"[layout] {self._layout_key()}: {self._cols} -> {cols} columns")
+        self._cols = cols
+        for i in range(len(self._video_cfgs)):
+            cell = self._cell(i)
+            self._cells[i] = cell
+            panel = self._players.get(i)
+            if panel is not None:
+                self.panel_positions[panel] = cell
+                if self.full_window and panel is self.full_panel:
+                    # 全窗的画面占满网格，退出全窗时再回到新位置
+                    continue
+            widget = panel if panel is not None else self._placeholders[i]
+            self.layout.removeWidget(widget)
+            self.layout.addWidget(widget, *cell)
+
+    def _layout_key(self):
+        return f"screen {self.screen_x},{self.screen_y}"
+
+    def _startup_key(self, i):
+        return f"{self.screen_x},{self.screen_y}#{i} {self._video_cfgs[i]['path']}"
+
+    def _on_decoder_ready(self, i, result):
+        info = self.video_infos[i]
+        if self._stopped:
+            if not isinstance(result, Exception):
+                result.close()
+            return
+        if isinstance(result, Exception):
+            print(f"[ERROR] failed to open {info['path']}: {result}")
+            self._placeholders[i].setText("加载失败")
+            key = self._startup_key(i)
+            startup_report.done(key, f"failed {key}")
+            return
+        startup_report.mark(f"decoder ready {info['path']}")
 
+        r, c = self._cells[i]
+        panel = VideoPlayer(info["path"],info["config"], self.hwaccel,self,self.flag,result)
+        panel.video_panel.startup_key = self._startup_key(i)
 
-        if  "cols" in videos:
-            cols = videos["cols"]
+        panel.request_fullwindow.connect(self.toggle_fullwindow)
+        panel.request_fullscreen.connect(self.toggle_fullscreen)
 
-        # 按最佳布局放置视频
-        for i, info in enumerate(video_infos):
-            r = i // cols+ 1
-            c = i % cols
-            panel = VideoPlayer(info["path"],info["config"], hwaccel,self,flag)
+        placeholder = self._placeholders.pop(i)
+        self.layout.removeWidget(placeholder)
+        placeholder.deleteLater()
 
-            panel.request_fullwindow.connect(self.toggle_fullwindow)
-            panel.request_fullscreen.connect(self.toggle_fullscreen)
+        self.layout.addWidget(panel, r , c)
+        self.panels.append(panel)
+        self._players[i] = panel
+        self.panel_positions[panel] = (r, c)
 
-            layout.addWidget(panel, r , c)
-            self.panels.append(panel)
-            self.panel_positions[panel] = (r, c)
+        # 全窗状态下后到的画面先隐藏，全屏状态下按原始分辨率解码
+        if self.full_window and self.full_panel is not None:
+            panel.hide()
+        self.update_decode_resolution()
 
     def stop(self):
+        self._stopped = True
         for panel in self.panels:
             panel.stop()
 
@@ -200,6 +338,7 @@ class ScreenPlayer(FramelessDraggableWindow):
             self.exit_pseudo_fullscreen()
         else:
             self.enter_pseudo_fullscreen()
+        self.update_decode_resolution()
 
     # def min_window(self):
     #     self.showMinimized()
@@ -231,6 +370,13 @@ class ScreenPlayer(FramelessDraggableWindow):
             for p in self.panels:
                 p.show()
 
+        self.update_decode_resolution()
+
+    def update_decode_resolution(self):
+        """全屏时所有画面、全窗时放大的画面按原始分辨率解码，其余按格子尺寸缩放"""
+        for p in self.panels:
+            native = self.full_screen or (self.full_window and p is self.full_panel)
+            p.video_panel.set_native_resolution(bool(native))
         
 
 
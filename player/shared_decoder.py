@@ -0,0 +1,395 @@
+import os
+import json
+import threading
+
+from .video_decoder import VideoDecoder, PlanarFrame
+from .frame_pool import FramePool
+
+# 共享源最多为落后的面板保留多少帧，超过后把最慢的面板分出去单独解码
+RING_LIMIT = 24
+
+_sources = {}
+_sources_lock = threading.Lock()
+
+
+def source_key(path, output_format, thread_type, hwaccel, play_sections):
+    """播放设置兼容（同一文件、同一输出格式、同样的播放区间）的面板才能共享解码"""
+    return (os.path.abspath(path), output_format, thread_type, hwaccel,
+            json.dumps(play_sections or [], sort_keys=True))
+
+
+def open_shared(path, hwaccel, output_format, thread_type, play_sections):
+    """
+    打开（或加入已有的）共享解码源，返回该面板自己的 SharedDecoder。
+    会阻塞在打开容器上；同一文件的多个请求只打开一次，其余的等它打开完。
+    """
+    key = source_key(path, output_format, thread_type, hwaccel, play_sections)
+    open_args = (path, hwaccel, output_format, thread_type)
+    with _sources_lock:
+        source = _sources.get(key)
+        owner = source is None or source.closed
+        if owner:
+            source = SharedSource(key, open_args)
+            _sources[key] = source
+
+    if owner:
+        try:
+            source.open()
+        except Exception:
+            with _sources_lock:
+                if _sources.get(key) is source:
+                    del _sources[key]
+            raise
+    else:
+        source.ready.wait()
+
+    handle = source.attach()
+    if handle is None:
+        # 源刚好被关闭（或打开失败），单独解码
+        handle = SharedDecoder(None, open_args, VideoDecoder(*open_args))
+    return handle
+
+
+class SharedFrame(PlanarFrame):
+    """共享源缓冲区的一次引用，每个面板各持一份，全部释放后缓冲区才回到帧池"""
+    def __init__(self, source, buf):
+        super().__init__(buf.fmt, buf.width, buf.height, buf.planes, buf.plane_widths,
+                         buf.matrix, buf.full_range, owner=buf)
+        self.data = buf.data
+        self.pts = buf.pts
+        self._source = source
+
+    def release(self):
+        if self._owner is not None:
+            self._source._unref(self._owner)
+            self._owner = None
+
+
+class _Entry:
+    __slots__ = ("epoch", "buf", "pts")
+
+    def __init__(self, epoch, buf, pts):
+        self.epoch = epoch
+        self.buf = buf     # None：pts 也为 None 时表示文件结尾，否则是所有面板都不要、没有转换的帧
+        self.pts = pts
+
+
+class SharedSource:
+    """
+    同一文件被多个面板播放时只解码一次。
+
+    解码出的帧放进一个环里，每个订阅的面板有自己的读位置，读到环头时由该面板所在的
+    工作线程解码下一帧。缓冲区按引用计数管理，环和所有面板都释放后才归还帧池。
+    循环回起点/跳到下一区间时，第一个到达的面板让解码器 seek 并开始新一轮（epoch），
+    其余面板做同样的 seek 时直接接上新一轮；用户 seek、拖动进度条或暂停太久（落后
+    超过 RING_LIMIT 帧）的面板分出去单独解码。
+    """
+    def __init__(self, key, open_args):
+        self.key = key
+        self.open_args = open_args
+        self.decoder = None
+        self.pool = None
+        self.ready = threading.Event()
+        self.closed = False
+
+        self._lock = threading.RLock()
+        # 引用计数单独用一把小锁：面板释放帧时不必等持有 self._lock 的解码
+        self._ref_lock = threading.Lock()
+        self._ring = []
+        self._base_seq = 0        # _ring[0] 的序号
+        self._head_seq = 0        # 下一帧的序号
+        self.epoch = 0
+        self.epoch_target = None
+        self.epoch_start_seq = 0
+        self.consumers = []
+
+        # 统计
+        self.decoded = 0
+        self.delivered = 0
+        self.forks = 0
+
+    def open(self):
+        try:
+            self.decoder = VideoDecoder(*self.open_args)
+            stream = self.decoder.stream
+            self.pool = FramePool(RING_LIMIT + 12, "rgb24", stream.width, stream.height)
+        except Exception:
+            self.closed = True
+            raise
+        finally:
+            self.ready.set()
+
+    def attach(self):
+        """
+        订阅共享源，从环里最早的帧开始读，与已在播放的面板保持同步；
+        打开失败或已关闭时返回 None。
+        """
+        with self._lock:
+            if self.closed or self._head_seq - self._base_seq > RING_LIMIT:
+                return None
+            handle = SharedDecoder(self, self.open_args)
+            handle.cursor = self._base_seq
+            handle.epoch = self._ring[0].epoch if self._ring else self.epoch
+            self.consumers.append(handle)
+            self._apply_output_size()
+            return handle
+
+    # ------------------------------------------------------------
+    # 供 SharedDecoder 调用，除 _blocked 和 _unref 外均需持有 self._lock
+    # ------------------------------------------------------------
+    def _read(self, handle):
+        if handle.cursor == self._head_seq:
+            # 解码耗时记在触发这次解码的面板上
+            self.decoder.timings = handle.timings
+            buf, pts = self.decoder.read_frame(self.pool, self._accept)
+            if buf is not None:
+                buf.refs = 1
+                self.decoded += 1
+            self._ring.append(_Entry(self.epoch, buf, pts))
+            self._head_seq += 1
+            self._limit_lag(handle)
+
+        entry = self._ring[handle.cursor - self._base_seq]
+        handle.cursor += 1
+        frame = None
+        if entry.buf is not None:
+            # 先加引用再整理环，否则最后一个读者会把刚取到的缓冲区提前归还
+            with self._ref_lock:
+                entry.buf.refs += 1
+            self.delivered += 1
+            frame = SharedFrame(self, entry.buf)
+        self._trim()
+        return frame, entry.pts
+
+    def _accept(self, pts):
+        """
+        只要还有订阅者要这一帧就做像素转换；所有订阅者都会丢弃的帧只在环里留下 pts。
+        这里在触发解码的面板的线程上运行，只做只读判断；各面板自己的取舍和计数
+        在它读到这一帧时由它自己的线程完成（见 SharedDecoder.read_frame）。
+        """
+        return any(h.wants is None or h.wants(pts) for h in self.consumers)
+
+    def _seek(self, handle, seconds):
+        """循环/区间跳转的 seek：跟上别人已经开始的新一轮，或者自己开始新一轮"""
+        if handle.epoch == self.epoch - 1 and self.epoch_target == seconds:
+            handle.epoch = self.epoch
+            handle.cursor = max(handle.cursor, self.epoch_start_seq)
+            self._trim()
+            return True
+        if handle.epoch == self.epoch and self.epoch_target == seconds and handle.last_pts is None:
+            # 刚加入、还没读过帧的面板做启动时的同一个 seek：本轮就是从那里开始的
+            return True
+        if handle.epoch != self.epoch:
+            return False
+
+        # 还停留在上一轮的面板跟不上了，分出去
+        for other in list(self.consumers):
+            if other.epoch != self.epoch:
+                self._fork(other)
+
+        # 精确 seek：seek 误差带来的多余帧在解码器内部跳过，不进环，也不会把慢的面板挤出去
+        self.decoder.seek(seconds, True)
+        self.epoch += 1
+        self.epoch_target = seconds
+        self.epoch_start_seq = self._head_seq
+        handle.epoch = self.epoch
+        handle.cursor = self._head_seq
+        self._trim()
+        return True
+
+    def _blocked(self, handle):
+        """读到了还没 seek 过去的新一轮，需要等自己的 seek"""
+        return handle.epoch < self.epoch and handle.cursor >= self.epoch_start_seq
+
+    def _limit_lag(self, reader):
+        if self._head_seq - self._base_seq <= RING_LIMIT:
+            return
+        slowest = min(h.cursor for h in self.consumers)
+        for other in list(self.consumers):
+            if other is not reader and other.cursor == slowest:
+                self._fork(other)
+
+    def _fork(self, handle):
+        """把面板从共享源中分出去，之后由它自己的解码器接着播放"""
+        if handle not in self.consumers:
+            return
+        self.consumers.remove(handle)
+        self.forks += 1
+        handle.source = None
+        # 环里还有它没读的帧，或者解码器已经进入新一轮时，需要回到它自己的位置
+        if handle.cursor < self._head_seq or handle.epoch != self.epoch:
+            handle.resume_at = handle.last_pts
+        if not self.consumers:
+            # 最后一个订阅者：直接接手解码器，不必重新打开文件
+            handle.private = self.decoder
+            self.decoder = None
+            self._close()
+        else:
+            self._apply_output_size()
+        self._trim()
+        print(f"[shared] {self.key[0]}: panel forked off ({len(self.consumers)} left)")
+
+    def _trim(self):
+        """释放所有订阅者都已读过的帧"""
+        low = min((h.cursor for h in self.consumers), default=self._head_seq)
+        while self._ring and self._base_seq < low:
+            entry = self._ring.pop(0)
+            self._base_seq += 1
+            if entry.buf is not None:
+                self._unref(entry.buf)
+
+    def _unref(self, buf):
+        # 不拿 self._lock：它在整个解码期间都被占着，帧池满时解码线程正等着这里归还缓冲区
+        with self._ref_lock:
+            buf.refs -= 1
+            last = buf.refs == 0
+        if last:
+            buf.release()
+
+    def _apply_output_size(self):
+        """解码尺寸取所有订阅者需要的最大值"""
+        if self.decoder is None or not self.consumers:
+            return
+        sizes = [h.wanted_size for h in self.consumers]
+        size = None if None in sizes else max(sizes, key=lambda s: s[0] * s[1])
+        self.decoder.set_output_size(size)
+
+    def _detach(self, handle):
+        if handle not in self.consumers:
+            return
+        self.consumers.remove(handle)
+        if self.consumers:
+            self._apply_output_size()
+            self._trim()
+        else:
+            self.decoder.close()
+            self.decoder = None
+            self._close()
+
+    def _close(self):
+        """不再有订阅者：之后同一文件的请求会另开新的源，环里剩下的帧归还帧池"""
+        self.closed = True
+        for entry in self._ring:
+            if entry.buf is not None:
+                self._unref(entry.buf)
+        self._ring = []
+
+
+class SharedDecoder:
+    """
+    面板看到的解码器：接口与 VideoDecoder 相同。
+    共享期间从 SharedSource 读帧，分出去以后转给自己独占的 VideoDecoder。
+    """
+    def __init__(self, source, open_args, private=None):
+        self.source = source
+        self.private = private
+        self.open_args = open_args
+        # 分出去但还没打开自己的解码器时，只读属性从原来的解码器上取
+        self._reference = private if private is not None else source.decoder
+        self.cursor = 0
+        self.epoch = 0
+        self.last_pts = None
+        self.resume_at = None     # 分出去时的播放位置，自己的解码器从这里接着解码
+        self.wanted_size = None
+        self.wants = None         # 面板设置的只读判断：wants(pts) 为 False 表示这一帧它不会用到
+        self.timings = None       # 面板的统计计时
+        self._lock = source._lock if source is not None else threading.RLock()
+
+    def _decoder(self):
+        if self.private is not None:
+            return self.private
+        if self.source is not None:
+            return self.source.decoder
+        return self._reference
+
+    def __getattr__(self, name):
+        # stream / info / duration / path / output_format / output_size 等只读属性
+        return getattr(self._decoder(), name)
+
+    @property
+    def blocked(self):
+        # 调度器在持有全局条件锁时调用，不能拿源的锁（解码期间一直被占着）；
+        # 读到的 epoch/cursor 稍旧也只是让这次调度判断晚一轮
+        source = self.source
+        return source is not None and source._blocked(self)
+
+    @property
+    def shared(self):
+        """是否仍在与其它面板共用解码"""
+        return self.source is not None
+
+    def _own(self):
+        """分出去之后第一次使用时打开自己的解码器，并回到分出去时的位置"""
+        if self.private is None:
+            self.private = VideoDecoder(*self.open_args)
+            self.private.set_output_size(self.wanted_size)
+        if self.resume_at is not None:
+            fps = self.private.info["fps"] or 25.0
+            self.private.seek(self.resume_at + 0.5 / fps, True)
+            self.resume_at = None
+        self.private.timings = self.timings
+        return self.private
+
+    def fork(self):
+        """与其它面板分开（用户 seek / 拖动进度条前调用）"""
+        with self._lock:
+            if self.source is not None:
+                self.source._fork(self)
+
+    def read_frame(self, pool=None, accept=None):
+        with self._lock:
+            shared = self.source is not None and not self.source._blocked(self)
+            if shared:
+                frame, pts = self.source._read(self)
+            elif self.source is not None:
+                self.source._fork(self)
+        if shared:
+            # 每个面板都对自己读到的每一帧做一次取舍（更新自己的状态和计数），不在持有源的锁时做
+            if pts is not None and accept is not None and not accept(pts):
+                if frame is not None:
+                    frame.release()
+                frame = None
+        else:
+            frame, pts = self._own().read_frame(pool, accept)
+        if pts is not None:
+            self.last_pts = pts
+        return frame, pts
+
+    def seek(self, seconds, accre=False):
+        with self._lock:
+            if self.source is not None:
+                if not accre and self.source._seek(self, seconds):
+                    return
+                self.source._fork(self)
+        self.resume_at = None
+        self._own().seek(seconds, accre)
+
+    def read_keyframe(self, seconds, pool=None):
+        self.fork()
+        self.resume_at = None
+        return self._own().read_keyframe(seconds, pool)
+
+    def set_skip_frame(self, mode):
+        """跳帧只对自己生效：仍在共享时先分出去"""
+        if mode == "DEFAULT" and self.private is None:
+            return
+        self.fork()
+        self._own().set_skip_frame(mode)
+
+    def set_output_size(self, size):
+        with self._lock:
+            self.wanted_size = size
+            if self.source is not None:
+                self.source._apply_output_size()
+                return
+        if self.private is not None:
+            self.private.set_output_size(size)
+
+    def close(self):
+        with self._lock:
+            if self.source is not None:
+                self.source._detach(self)
+                self.source = None
+        if self.private is not None:
+            self.private.close()
+            self.private = None
@@ -0,0 +1,55 @@
+import time
+import threading
+
+# 启动计时：从读取配置开始，到每个画面显示出第一帧为止
+_lock = threading.Lock()
+_t0 = None
+_events = []          # (秒, 事件)
+_pending = set()      # 还没出第一帧的画面
+_reported = False
+
+
+def start():
+    global _t0
+    _t0 = time.perf_counter()
+
+
+def _elapsed():
+    return time.perf_counter() - (_t0 if _t0 is not None else time.perf_counter())
+
+
+def mark(event):
+    with _lock:
+        _events.append((_elapsed(), event))
+
+
+def expect(key):
+    """登记一个需要等待第一帧的画面"""
+    with _lock:
+        _pending.add(key)
+
+
+def first_frame(key):
+    done(key, f"first frame {key}")
+
+
+def done(key, event):
+    """完成一个登记过的等待项，全部完成后打印一次报告"""
+    global _reported
+    with _lock:
+        if key not in _pending:
+            return
+        _pending.discard(key)
+        _events.append((_elapsed(), event))
+        if _pending or _reported:
+            return
+        _reported = True
+        events = sorted(_events)
+    print_report(events)
+
+
+def print_report(events):
+    print("[startup] ---- startup timeline ----")
+    for t, event in events:
+        print(f"[startup] {t * 1000:8.1f} ms  {event}")
+    print(f"[startup] all panels showing video after {events[-1][0] * 1000:.1f} ms")
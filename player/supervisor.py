@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import signal
+import threading
+import subprocess
+
+from .cache_dir import cache_dir, write_json_atomic
+
+# 子进程崩溃后的重启间隔，连续崩溃时翻倍
+RESTART_DELAY = 1.0
+RESTART_DELAY_MAX = 30.0
+# 运行超过这么久再崩溃，重启间隔从头算
+STABLE_SECONDS = 60.0
+# 要求子进程退出后最多等多久，之后强制结束
+SHUTDOWN_TIMEOUT = 5.0
+# 子进程写统计、监督进程打印汇总的间隔（秒）
+STATS_INTERVAL = 10.0
+
+
+def stats_dir():
+    path = os.path.join(cache_dir(), "supervisor")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def stats_path(screen):
+    return os.path.join(stats_dir(), f"screen-{screen}.json")
+
+
+def split_budget(value, default, count):
+    """多进程模式下把配置的总预算（没配置时取单进程的默认值）平分给各子进程；0 仍表示关闭"""
+    if count <= 1:
+        return value
+    total = default if value is None else int(value)
+    return max(1, total // count) if total else 0
+
+
+def child_command(config_path, screen, count):
+    """启动只播放一块屏幕的子进程的命令行"""
+    if getattr(sys, "frozen", False):
+        # pyinstaller 打包的 exe 本身就是入口
+        cmd = [sys.executable]
+    else:
+        cmd = [sys.executable, os.path.abspath(sys.argv[0])]
+    return cmd + ["-f", os.path.abspath(config_path), "--screen", str(screen),
+                  "--process-count", str(count)]
+
+
+class _Child:
+    def __init__(self, screen):
+        self.screen = screen
+        self.proc = None
+        self.started = 0.0
+        self.restarts = 0
+        self.delay = RESTART_DELAY
+        self.restart_at = None    # 等待重启的时刻
+        self.done = False         # 正常退出（窗口被关闭），不再重启
+        self.last_stats = None
+
+
+class Supervisor:
+    """
+    多进程模式的父进程：每块配置的屏幕一个子进程，各自运行自己的 ScreenPlayer，
+    解码、转换和 GL 工作不再共用一个 GIL。
+
+    子进程异常退出时按退避间隔重启，正常退出（窗口被关闭）时不再重启，全部正常退出后
+    监督进程也退出。Ctrl+C 时把退出请求转给所有子进程，超时仍未退出的强制结束。
+    子进程定期把统计写到缓存目录，监督进程汇总打印各进程的 CPU 占用和帧率。
+    """
+    def __init__(self, config_path, screens):
+        self.config_path = config_path
+        self.children = [_Child(screen) for screen in screens]
+        self._stopping = threading.Event()
+        self._stats_at = 0.0
+
+    def run(self):
+        for name in os.listdir(stats_dir()):
+            try:
+                os.remove(os.path.join(stats_dir(), name))
+            except OSError:
+                pass
+
+        signal.signal(signal.SIGINT, self._on_signal)
+        signal.signal(signal.SIGTERM, self._on_signal)
+        if hasattr(signal, "SIGBREAK"):
+            signal.signal(signal.SIGBREAK, self._on_signal)
+
+        for child in self.children:
+            self._start(child)
+        self._stats_at = time.monotonic() + STATS_INTERVAL
+
+        while not self._stopping.is_set():
+            self._poll()
+            if all(c.done for c in self.children):
+                print("[supervisor] all players exited")
+                return 0
+            if time.monotonic() >= self._stats_at:
+                self._stats_at += STATS_INTERVAL
+                self._report()
+            self._stopping.wait(0.5)
+
+        self._shutdown()
+        return 0
+
+    def _on_signal(self, signum, frame):
+        print(f"[supervisor] signal {signum}, stopping players")
+        self._stopping.set()
+
+    def _start(self, child):
+        cmd = child_command(self.config_path, child.screen, len(self.children))
+        kwargs = {}
+        if os.name == "nt":
+            # 单独的进程组，退出时可以只对它发 CTRL_BREAK_EVENT
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        child.proc = subprocess.Popen(cmd, **kwargs)
+        child.started = time.monotonic()
+        child.restart_at = None
+        print(f"[supervisor] screen {child.screen}: started pid {child.proc.pid}")
+
+    def _poll(self):
+        now = time.monotonic()
+        for child in self.children:
+            if child.done:
+                continue
+            if child.restart_at is not None:
+                if now >= child.restart_at:
+                    child.restarts += 1
+                    self._start(child)
+                continue
+            code = child.proc.poll()
+            if code is None:
+                continue
+            if code == 0:
+                print(f"[supervisor] screen {child.screen}: exited")
+                child.done = True
+                continue
+            if now - child.started > STABLE_SECONDS:
+                child.delay = RESTART_DELAY
+            print(f"[supervisor] screen {child.screen}: pid {child.proc.pid} exited with {code}, "
+                  f"restarting in {child.delay:.1f}s")
+            child.restart_at = now + child.delay
+            child.delay = min(child.delay * 2, RESTART_DELAY_MAX)
+
+    def _shutdown(self):
+        running = [c for c in self.children if c.proc is not None and c.proc.poll() is None]
+        for child in running:
+            try:
+                if os.name == "nt":
+                    child.proc.send_signal(signal.CTRL_BREAK_EVENT)
+                else:
+                    child.proc.send_signal(signal.SIGINT)
+            except OSError:
+                pass
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        for child in running:
+            try:
+                child.proc.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                print(f"[supervisor] screen {child.screen}: pid {child.proc.pid} did not exit, killing")
+                child.proc.kill()
+                child.proc.wait()
+        self._report()
+        print("[supervisor] stopped")
+
+    def _report(self):
+        for child in self.children:
+            try:
+                with open(stats_path(child.screen), "r", encoding="utf-8") as f:
+                    stats = json.load(f)
+            except (OSError, ValueError):
+                continue
+            last, child.last_stats = child.last_stats, stats
+            if last is None or last["pid"] != stats["pid"] or stats["time"] <= last["time"]:
+                continue
+            dt = stats["time"] - last["time"]
+            cpu = (stats["cpu_seconds"] - last["cpu_seconds"]) / dt * 100
+            fps = (stats["presented"] - last["presented"]) / dt
+            rss = f", {stats['rss_mb']:.0f} MB" if stats.get("rss_mb") is not None else ""
+            print(f"[supervisor] screen {child.screen} pid {stats['pid']}: cpu {cpu:.0f}%{rss}, "
+                  f"{fps:.1f} fps over {stats['panels']} panels, {stats['late']} late, "
+                  f"{stats['dropped']} dropped, {child.restarts} restarts")
+
+
+def _rss_mb():
+    """当前常驻内存（MB），取不到时为 None"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ChildReporter:
+    """子进程一侧：定期把本进程的统计写到监督进程读取的文件里（在 GUI 线程中由 QTimer 驱动）"""
+    def __init__(self, screen, players):
+        from PySide6.QtCore import QTimer
+
+        self.screen = screen
+        self.players = players
+        self.path = stats_path(screen)
+        self.timer = QTimer()
+        self.timer.setInterval(int(STATS_INTERVAL * 1000))
+        self.timer.timeout.connect(self.write)
+        self.timer.start()
+
+    def write(self):
+        panels = [p.video_panel for player in self.players for p in player.panels]
+        counters = [panel.qos.counters for panel in panels]
+        stats = {
+            "pid": os.getpid(),
+            "screen": self.screen,
+            "time": time.monotonic(),
+            "cpu_seconds": time.process_time(),
+            "rss_mb": _rss_mb(),
+            "threads": threading.active_count(),
+            "panels": len(panels),
+            "presented": sum(c["presented"] for c in counters),
+            "late": sum(c["late"] for c in counters),
+            "dropped": sum(c["dropped_upload"] + c["dropped_convert"] for c in counters),
+        }
+        try:
+            write_json_atomic(self.path, stats)
+        except OSError as e:
+            print(f"[supervisor] stats write failed: {e}")
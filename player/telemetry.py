@@ -0,0 +1,153 @@
+import os
+import csv
+import json
+import time
+import threading
+
+# 导出 CSV 时的列顺序
+FIELDS = (
+    "time", "panel", "path", "fps", "painted_fps", "queue", "queue_avg",
+    "decode_ms", "decode_max_ms", "convert_ms", "convert_max_ms",
+    "upload_ms", "upload_max_ms", "paint_ms", "paint_max_ms",
+    "latency_ms", "latency_max_ms", "late", "dropped", "skipped", "qos_level",
+    "decode_wakeups", "render_wakeups", "decode_cpu", "render_cpu",
+)
+
+
+class Timings:
+    """一组计时项：累计值、次数与最大值，每次 take() 取走后重新累计"""
+    __slots__ = ("_data",)
+
+    def __init__(self):
+        self._data = {}
+
+    def add(self, name, value):
+        entry = self._data.get(name)
+        if entry is None:
+            self._data[name] = [value, 1, value]
+        else:
+            entry[0] += value
+            entry[1] += 1
+            if value > entry[2]:
+                entry[2] = value
+
+    def take(self):
+        """返回 {名字: (平均值, 最大值, 次数)}"""
+        data, self._data = self._data, {}
+        return {name: (total / count, peak, count) for name, (total, count, peak) in data.items()}
+
+
+class Telemetry:
+    """
+    各面板流水线的计时与计数：解码、转换、上传、绘制耗时，队列深度，
+    显示时刻相对 PTS 的延迟，丢帧数和实际帧率。
+
+    关闭时各处埋点只判断一次 Telemetry.enabled。配置了 telemetry_export 时一直打开，
+    按 telemetry_interval 秒采样一次并追加到文件（.csv 为 CSV，其它为每行一个 JSON）；
+    运行中按 F3 打开/关闭各面板上的统计浮层。
+    """
+    _instance = None
+    _export_default = None
+    _interval_default = 1.0
+
+    # 埋点处读取的开关，放在类上，取值只需一次属性查找
+    enabled = False
+
+    @classmethod
+    def configure(cls, export, interval):
+        """在创建第一个面板之前调用"""
+        if export:
+            cls._export_default = export
+        if interval:
+            cls._interval_default = max(0.1, float(interval))
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(cls._export_default, cls._interval_default)
+        return cls._instance
+
+    def __init__(self, export, interval):
+        self.export = export
+        self.interval = interval
+        self.overlay = False
+        self._lock = threading.Lock()
+        self._panels = []
+        self._next_id = 0
+        self._thread = None
+        self._update_enabled()
+
+    def register(self, panel):
+        """登记面板，返回它在统计里的编号"""
+        with self._lock:
+            self._next_id += 1
+            self._panels.append(panel)
+            return self._next_id
+
+    def unregister(self, panel):
+        with self._lock:
+            if panel in self._panels:
+                self._panels.remove(panel)
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        self._update_enabled()
+        print(f"[telemetry] overlay {'on' if self.overlay else 'off'}")
+
+    def _update_enabled(self):
+        Telemetry.enabled = bool(self.overlay or self.export)
+        if Telemetry.enabled and self._thread is None:
+            self._thread = threading.Thread(target=self._sample_loop, name="telemetry", daemon=True)
+            self._thread.start()
+
+    def _sample_loop(self):
+        last = time.perf_counter()
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            dt, last = now - last, now
+            if not Telemetry.enabled:
+                continue
+            with self._lock:
+                panels = list(self._panels)
+            rows = []
+            for panel in panels:
+                try:
+                    rows.append(panel.telemetry_sample(dt))
+                except Exception as e:
+                    print(f"[telemetry] sample failed: {e}")
+            if self.export and rows:
+                self._write(rows)
+
+    def _write(self, rows):
+        try:
+            new = not os.path.exists(self.export) or os.path.getsize(self.export) == 0
+            with open(self.export, "a", encoding="utf-8", newline="") as f:
+                if self.export.lower().endswith(".csv"):
+                    writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+                    if new:
+                        writer.writeheader()
+                    writer.writerows(rows)
+                else:
+                    for row in rows:
+                        f.write(json.dumps(row) + "\n")
+        except OSError as e:
+            print(f"[telemetry] export failed: {e}")
+            self.export = None
+            self._update_enabled()
+
+
+def format_overlay(sample):
+    """浮层上显示的几行文字"""
+    if sample is None:
+        return "..."
+    return (
+        f"{sample['fps']:.1f} fps (paint {sample['painted_fps']:.1f})  queue {sample['queue']}\n"
+        f"decode {sample['decode_ms']:.1f} / convert {sample['convert_ms']:.1f} ms\n"
+        f"upload {sample['upload_ms']:.1f} / paint {sample['paint_ms']:.1f} ms\n"
+        f"latency {sample['latency_ms']:.1f} ms (max {sample['latency_max_ms']:.0f})\n"
+        f"late {sample['late']}  dropped {sample['dropped']}  skipped {sample['skipped']}\n"
+        f"qos {sample['qos_level']}\n"
+        f"wakeups {sample['decode_wakeups']:.0f} / {sample['render_wakeups']:.0f} /s  "
+        f"cpu {sample['decode_cpu']:.0f} / {sample['render_cpu']:.0f} %"
+    )
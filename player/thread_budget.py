@@ -0,0 +1,111 @@
+import os
+import threading
+
+# 各编码格式相对 H.264 的单像素解码开销，未列出的按 1.0 计
+CODEC_COST = {
+    "h264": 1.0,
+    "hevc": 1.6,
+    "vp9": 1.4,
+    "av1": 2.0,
+    "mpeg4": 0.6,
+    "mpeg2video": 0.5,
+}
+
+# 单路流再多线程也几乎没有收益
+MAX_THREADS_PER_STREAM = 16
+
+# 配置里的 "thread_type" 到 PyAV 线程模式的映射
+THREAD_TYPES = {"auto": "AUTO", "frame": "FRAME", "slice": "SLICE"}
+
+
+def stream_weight(info):
+    """按像素率（宽 × 高 × 帧率）和编码格式估算一路流的解码负载"""
+    fps = info.get("fps") or 25.0
+    return info["width"] * info["height"] * fps * CODEC_COST.get(info.get("codec"), 1.0)
+
+
+class ThreadBudget:
+    """
+    进程内所有解码器共用的编解码线程预算。
+
+    默认每个解码器都会按核数开线程，N 路同时解码时 CPU 被超额订阅 N 倍。
+    这里把总线程数按各路的负载权重分给可见的解码器，隐藏的只保留 1 个线程；
+    有解码器加入、隐藏、显示或移除时重新分配。
+    PyAV 的 thread_count 在编解码器打开后不能修改，新的分配由解码器在下一次
+    seek/重新打开时生效。
+    """
+    _instance = None
+    _total_default = os.cpu_count() or 4
+
+    @classmethod
+    def configure(cls, total):
+        """在打开第一个解码器之前调用，设置总线程数"""
+        if total:
+            cls._total_default = max(1, int(total))
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls(cls._total_default)
+        return cls._instance
+
+    def __init__(self, total):
+        self.total = total
+        self._lock = threading.Lock()
+        self._entries = {}     # 解码器 -> {"weight", "active", "threads"}
+
+        # 统计
+        self.rebalances = 0
+
+    def register(self, decoder, weight):
+        """登记解码器并返回分给它的线程数"""
+        with self._lock:
+            self._entries[decoder] = {"weight": weight, "active": True, "threads": 1}
+            self._rebalance(skip=decoder)
+            return self._entries[decoder]["threads"]
+
+    def unregister(self, decoder):
+        with self._lock:
+            if self._entries.pop(decoder, None) is not None:
+                self._rebalance()
+
+    def set_active(self, decoder, active):
+        """面板隐藏/显示时调用"""
+        with self._lock:
+            entry = self._entries.get(decoder)
+            if entry is None or entry["active"] == active:
+                return
+            entry["active"] = active
+            self._rebalance()
+
+    def _rebalance(self, skip=None):
+        """按权重分配：每路可见的至少 1 个线程，余下的按最大余数法分配（需持有锁）"""
+        self.rebalances += 1
+        active = [d for d, e in self._entries.items() if e["active"]]
+        counts = {d: 1 for d in self._entries}
+
+        spare = self.total - len(active)
+        total_weight = sum(self._entries[d]["weight"] for d in active)
+        if spare > 0 and total_weight > 0:
+            shares = {d: spare * self._entries[d]["weight"] / total_weight for d in active}
+            for d in active:
+                counts[d] += int(shares[d])
+            left = spare - sum(int(s) for s in shares.values())
+            for d in sorted(active, key=lambda d: shares[d] - int(shares[d]), reverse=True)[:left]:
+                counts[d] += 1
+
+        for d, entry in self._entries.items():
+            n = min(counts[d], MAX_THREADS_PER_STREAM)
+            if n != entry["threads"]:
+                entry["threads"] = n
+                if d is not skip:
+                    d.set_thread_count(n)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "total": self.total,
+                "rebalances": self.rebalances,
+                "threads": [(getattr(d, "path", None) or getattr(d, "video_path", None), e["threads"], e["active"])
+                            for d, e in self._entries.items()],
+            }
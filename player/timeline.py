@@ -0,0 +1,100 @@
+import math
+import bisect
+
+# 与原来逐项比较时相同的容差（秒）：seek 落点不准、帧时间戳有抖动
+TOLERANCE = 0.1
+
+
+class Timeline:
+    """
+    play_sections 编译后的播放区间：校验、按起点排序、duration=-1 换算成流的时长（时长未知时为无穷远），
+    重叠或相接的区间合并。所有查询都是二分查找，区间再多也不会拖慢逐帧的判断。
+    """
+    def __init__(self, intervals):
+        self.intervals = intervals                  # [(start, end)]，已排序且互不重叠
+        self.starts = [s for s, _ in intervals]
+        self.ends = [e for _, e in intervals]
+
+    @classmethod
+    def compile(cls, sections, duration):
+        """把配置里的 play_sections 编译成 Timeline；无效的区间打印警告后跳过"""
+        duration = float(duration or 0)
+        raw = []
+        for sec in sections or []:
+            try:
+                start = float(sec["start_time"])
+                length = float(sec["duration"])
+            except (KeyError, TypeError, ValueError):
+                print(f"[timeline] invalid section ignored: {sec}")
+                continue
+            if length == -1:
+                # 播到文件结尾；探测不到时长时与原来一样当作无穷远
+                end = duration if duration > 0 else math.inf
+            else:
+                end = start + length
+            if duration > 0:
+                end = min(end, duration)
+            if start < 0 or end <= start:
+                print(f"[timeline] empty section ignored: {sec}")
+                continue
+            raw.append((start, end))
+
+        raw.sort()
+        intervals = []
+        for start, end in raw:
+            if intervals and start <= intervals[-1][1]:
+                intervals[-1] = (intervals[-1][0], max(intervals[-1][1], end))
+            else:
+                intervals.append((start, end))
+        return cls(intervals)
+
+    def __bool__(self):
+        return bool(self.intervals)
+
+    def __len__(self):
+        return len(self.intervals)
+
+    @property
+    def first_start(self):
+        return self.starts[0] if self.intervals else 0.0
+
+    def _index(self, pts):
+        """第一个结尾（含容差）不早于 pts 的区间序号，没有时返回 len"""
+        return bisect.bisect_left(self.ends, pts - TOLERANCE)
+
+    def next_time(self, pts):
+        """
+        播放到 pts 时是否需要跳转：还没到某个区间的起点时返回该起点，
+        在区间内返回 -1，超过最后一个区间时回到第一个区间的起点。
+        """
+        i = self._index(pts)
+        if i == len(self.intervals):
+            return self.first_start
+        start = self.starts[i]
+        if pts < start - TOLERANCE:
+            return start
+        return -1
+
+    def section_start(self, pts):
+        """pts 所在（或下一个）区间的起点；超过所有区间时返回 0"""
+        i = self._index(pts)
+        return self.starts[i] if i < len(self.intervals) else 0.0
+
+    def section_end(self, pts):
+        """pts 所在区间的结尾，不在任何区间内时返回 None"""
+        i = self._index(pts)
+        if i < len(self.intervals) and pts >= self.starts[i] - TOLERANCE:
+            return self.ends[i]
+        return None
+
+    def next_boundary(self, pts):
+        """
+        pts 之后最近的区间边界 (时间, "start"/"end")，没有时返回 None。
+        解码端据此提前知道当前区间在哪里结束、下一段从哪里开始。
+        """
+        i = self._index(pts)
+        if i == len(self.intervals):
+            return None
+        if pts < self.starts[i] - TOLERANCE:
+            return self.starts[i], "start"
+        return self.ends[i], "end"
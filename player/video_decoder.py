@@ -1,23 +1,177 @@
 import av
+import time
 import numpy as np
 import threading
+from av.video.reformatter import VideoReformatter
+
+from .keyframe_index import KeyframeIndex
+from .probe_cache import probe
+from .thread_budget import ThreadBudget, THREAD_TYPES, stream_weight
+from .telemetry import Telemetry
+
+# 可以直接按平面上传给 GPU 的像素格式，其余格式先在 CPU 上转成 yuv420p
+PLANAR_FORMATS = ("yuv420p", "yuvj420p", "nv12")
+
+# 为 True 时每次精确 seek 都打印策略和耗时；区间循环会频繁 seek，默认关闭（结果总在 last_seek 里）
+LOG_SEEKS = False
+
+# 为 False 时不建关键帧索引，seek 走原来的路径（基准测试里关掉，免得整文件扫描混进解码耗时）
+BUILD_INDEX = True
+
+# AVColorSpace 取值
+AVCOL_SPC_BT709 = 1
+AVCOL_SPC_BT470BG = 5
+AVCOL_SPC_SMPTE170M = 6
+# AVColorRange 取值
+AVCOL_RANGE_JPEG = 2
+
+
+class PlanarFrame:
+    """YUV 平面帧：各平面直接引用 av.VideoFrame 的内存，颜色转换交给 shader"""
+    def __init__(self, fmt, width, height, planes, plane_widths, matrix, full_range, owner=None):
+        self.fmt = fmt                    # "yuv420p" 或 "nv12"
+        self.width = width
+        self.height = height
+        self.planes = planes              # ndarray 列表，形状 (h, 行跨度, 通道数)
+        self.plane_widths = plane_widths  # 每个平面的有效宽度（像素）
+        self.matrix = matrix              # "bt601" / "bt709"
+        self.full_range = full_range
+        self._owner = owner               # 持有 av.VideoFrame，保证平面内存有效
+
+    @property
+    def nbytes(self):
+        return sum(p.nbytes for p in self.planes)
+
+    def release(self):
+        """归还缓冲区；普通帧无需归还，由帧池中的缓冲区重写"""
+        pass
+
+
+def frame_color_info(frame):
+    """根据帧的色彩元数据推断 YUV->RGB 矩阵和取值范围"""
+    colorspace = getattr(frame, "colorspace", None)
+    if colorspace == AVCOL_SPC_BT709:
+        matrix = "bt709"
+    elif colorspace in (AVCOL_SPC_BT470BG, AVCOL_SPC_SMPTE170M):
+        matrix = "bt601"
+    else:
+        # 未标注时按分辨率猜测：高清用 709，标清用 601
+        matrix = "bt709" if frame.height >= 720 else "bt601"
+
+    full_range = getattr(frame, "color_range", None) == AVCOL_RANGE_JPEG
+    if frame.format.name.startswith("yuvj"):
+        full_range = True
+    return matrix, full_range
+
+
+def frame_to_planar(frame):
+    """把 av.VideoFrame 包装成 PlanarFrame，必要时先转成 yuv420p"""
+    matrix, full_range = frame_color_info(frame)
+    if frame.format.name not in PLANAR_FORMATS:
+        # swscale 输出的 yuv420p 为有限范围
+        frame = frame.reformat(format="yuv420p")
+        full_range = False
+
+    fmt = "nv12" if frame.format.name == "nv12" else "yuv420p"
+    planes = []
+    plane_widths = []
+    for i, plane in enumerate(frame.planes):
+        channels = 2 if (fmt == "nv12" and i == 1) else 1
+        arr = np.frombuffer(plane, dtype=np.uint8)
+        arr = arr.reshape(plane.height, plane.line_size // channels, channels)
+        planes.append(arr)
+        plane_widths.append(plane.width)
+
+    return PlanarFrame(fmt, frame.width, frame.height, planes, plane_widths,
+                       matrix, full_range, owner=frame)
+
+
+def fit_size(src_w, src_h, dst_w, dst_h, align=16):
+    """把 src 等比缩放进 dst（不放大），宽按 align 向上对齐，高取偶数"""
+    scale = min(dst_w / src_w, dst_h / src_h, 1.0)
+    w = min(src_w, -(-int(src_w * scale) // align) * align)
+    h = min(src_h, int(round(w * src_h / src_w / 2)) * 2)
+    return max(w, 2), max(h, 2)
+
+
+class OutputSizeController:
+    """
+    根据面板的帧缓冲尺寸决定解码输出尺寸。
+    带滞后：放大超过 grow 比例、缩小超过 shrink 比例才真正切换，避免拖动窗口时反复重建缩放上下文。
+    """
+    def __init__(self, native_w, native_h, grow=1.05, shrink=0.8):
+        self.native = (native_w, native_h)
+        self.grow = grow
+        self.shrink = shrink
+        self.current = self.native
+
+    def update(self, fb_w, fb_h):
+        """返回新的输出尺寸；没有必要切换时返回 None"""
+        if fb_w <= 0 or fb_h <= 0:
+            return None
+        ideal = fit_size(self.native[0], self.native[1], fb_w, fb_h)
+        cur_w = self.current[0]
+        if ideal[0] > cur_w * self.grow or ideal[0] < cur_w * self.shrink:
+            self.current = ideal
+            return ideal
+        return None
+
+    def reset_native(self):
+        self.current = self.native
+        return self.native
+
+
 class VideoDecoder:
-    def __init__(self, path, hwaccel=None):
-        options = {}
+    # 精确 seek 时，离目标还差这么多帧以上就让解码器跳过非参考帧
+    SEEK_SKIP_MARGIN_FRAMES = 16
+
+    # 与 SharedDecoder 保持同样的接口：独占的解码器从不需要等待，也无需分离
+    blocked = False
+    shared = False
+
+    def __init__(self, path, hwaccel=None, output_format="rgb24", thread_type="auto"):
+        self.path = path
+        # 时长等信息来自探测缓存，容器里没有流时长时也能拿到
+        self.info = probe(path)
+        self._options = {}
         if hwaccel:
-            options["hwaccel"] = hwaccel
+            self._options["hwaccel"] = hwaccel
 
-        self.container = av.open(path, options=options)
-        self.stream = self.container.streams.video[0]
-        self.stream.thread_type = "AUTO"
+        # "rgb24"：CPU 转 RGB；"yuv"：按平面上传，由 shader 做颜色转换
+        self.output_format = output_format
+
+        # 编解码线程数由全局预算分配；"thread_type" 选择帧级/片级多线程
+        self.thread_type = THREAD_TYPES.get(thread_type, "AUTO")
+        self._budget = ThreadBudget.instance()
+        self.thread_count = self._budget.register(self, stream_weight(self.info))
+        self._wanted_threads = self.thread_count
+
+        # 高倍速播放时的跳帧模式（"DEFAULT" / "NONREF" / "NONKEY"），重新打开后保持
+        self.skip_frame = "DEFAULT"
+
+        self._open()
 
         # self._prefetched_frame = None
         self.last_frame = None
 
-        self.time_base = self.stream.time_base
-        self.duration = self.stream.duration * self.time_base
+        # 解码端缩放的目标尺寸，None 表示原始分辨率
+        self.output_size = None
 
-        self.frame_iter = self.container.decode(self.stream)
+        self.duration = self.info["duration"]
+
+        # 复用同一个 SwsContext，避免每帧重新创建
+        self._reformatter = VideoReformatter()
+
+        # 当前解码位置（最后一帧的原始 PTS），以及最近一次 seek 的统计
+        self._position = None
+        self.last_seek = None
+        # 因为会被丢弃而没有做像素转换的帧数
+        self.conversions_skipped = 0
+        # 统计打开时解码/转换耗时记到这里（由面板设置）
+        self.timings = None
+
+        # 关键帧索引在后台建立（或从磁盘缓存读取），同一文件的解码器共用一份，建好之前 seek 走原来的路径
+        self._index = KeyframeIndex.shared(path) if BUILD_INDEX else None
 
         # # 获取平均帧率 (fps)
         # fps = self.stream.average_rate
@@ -26,7 +180,71 @@ class VideoDecoder:
         # else:
         #     self.frame_interval = int(1000 / float(fps)) # 计算每帧间隔毫秒数
 
-    def read_frame(self):
+    def _open(self):
+        self.container = av.open(self.path, options=self._options)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = self.thread_type
+        self.stream.thread_count = self.thread_count
+        self.time_base = self.stream.time_base
+        self.stream.codec_context.skip_frame = self.skip_frame
+        self.frame_iter = self.container.decode(self.stream)
+
+    def set_skip_frame(self, mode):
+        """让编解码器跳过非参考帧（"NONREF"）或只解关键帧（"NONKEY"），"DEFAULT" 恢复正常解码"""
+        if mode != self.skip_frame:
+            self.skip_frame = mode
+            self.stream.codec_context.skip_frame = mode
+
+    def set_thread_count(self, count):
+        """线程预算重新分配后调用；编解码器已打开，下一次 seek 时重新打开才生效"""
+        self._wanted_threads = count
+
+    def _apply_thread_count(self):
+        """线程数有变化时重新打开容器，返回是否重新打开过（当前解码位置随之失效）"""
+        if self._wanted_threads == self.thread_count:
+            return False
+        print(f"[threads] {self.path}: {self.thread_count} -> {self._wanted_threads}")
+        self.thread_count = self._wanted_threads
+        self.container.close()
+        self._open()
+        self._position = None
+        self.last_frame = None
+        return True
+
+    def close(self):
+        self._budget.unregister(self)
+        self.container.close()
+
+    def fork(self):
+        """独占的解码器从不需要分离，只为与 SharedDecoder 的接口一致"""
+        pass
+
+    def read_frame(self, pool=None, accept=None):
+        """
+        解码下一帧，返回 (图像, pts)。
+        传入 pool 时，结果直接写入帧池的缓冲区（FrameBuffer），不再分配新数组。
+        传入 accept(pts) 时先在原始帧上判断，不需要的帧不做像素转换，返回 (None, pts)。
+        """
+        timings = self.timings if Telemetry.enabled else None
+        if timings is not None:
+            t0 = time.perf_counter()
+        frame, pts = self.decode_raw()
+        if frame is None:
+            return None, None
+        if timings is not None:
+            t1 = time.perf_counter()
+            timings.add("decode", t1 - t0)
+        if accept is not None and not accept(pts):
+            self.conversions_skipped += 1
+            return None, pts
+        if timings is None:
+            return self.convert(frame, pts, pool)
+        result = self.convert(frame, pts, pool)
+        timings.add("convert", time.perf_counter() - t1)
+        return result
+
+    def decode_raw(self):
+        """解码下一帧但不做任何转换，返回 (av.VideoFrame, pts)，文件结尾返回 (None, None)"""
         # 如果 seek 缓存了帧，先返回缓存的
         if self.last_frame is not None:
             frame = self.last_frame
@@ -34,34 +252,177 @@ class VideoDecoder:
         else:
             try:
                 frame = next(self.frame_iter)
-                
+
             except StopIteration:
                 return None, None
-        img = frame.to_ndarray(format="rgb24")
-        pts = float(frame.pts * self.time_base)
+            self._position = frame.pts
+        return frame, float(frame.pts * self.time_base)
+
+    def convert(self, frame, pts, pool=None):
+        """把 decode_raw 得到的原始帧转换成输出格式，返回 (图像, pts)"""
+        if pool is not None:
+            buf = self._convert_into(frame, pool)
+            if buf is not None:
+                buf.pts = pts
+            return buf, (pts if buf is not None else None)
+
+        if self.output_format == "yuv":
+            img = frame_to_planar(self._scaled(frame, "yuv420p"))
+        else:
+            img = self._scaled(frame, "rgb24").to_ndarray(format="rgb24")
         return img, pts
 
+    def set_output_size(self, size):
+        """设置输出尺寸 (w, h)；None 或不小于原始尺寸时按原始分辨率输出"""
+        if size is not None and size[0] >= self.stream.width and size[1] >= self.stream.height:
+            size = None
+        self.output_size = size
+
+    def _scaled(self, frame, fmt):
+        """需要缩小时直接在转换格式的同一步里完成，否则原样返回"""
+        size = self.output_size
+        if size is None or (frame.width, frame.height) == size:
+            return frame
+        return self._reformatter.reformat(frame, width=size[0], height=size[1],
+                                          format=fmt, interpolation="BILINEAR")
+
+    def _convert_into(self, frame, pool):
+        """把帧转换/拷贝进帧池缓冲区，池已关闭时返回 None"""
+        size = self.output_size
+        if size is not None and (frame.width, frame.height) == size:
+            size = None
+        if self.output_format == "yuv":
+            matrix, full_range = frame_color_info(frame)
+            if size is not None:
+                frame = self._scaled(frame, "yuv420p")
+                full_range = False
+            elif frame.format.name not in PLANAR_FORMATS:
+                frame = self._reformatter.reformat(frame, format="yuv420p")
+                full_range = False
+            fmt = "nv12" if frame.format.name == "nv12" else "yuv420p"
+        else:
+            matrix, full_range = "bt709", False
+            if size is not None:
+                frame = self._scaled(frame, "rgb24")
+            else:
+                frame = self._reformatter.reformat(frame, format="rgb24")
+            fmt = "rgb24"
+
+        buf = pool.acquire(fmt, frame.width, frame.height)
+        if buf is None:
+            return None
+
+        buf.matrix = matrix
+        buf.full_range = full_range
+        for plane, dst in zip(frame.planes, buf.planes):
+            h, w, c = dst.shape
+            src = np.frombuffer(plane, dtype=np.uint8).reshape(plane.height, plane.line_size)
+            np.copyto(dst.reshape(h, w * c), src[:h, :w * c])
+        return buf
+
+    @property
+    def index(self):
+        """已经建好的关键帧索引，还在建或建立失败时为 None"""
+        future = self._index
+        if future is None or not future.done():
+            return None
+        return future.result()
+
     def seek(self, seconds,accre = False):
+        t0 = time.perf_counter()
+        self._apply_thread_count()
         self.want_ts = int(seconds / self.time_base)
-        self.container.seek(self.want_ts, stream=self.stream)
-        self.frame_iter = self.container.decode(self.stream)
+        index = self.index
+        strategy = "seek"
+        cost = None
+
+        if accre and index is not None:
+            # 用索引选择起点：同一 GOP 内向前跳时直接继续解码，否则跳到目标前最近的关键帧
+            position = self._position if self.last_frame is None else None
+            start, cost, need_seek = index.seek_point(self.want_ts, position)
+            if need_seek:
+                self.container.seek(start, stream=self.stream)
+                self.frame_iter = self.container.decode(self.stream)
+            else:
+                strategy = "continue"
+        else:
+            self.container.seek(self.want_ts, stream=self.stream)
+            self.frame_iter = self.container.decode(self.stream)
 
         self.last_frame = None
+        decoded = 0
         # 消耗不准确的帧，以抵达准确的位置
         if accre:
+            decoded = self._decode_until(self.want_ts)
+
+        self.last_seek = {
+            "target": float(seconds),
+            "accurate": accre,
+            "strategy": strategy,
+            "decode_cost": cost,
+            "decoded": decoded,
+            "ms": (time.perf_counter() - t0) * 1000,
+        }
+        if accre and LOG_SEEKS:
+            print(f"[seek] {self.path} -> {float(seconds):.2f}s {strategy}, "
+                  f"cost {cost} decoded {decoded} in {self.last_seek['ms']:.1f}ms")
+
+    def read_keyframe(self, seconds, pool=None):
+        """
+        拖动进度条时使用：跳到离目标最近的关键帧，只解码这一帧并返回 (图像, pts)。
+        解码期间 skip_frame 设为只解关键帧，不会为中间帧付出任何解码开销。
+        """
+        self._apply_thread_count()
+        want_ts = int(seconds / self.time_base)
+        index = self.index
+        start = index.nearest_keyframe(want_ts) if index is not None else want_ts
+        self.container.seek(start, stream=self.stream)
+
+        ctx = self.stream.codec_context
+        ctx.skip_frame = "NONKEY"
+        try:
+            self.frame_iter = self.container.decode(self.stream)
+            self.last_frame = None
+            return self.read_frame(pool)
+        finally:
+            ctx.skip_frame = self.skip_frame
+
+    def _decode_until(self, want_ts):
+        """
+        解码并丢弃目标之前的帧；离目标较远时跳过非参考帧，它们不影响后续解码。
+        接近目标后完整解码，结束时恢复倍速播放设置的跳帧模式。
+        """
+        fps = self.info["fps"] or 25.0
+        margin = int(self.SEEK_SKIP_MARGIN_FRAMES / fps / self.time_base)
+        ctx = self.stream.codec_context
+        ctx.skip_frame = "DEFAULT"
+        skipping = False
+        decoded = 0
+        try:
             for frame in self.frame_iter:
+                decoded += 1
                 if frame.pts is None:
                     continue
-                if frame.pts >= self.want_ts:
+                self._position = frame.pts
+                if frame.pts >= want_ts:
                     self.last_frame = frame
                     break
+                near = frame.pts >= want_ts - margin
+                if skipping and near:
+                    ctx.skip_frame = "DEFAULT"
+                    skipping = False
+                elif not skipping and not near:
+                    ctx.skip_frame = "NONREF"
+                    skipping = True
+        finally:
+            ctx.skip_frame = self.skip_frame
+        return decoded
 
 
 
     def get_video_size(path):
-        container = av.open(path)
-        stream = container.streams.video[0]
-        return stream.width, stream.height
+        info = probe(path)
+        return info["width"], info["height"]
 
 
 
@@ -71,38 +432,54 @@ import av
 import time
 from PySide6.QtCore import QObject, Signal, Slot
 
+from .frame_slots import FrameSlotRing
+
 class PyAVDecoder(QObject):
-    # 信号：(view_id, frame_bytes, width, height, format)
-    frame_ready = Signal(int, bytes, int, int, str)
+    # 信号：(view_id, 槽号)；画面本身写在 self.ring 的槽里
+    frame_ready = Signal(int, int)
 
     def __init__(self, view_id, video_path):
         super().__init__()
         self.view_id = view_id
         self.video_path = video_path
         self.running = True
+        # 与窗口之间的帧槽环，解码线程直接写入，窗口直接从槽里上传
+        self.ring = FrameSlotRing()
 
+        self.info = probe(video_path)
         self.size =self.get_video_size(video_path)
 
-    def get_video_size(self,path):
-        container = av.open(path)
+        # 与 VideoDecoder 共用全局线程预算，新的线程数在下一轮循环重新打开时生效
+        self._budget = ThreadBudget.instance()
+        self.thread_count = self._budget.register(self, stream_weight(self.info))
+        self._wanted_threads = self.thread_count
+
+    def set_thread_count(self, count):
+        self._wanted_threads = count
+
+    def _open(self):
+        container = av.open(self.video_path)
         stream = container.streams.video[0]
-        return stream.width, stream.height
+        stream.thread_type = "AUTO"
+        stream.thread_count = self.thread_count
+        return container
+
+    def get_video_size(self,path):
+        info = probe(path)
+        return info["width"], info["height"]
 
     def run(self):
         """使用 PyAV 进行解码的主循环"""
         try:
             # 打开容器
-            container = av.open(self.video_path)
-            # 找到第一个视频流
-            stream = container.streams.video[0]
-            # 自动跳过损坏的帧
-            stream.thread_type = "AUTO" 
+            container = self._open()
         except Exception as e:
             print(f"Error opening {self.video_path}: {e}")
+            self._budget.unregister(self)
             return
 
         # 获取帧率进行速度控制
-        fps = float(stream.average_rate)
+        fps = self.info["fps"]
         frame_sleep = 1.0 / fps if fps > 0 else 0.04
 
         while self.running:
@@ -129,14 +506,19 @@ class PyAVDecoder(QObject):
                     
                     #print("start_time1:",start_time)
                     # 转换成字节流
-                    img_data = frame.to_ndarray(format='rgb24')
-                    #img_data = np.ascontiguousarray(img_data, dtype=np.uint8)
-                    h, w = img_data.shape[:2]
+                    #img_data = frame.to_ndarray(format='rgb24')
+                    rgb = frame.reformat(format='rgb24')
+                    plane = rgb.planes[0]
+                    h, w = rgb.height, rgb.width
 
                     #print("start_time2:",start_time)
-                    
-                    # 发射信号给 GUI 线程
-                    self.frame_ready.emit(self.view_id, img_data.tobytes(), w, h, "RGB")
+
+                    # 转换结果直接拷进帧槽，信号只通知槽号；窗口还没处理上一次通知时不再发
+                    index, dst = self.ring.begin_write(w, h)
+                    src = np.frombuffer(plane, dtype=np.uint8).reshape(plane.height, plane.line_size)
+                    np.copyto(dst.reshape(h, w * 3), src[:h, :w * 3])
+                    if self.ring.publish(index, w, h, "RGB"):
+                        self.frame_ready.emit(self.view_id, index)
 
                     # 帧率同步
                     elapsed = time.perf_counter() - start_time
@@ -144,8 +526,13 @@ class PyAVDecoder(QObject):
                     time.sleep(max(0, frame_sleep - elapsed))
                     
                 
-                # 解码结束，重置到容器开头实现循环
-                container.seek(0)
+                # 解码结束，重置到容器开头实现循环；线程预算变了就借机重新打开
+                if self._wanted_threads != self.thread_count:
+                    self.thread_count = self._wanted_threads
+                    container.close()
+                    container = self._open()
+                else:
+                    container.seek(0)
                 
             except av.AVError:
                 container.seek(0)
@@ -155,6 +542,7 @@ class PyAVDecoder(QObject):
                 break
 
         container.close()
+        self._budget.unregister(self)
 
     def stop(self):
         self.running = False
@@ -174,7 +562,8 @@ class VideoPlayerManager:
         
         # 核心：将解码器的信号连接到窗口的上传槽函数
         # Qt.QueuedConnection 确保信号跨线程安全地进入主线程
-        decoder.frame_ready.connect(self.window.sig_frame_ready)
+        self.window.attach_ring(view_id, decoder.ring)
+        decoder.frame_ready.connect(self.window.sig_slot_ready)
         
         self.decoders.append(decoder)
         # 提交到线程池执行 run 方法
@@ -183,4 +572,8 @@ class VideoPlayerManager:
     def stop_all(self):
         for d in self.decoders:
             d.stop()
-        self.executor.shutdown(wait=True)
\ No newline at end of file
+        self.executor.shutdown(wait=True)
+        for d in self.decoders:
+            stats = d.ring.stats()
+            print(f"[slots] view {d.view_id}: {stats['presented']}/{stats['published']} frames shown, "
+                  f"{stats['dropped']} dropped")
\ No newline at end of file
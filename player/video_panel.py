@@ -2,7 +2,7 @@ import os
 import threading
 import ctypes
 import numpy as np
-import time,queue
+import time
 
 from PySide6.QtOpenGLWidgets import QOpenGLWidget
 from PySide6.QtGui import QOpenGLContext, QOpenGLExtraFunctions
@@ -16,11 +16,37 @@ try:
 except ImportError:
     raise ImportError("请安装 PyOpenGL: pip install PyOpenGL")
 
-from .video_decoder import VideoDecoder
+from .video_decoder import VideoDecoder, PlanarFrame, OutputSizeController
+from .frame_pool import FramePool
+from .frame_queue import FrameQueue
+from .decode_scheduler import DecodeScheduler
+from .thread_budget import ThreadBudget
+from .loop_cache import LoopCache, LoopReplay
+from .cache_dir import file_signature
+from .shared_decoder import open_shared
+from .timeline import Timeline, TOLERANCE
+from .qos import FrameQoS
+from .telemetry import Telemetry, Timings
+from .vsync_presenter import VsyncPresenter
+from . import startup_report
+from .gl_upload import PlaneUpload, create_uploader
+
+# PlanarFrame.fmt -> shader 中的 inputFormat
+INPUT_FORMAT_RGB = 0
+INPUT_FORMAT_YUV420P = 1
+INPUT_FORMAT_NV12 = 2
 
 class VideoPanel(QOpenGLWidget, QOpenGLExtraFunctions):
+    # 落后时钟超过这么多帧间隔的帧在解码后直接丢弃，不做转换
+    LATE_DROP_FRAMES = 2
+    # 最多连续丢弃的迟到帧数
+    LATE_DROP_LIMIT = 8
+    # 达到这些倍速时让编解码器跳过非参考帧 / 只解关键帧
+    SKIP_NONREF_SPEED = 4.0
+    SKIP_NONKEY_SPEED = 8.0
+
     request_update = Signal()
-    def __init__(self, path, config,hwaccel, parent=None,flag = 0):
+    def __init__(self, path, config,hwaccel, parent=None,flag = 0, decoder=None):
         super().__init__(parent)
         QOpenGLExtraFunctions.__init__(self)
 
@@ -30,7 +56,12 @@ class VideoPanel(QOpenGLWidget, QOpenGLExtraFunctions):
 
         self.cfg = config
         print("self.cfg:",self.cfg,hasattr(self.cfg,"play_sections"))
-        self.decoder = VideoDecoder(path, hwaccel)
+        # 解码器可以由调用方在后台线程里提前打开好再传进来
+        self.decoder = decoder if decoder is not None else self.create_decoder(path, config, hwaccel)
+        output_format = self.decoder.output_format
+        # play_sections 编译成排好序的区间，逐帧判断时只做二分查找
+        self.timeline = Timeline.compile(self.cfg.get("play_sections"), self.decoder.duration)
+        self._seek_target = None
         self.paused = False
         self.pause_time = None
         self.total_paused_duration = 0.0
@@ -41,29 +72,92 @@ class VideoPanel(QOpenGLWidget, QOpenGLExtraFunctions):
         self.seek_lock = threading.Lock()
         self.pending_seek  = None
         self.seek_accurate = False
+
+        # 拖动进度条期间的关键帧预览模式
+        self.scrubbing = False
+        self.pending_scrub = None
         
         self.video_width = 0
         self.video_height = 0
         self._texture_id = None
+        self._plane_textures = []   # YUV 模式下的 U、V 纹理
+        # 默认通过 PBO 环异步上传，"pbo_upload": false 时退回同步上传
+        self._use_pbo = self.cfg.get("pbo_upload", True)
+        self._uploader = None
         self._initialized = False 
 
         # 1. 核心缓冲区：存放解码好的帧 (frame, pts)
-        self.frame_queue = queue.Queue(maxsize=8) 
+        # 解码与呈现由全局调度器驱动，面板不再自带线程，队列与调度器共用条件变量
+        self._scheduler = DecodeScheduler.instance()
+        self.frame_queue = FrameQueue(maxsize=8, cond=self._scheduler.cond)
+        self._cond = self.frame_queue.cond
+        self._last_queued_pts = None
+
+        # present_mode: "tick"（默认，调度器按 PTS 逐帧触发重绘）或 "vsync"（按屏幕刷新统一重绘）
+        self.present_mode = self.cfg.get("present_mode", "tick")
+        self._presenter = None
+        self._screen_hooked = False
+
+        # 调度器为该面板工作的次数与 CPU 时间，进统计采样，用于确认暂停/空闲时几乎不耗资源
+        self.wakeups = {"decode": 0, "render": 0}
+        self.thread_cpu = {"decode": 0.0, "render": 0.0}
+
+        # 在原始帧上就被丢弃、省掉了像素转换的帧数（按原因）
+        self.conversions_skipped = {"section": 0, "late": 0, "speed": 0}
+        self._late_run = 0
+        self._frame_interval = 1.0 / (self.decoder.info["fps"] or 25.0)
+        # 解码跟不上时逐级丢帧追赶时钟，计数可以看出哪些面板超出了预算
+        self.qos = FrameQoS(path, self._frame_interval)
+        self._skip_applied = "DEFAULT"
+
+        # 流水线统计：各环节耗时记在 timings 里，由统计线程定期采样（关闭时不计时）
+        self.timings = Timings()
+        self.decoder.timings = self.timings
+        # 共享解码时源在解码线程上用它判断还有没有面板要这一帧（只读，不改本面板的状态）
+        self.decoder.wants = self._wants_pts
+        self.telemetry_id = Telemetry.instance().register(self)
+        self.telemetry_last = None
+        self._telemetry_mark = None
+        self._painted = 0
+
+        # 预分配的帧缓冲环：队列容量 + 正在显示 + 正在解码 + 1 块余量
+        stream = self.decoder.stream
+        pool_fmt = "yuv420p" if output_format == "yuv" else "rgb24"
+        self.frame_pool = FramePool(self.frame_queue.maxsize + 3, pool_fmt,
+                                    stream.width, stream.height)
         self.running = True
         self.paused = False
         
         # 2. 状态变量
         self._frame = None
         self._current_pts = 0
-        self.start_time = 0
-
-        # 3. 启动后台解码线程
-        self.decode_thread = threading.Thread(target=self._decode_loop, daemon=True)
-        self.decode_thread.start()
-
-        # 4. 启动渲染轮询线程 (或者使用精准的间隔控制)
-        self.render_thread = threading.Thread(target=self._render_loop, daemon=True)
-        self.render_thread.start()
+        # 初始时先不设置 start_time，等到真正拿到第一帧再开始计时
+        self.start_time = None
+        # 播放速度：媒体时间 = (当前时刻 - start_time) * speed
+        self.speed = 1.0
+        self._speed_applied = 1.0
+        self._last_kept_pts = None
+        self._refresh_interval = 1.0 / 60
+
+        # 循环缓存：不超过 loop_cache_seconds 秒的片段第一次循环时录下解码帧，之后直接回放
+        self._loop_cache = LoopCache.instance()
+        self._loop_max_seconds = float(self.cfg.get("loop_cache_seconds", 30))
+        self.pending_loop = False
+        self._recorder = None
+        self._replay = None
+
+        # 启动报告中的名字，以及是否已经画出第一帧
+        self.startup_key = path
+        self._first_painted = False
+
+        # 解码端缩放：输出尺寸跟随面板的帧缓冲尺寸（"decode_scale": "native" 时关闭）
+        self._auto_scale = self.cfg.get("decode_scale", "auto") == "auto"
+        self._native_forced = False
+        self._size_controller = OutputSizeController(stream.width, stream.height)
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(250)
+        self._resize_timer.timeout.connect(self._apply_output_size)
 
         self.program = None
         self.vao = None
@@ -76,122 +170,504 @@ class VideoPanel(QOpenGLWidget, QOpenGLExtraFunctions):
         # 将信号连接到 update槽函数
         self.request_update.connect(self.update)
 
-    def _decode_loop(self):
-        while self.running:
-            if self.paused or self.frame_queue.full():
-                time.sleep(0.005)
-                continue
+        # 3. 交给全局调度器开始解码与呈现
+        self._scheduler.register(self)
+
+    @staticmethod
+    def create_decoder(path, config, hwaccel):
+        """按配置创建解码器；会阻塞在打开容器上，可在工作线程里调用"""
+        # upload_format: "rgb"（默认，CPU 转 RGB）或 "yuv"（按平面上传，shader 转换）
+        output_format = "yuv" if config.get("upload_format") == "yuv" else "rgb24"
+        # thread_type: "auto"（默认）、"frame" 或 "slice"
+        thread_type = config.get("thread_type", "auto")
+        # 同一文件、播放设置相同的面板默认共用一个解码器（"shared_decode": false 关闭）
+        if config.get("shared_decode", True):
+            return open_shared(path, hwaccel, output_format, thread_type, config.get("play_sections"))
+        return VideoDecoder(path, hwaccel, output_format, thread_type)
+
+    def decode_ready(self):
+        """是否有解码工作可做（调度器持有 self._cond 时调用）"""
+        if not self.running:
+            return False
+        if self.scrubbing:
+            return self.pending_scrub is not None
+        if self.paused:
+            return False
+        if self.pending_seek is not None:
+            return True
+        # 共享解码时别的面板已经跳到了下一轮：等自己也跳过去（队列放空了就分出去单独解码）
+        if self.decoder.blocked and len(self.frame_queue) > 0 and self.next_time() == -1:
+            return False
+        # 已经解码过了当前区间的结尾：后面的帧跳转时都会被丢弃，先等跳转
+        if len(self.frame_queue) > 0 and self._past_section_end():
+            return False
+        return not self.frame_queue.full()
+
+    def _past_section_end(self):
+        tail = self._last_queued_pts
+        if not self.timeline or tail is None:
+            return False
+        boundary = self.timeline.next_boundary(self._current_pts)
+        return boundary is not None and boundary[1] == "end" and tail > boundary[0] + TOLERANCE
+
+    def decode_deadline(self):
+        """下一帧需要显示的时刻，供调度器做最早截止时间优先"""
+        if self.scrubbing or self.pending_seek is not None:
+            return float("-inf")
+        if self.start_time is None:
+            return 0.0
+        tail = self._last_queued_pts
+        if tail is None:
+            tail = self._current_pts
+        return self._present_at(tail)
+
+    def decode_step(self):
+        """解码一步：处理 seek / 区间跳转，或者读取一帧放入队列"""
+        t0 = time.thread_time()
+        self.wakeups["decode"] += 1
+        try:
+            self._decode_step()
+        finally:
+            self.thread_cpu["decode"] += time.thread_time() - t0
 
+    def _decode_step(self):
+        if self.scrubbing:
+            self._scrub_step()
+            return
 
-            # 0. 处理来自UI线程或其他线程的 seek 请求
-            with self.seek_lock:
-                if self.pending_seek is not None:
-                    target = self.pending_seek
-                    
+        # 0. 处理来自UI线程或其他线程的 seek 请求
+        with self.seek_lock:
+            if self.pending_seek is not None:
+                target = self.pending_seek
+
+                # 循环/区间跳转可以直接从缓存回放，用户 seek 则放弃正在录制的片段
+                looping = self.pending_loop
+                self._end_loop_span("jump" if looping else None, target)
+                span = self._loop_cache.lookup(self._loop_key(target)) if looping else None
+                if span is not None:
+                    self._replay = LoopReplay(span)
+                else:
+                    if not looping:
+                        # 用户 seek：不再与其它面板共用解码器
+                        self.decoder.fork()
                     self.decoder.seek(target,self.seek_accurate)
-                    
+                    # 倍速时只转换会被看到的帧，录下来的片段不完整，只在 1 倍速时录制
+                    if (looping and self.speed == 1.0
+                            and 0 < self._loop_span_seconds(target) <= self._loop_max_seconds):
+                        self._recorder = self._loop_cache.begin(self._loop_key(target))
 
-                    # 清空旧帧
-                    while not self.frame_queue.empty():
-                        self.frame_queue.get_nowait()
 
-                    # 重置时钟
-                    self.start_time = time.perf_counter() - target
-                    self._current_pts = target
+                # 清空旧帧
+                self._drain_queue()
 
-                    self.seek_accurate = False
-                    self.pending_seek = None
-
-                    continue  # 非常重要：重新进入循环
-
-            # 1. 检查是否需要跳转到下一个区间
-            jump_target = self.next_time()
-            if jump_target != -1:
-                self.seek_to(jump_target)
-                # 跳转后立即继续循环，确保逻辑重新判定
-                continue
-                
-            # 2. 读取帧
-            frame, pts = self.decoder.read_frame()
+                # 重置时钟
+                with self._cond:
+                    self._reset_clock(time.perf_counter(), target)
+                    self._current_pts = target
+                self._seek_target = target
+                self._last_kept_pts = None
+
+                self.seek_accurate = False
+                self.pending_seek = None
+                self.pending_loop = False
+
+                return  # 非常重要：重新进入循环
+
+        if self.speed != self._speed_applied:
+            self._apply_speed()
+        # 共享解码的面板不能单独让编解码器跳帧
+        max_level = FrameQoS.DROP_CONVERT if self.decoder.shared else FrameQoS.SKIP_NONREF
+        if max_level != self.qos.max_level:
+            self.qos.set_max_level(max_level)
+        skip = self._skip_mode()
+        if skip != self._skip_applied:
+            self._apply_skip(skip)
+
+        # 1. 检查是否需要跳转到下一个区间
+        jump_target = self.next_time()
+        if jump_target != -1:
+            self._loop_seek(jump_target)
+            # 跳转后立即继续循环，确保逻辑重新判定
+            return
             
+        # 2. 读取帧（回放缓存时不解码）
+        if self._replay is not None:
+            frame, pts = self._replay.read(self.frame_pool, self._accept_pts)
+            if pts is None:
+                span = self._replay.span
+                self._replay = None
+                if span.end == "jump":
+                    # 片段是在跳到下一个区间时结束的，放完后照样跳过去
+                    self._loop_seek(span.jump_to)
+                    return
+        else:
+            # yuv 模式下 PyAV 的平面直接交给上传（零拷贝），只有录制循环片段时才需要拷进帧池的连续缓冲
+            pooled = self.decoder.output_format != "yuv" or self._recorder is not None
+            pool = self.frame_pool if pooled else None
+            frame, pts = self.decoder.read_frame(pool, self._accept_pts)
+        if not self.running:
             if frame is not None:
-                # 3. 关键防御：如果读到的帧 PTS 明显早于当前目标区间（seek 误差产生）
-                # 我们需要找到当前应该处于的 start_time
-                target_start = self.get_current_section_start(pts)
-                if pts < target_start - 0.1:
-                    continue # 丢弃该帧，继续读下一帧
+                frame.release()
+            return
 
-                self.frame_queue.put((frame, pts))
+        if pts is not None and self._out_of_sections(pts):
+            # 3. 关键防御：读到的帧不在任何区间内（seek 误差产生，或解码越过了区间结尾）
+            if frame is not None:
+                frame.release()
+            if self.timeline.next_boundary(pts) is None:
+                # 解码已越过最后一个区间：直接回到第一个区间
+                self._loop_seek(self.timeline.first_start)
             else:
-                # 视频结束：安全地回到最初的起点
-                sections = self.cfg.get("play_sections", [])
-                if sections and len(sections) > 0:
-                    # 获取第一个区间的 start_time，如果没有则默认为 0
-                    first_start = sections[0].get("start_time", 0)
-                    self.seek_to(first_start)
-                else:
-                    # 如果根本没有 play_sections，就回到视频最开始
-                    self.seek_to(0)
+                target_start = self.get_current_section_start(pts)
+                if target_start != self._seek_target:
+                    # 解码越过了当前区间的结尾、进入两个区间之间的空档：直接跳到下一个区间，
+                    # 不再逐帧解码穿过空档（只有刚 seek 到该区间时才是在消耗 seek 误差）
+                    self._loop_seek(target_start)
+            return # 丢弃该帧，继续读下一帧
+
+        if frame is not None:
+            self._last_queued_pts = pts
+            if self._recorder is not None and not self._recorder.add(frame, pts):
+                self._recorder = None
+            self.frame_queue.put((frame, pts))
+        elif pts is None:
+            self._end_loop_span("eof")
+            # 视频结束：回到第一个区间的起点，没有 play_sections 时回到视频最开始
+            self._loop_seek(self.timeline.first_start)
+
+    def _out_of_sections(self, pts):
+        """pts 早于它所属区间的起点，或已越过最后一个区间"""
+        if not self.timeline:
+            return False
+        return (self.timeline.next_boundary(pts) is None
+                or pts < self.timeline.section_start(pts) - TOLERANCE)
+
+    def _accept_pts(self, pts):
+        """
+        解码线程在原始帧上调用：这一帧会不会被用到，不会的就不做像素转换。
+        区间外的帧一律丢弃；QoS 升到 drop-convert 后，落后时钟太多的帧马上就会被后面的帧
+        替换，也丢弃，但连续最多丢 LATE_DROP_LIMIT 帧，保证画面仍在更新。录制循环片段时不丢迟到的帧。
+        倍速播放时，与上一帧相隔不到一次屏幕刷新的帧根本来不及显示，同样丢弃。
+        """
+        reason = self._discard_reason(pts)
+        if reason is not None:
+            self.conversions_skipped[reason] += 1
+            if reason == "late":
+                self._late_run += 1
+                self.qos.drop_convert()
+            return False
+        self._late_run = 0
+        self._last_kept_pts = pts
+        return True
+
+    def _wants_pts(self, pts):
+        """_accept_pts 的只读版本，可以在别的面板的解码线程上调用"""
+        return self._discard_reason(pts) is None
+
+    def _discard_reason(self, pts):
+        """这一帧为什么会被丢弃："section" / "speed" / "late"，会被用到时返回 None"""
+        if self._out_of_sections(pts):
+            return "section"
+        speed = self.speed
+        last = self._last_kept_pts
+        if speed > 1.0 and last is not None and pts > last:
+            # 留 1/4 帧间隔的余量，避免时间戳抖动让本该保留的帧被丢掉
+            if pts - last < speed * self._refresh_interval - 0.25 * self._frame_interval:
+                return "speed"
+        if (self.qos.level >= FrameQoS.DROP_CONVERT and self.start_time is not None
+                and not self.paused and self._recorder is None
+                and self._late_run < self.LATE_DROP_LIMIT):
+            late = time.perf_counter() - self._present_at(pts)
+            if late > self.LATE_DROP_FRAMES * self._frame_interval:
+                return "late"
+        return None
+
+    def _present_at(self, pts):
+        """pts 应当显示的时刻（perf_counter），需已有 start_time"""
+        return self.start_time + pts / self.speed
+
+    def _reset_clock(self, now, pts):
+        """让时钟在 now 时刻正好走到 pts"""
+        self.start_time = now - pts / self.speed
+
+    def set_speed(self, speed):
+        """设置播放速度；时钟从当前位置按新速度继续走，不跳变"""
+        speed = float(speed)
+        if speed <= 0:
+            return
+        with self._cond:
+            if speed == self.speed:
+                return
+            if self.start_time is not None:
+                now = self.pause_time if self.paused and self.pause_time is not None else time.perf_counter()
+                position = (now - self.start_time) * self.speed
+                self.speed = speed
+                self._reset_clock(now, position)
+            else:
+                self.speed = speed
+            self._last_kept_pts = None
+            self._cond.notify_all()
+
+    def _skip_mode(self):
+        if self.speed >= self.SKIP_NONKEY_SPEED:
+            return "NONKEY"
+        if self.speed >= self.SKIP_NONREF_SPEED or self.qos.level >= FrameQoS.SKIP_NONREF:
+            return "NONREF"
+        return "DEFAULT"
+
+    def _apply_skip(self, mode):
+        """跳帧后解出的帧不完整，正在录制的循环片段放弃"""
+        if mode != "DEFAULT" and self._recorder is not None:
+            self._recorder.abort()
+            self._recorder = None
+        self.decoder.set_skip_frame(mode)
+        self._skip_applied = mode
+
+    def _apply_speed(self):
+        """解码线程里应用新的速度（跳帧模式随后由 _apply_skip 在同一线程里设置）"""
+        speed = self.speed
+        if speed != 1.0:
+            # 倍速的面板与其它面板节奏不同，不再共用解码器；也不再录制循环片段
+            self.decoder.fork()
+            if self._recorder is not None:
+                self._recorder.abort()
+                self._recorder = None
+        self._speed_applied = speed
+
+    def _loop_seek(self, seconds):
+        """循环回起点或跳到下一个区间：与 seek_to 相同，但允许从循环缓存回放"""
+        with self.seek_lock:
+            self.pending_seek = seconds
+            self.seek_accurate = False
+            self.pending_loop = True
+        self.frame_queue.notify()
+
+    def _loop_key(self, target):
+        """同一文件、同一输出规格、同一起点的片段在面板之间共用"""
+        decoder = self.decoder
+        w, h = decoder.output_size or (decoder.stream.width, decoder.stream.height)
+        return (tuple(file_signature(decoder.path)), decoder.output_format, w, h, round(float(target), 3))
+
+    def _loop_span_seconds(self, target):
+        """从 target 开始连续播放的时长：所在区间的长度，没有区间时到文件结尾"""
+        end = self.timeline.section_end(target) if self.timeline else None
+        if end is None:
+            end = float(self.decoder.duration)
+        return end - target
+
+    def _end_loop_span(self, end, jump_to=None):
+        """结束回放；正在录制的片段在 end 为 "eof"/"jump" 时收下，为 None 时丢弃"""
+        self._replay = None
+        if self._recorder is not None:
+            if end:
+                self._recorder.finish(end, jump_to)
+            else:
+                self._recorder.abort()
+            self._recorder = None
 
     def get_current_section_start(self, pts):
         """辅助函数：找到给定 PTS 应该对应的区间起点"""
-        for sec in self.cfg.get("play_sections", []):
-            start = float(sec["start_time"])
-            duration = float(sec["duration"])
-            end = start + duration if duration != -1 else float('inf')
-            if pts <= end + 0.1:
-                return start
-        return 0.0
+        return self.timeline.section_start(pts)
+
+    def take_due_frame(self, now):
+        """呈现节拍调用（持有 self._cond）：队首帧的 PTS 到期就取出，否则返回 None"""
+        if self.paused or not self.running or self.present_mode == "vsync":
+            return None
+        item = self.frame_queue.peek()
+        if item is None:
+            return None
+
+        _, pts = item
+        # 如果是第一帧，或者 seek 之后，初始化时钟
+        if self.start_time is None:
+            self._reset_clock(now, pts)
+        if now < self._present_at(pts):
+            return None
+        item = self.frame_queue.pop()
+        if self.qos.level >= FrameQoS.DROP_UPLOAD:
+            # 后面的帧也已经到期：这一帧不上传，直接换成后面的
+            while True:
+                after = self.frame_queue.peek()
+                if after is None or now < self._present_at(after[1]):
+                    break
+                item[0].release()
+                self.qos.drop_upload()
+                item = self.frame_queue.pop()
+        lateness = now - self._present_at(item[1])
+        if Telemetry.enabled:
+            self.timings.add("latency", lateness)
+            self.timings.add("queue", len(self.frame_queue))
+        if self.qos.on_present(lateness):
+            self._reset_clock(now, item[1])
+        return item
+
+    def next_present_at(self):
+        """队首帧应显示的时刻；暂停或队列为空时返回 None"""
+        if self.paused or self.start_time is None or self.present_mode == "vsync":
+            return None
+        item = self.frame_queue.peek()
+        return None if item is None else self._present_at(item[1])
+
+    def present_latest(self, now):
+        """
+        vsync 模式下由 GUI 线程每次刷新调用：取出所有到期帧，只保留最新的一帧换上，
+        较早的到期帧直接归还帧池。有新帧时返回 True，由调用方统一 update()。
+        """
+        with self._cond:
+            if self.paused or not self.running:
+                return False
+            latest = None
+            while True:
+                item = self.frame_queue.peek()
+                if item is None:
+                    break
+                if self.start_time is None:
+                    self._reset_clock(now, item[1])
+                if now < self._present_at(item[1]):
+                    break
+                if latest is not None:
+                    latest[0].release()
+                    self.qos.drop_upload()
+                latest = self.frame_queue.pop()
+            if latest is None:
+                return False
+            lateness = now - self._present_at(latest[1])
+            if Telemetry.enabled:
+                self.timings.add("latency", lateness)
+                self.timings.add("queue", len(self.frame_queue))
+            if self.qos.on_present(lateness):
+                self._reset_clock(now, latest[1])
+
+        self.wakeups["render"] += 1
+        with self._lock:
+            old, self._frame = self._frame, latest[0]
+            self._current_pts = latest[1]
+        if old is not None:
+            old.release()
+        return True
+
+    def _attach_presenter(self):
+        """按面板当前所在的屏幕挂到对应的 vsync 节拍器上"""
+        if self.present_mode != "vsync" or not self.running:
+            return
+        presenter = VsyncPresenter.for_screen(self.screen())
+        if presenter is self._presenter:
+            return
+        if self._presenter is not None:
+            self._presenter.detach(self)
+        self._presenter = presenter
+        presenter.attach(self)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # 倍速播放时按屏幕刷新间隔决定哪些帧来得及显示
+        screen = self.screen()
+        if screen is not None and screen.refreshRate() > 0:
+            self._refresh_interval = 1.0 / screen.refreshRate()
+        # 可见的面板参与线程预算分配
+        ThreadBudget.instance().set_active(self.decoder, True)
+        if self.present_mode == "vsync":
+            self._attach_presenter()
+            # 窗口被拖到另一块屏幕时切换节拍器
+            handle = self.window().windowHandle()
+            if handle is not None and not self._screen_hooked:
+                handle.screenChanged.connect(lambda _: self._attach_presenter())
+                self._screen_hooked = True
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        # 被隐藏（例如其它面板全窗）时只保留 1 个编解码线程
+        ThreadBudget.instance().set_active(self.decoder, False)
+
+    def show_frame(self, frame, pts):
+        """换上新帧并请求重绘；帧池缓冲区本身就是连续内存，无需再拷贝，旧帧归还帧池"""
+        t0 = time.thread_time()
+        self.wakeups["render"] += 1
+        with self._lock:
+            old, self._frame = self._frame, frame
+            self._current_pts = pts
+        if old is not None:
+            old.release()
+        #self.update() # 触发 paintGL
+        self.request_update.emit()
+        self.thread_cpu["render"] += time.thread_time() - t0
+
+    def telemetry_sample(self, dt):
+        """统计线程调用：返回自上次采样以来的一行统计（耗时单位 ms）"""
+        timings = self.timings.take()
+
+        def ms(name):
+            avg, peak, _ = timings.get(name, (0.0, 0.0, 0))
+            return round(avg * 1000, 2), round(peak * 1000, 2)
+
+        qos = self.qos.counters
+        skipped = self.conversions_skipped
+        mark = (qos["presented"], self._painted, qos["late"],
+                qos["dropped_upload"] + qos["dropped_convert"],
+                skipped["section"] + skipped["speed"],
+                self.wakeups["decode"], self.wakeups["render"],
+                self.thread_cpu["decode"], self.thread_cpu["render"])
+        last = self._telemetry_mark or (0,) * len(mark)
+        self._telemetry_mark = mark
+        delta = [a - b for a, b in zip(mark, last)]
+        dt = max(dt, 1e-6)
+
+        sample = {
+            "time": round(time.time(), 3),
+            "panel": self.telemetry_id,
+            "path": self.startup_key,
+            "fps": round(delta[0] / dt, 1),
+            "painted_fps": round(delta[1] / dt, 1),
+            "queue": len(self.frame_queue),
+            "queue_avg": round(timings.get("queue", (0.0,))[0], 1),
+        }
+        for name in ("decode", "convert", "upload", "paint", "latency"):
+            sample[f"{name}_ms"], sample[f"{name}_max_ms"] = ms(name)
+        sample.update(late=delta[2], dropped=delta[3], skipped=delta[4],
+                      qos_level=self.qos.LEVELS[self.qos.level],
+                      # 每秒被调度器唤醒的次数和占一个核的百分比，暂停的面板应接近 0
+                      decode_wakeups=round(delta[5] / dt, 1), render_wakeups=round(delta[6] / dt, 1),
+                      decode_cpu=round(delta[7] / dt * 100, 1), render_cpu=round(delta[8] / dt * 100, 1))
+        self.telemetry_last = sample
+        return sample
+
+    def _drain_queue(self):
+        """清空帧队列并把缓冲区归还帧池"""
+        for frame, _ in self.frame_queue.clear():
+            frame.release()
+        self._last_queued_pts = None
+
+    def _scrub_step(self):
+        """拖动中：只处理最新的目标位置，解码离它最近的关键帧并立即显示"""
+        with self.seek_lock:
+            target = self.pending_scrub
+            self.pending_scrub = None
+        if target is None:
+            return
 
-    def _render_loop(self):
-        """ 消费者：根据 PTS 同步时钟 """
+        self._end_loop_span(None)
+        self._drain_queue()
+        frame, pts = self.decoder.read_keyframe(target, self.frame_pool)
+        if frame is None:
+            return
+        self.show_frame(frame, pts)
 
-        # 初始时先不设置 start_time，等到真正拿到第一帧再开始计时
-        self.start_time = None
-        #self.start_time = time.perf_counter()
-        
-        while self.running:
-            if self.paused:
-                if self.pause_time is None:
-                    self.pause_time = time.perf_counter()
-                time.sleep(0.01)
-                continue
-            else:
-                # 如果刚刚从暂停恢复
-                if self.pause_time is not None:
-                    paused_duration = time.perf_counter() - self.pause_time
-                    self.start_time += paused_duration
-                    self.pause_time = None
+    def begin_scrub(self):
+        self.scrubbing = True
+        self.frame_queue.notify()
 
-            try:
-                # 查看队列里的下一帧，但不取出
-                frame, pts = self.frame_queue.queue[0]
+    def scrub_to(self, seconds):
+        # 拖动过程中的多次请求只保留最后一个
+        with self.seek_lock:
+            self.pending_scrub = seconds
+        self.frame_queue.notify()
 
-                # 如果是第一帧，或者 seek 之后，初始化时钟
-                if self.start_time is None:
-                    self.start_time = time.perf_counter() - pts
-                
-                # 计算视频播放到现在的物理时间
-                elapsed = time.perf_counter() - self.start_time
-                
-                # --- 同步核心逻辑 ---
-                if elapsed >= pts:
-                    # 时间到了，取出并更新画面
-                    self.frame_queue.get()
-                    with self._lock:
-                        self._frame = np.ascontiguousarray(frame, dtype=np.uint8)
-                        self._current_pts = pts
-                    #self.update() # 触发 paintGL
-                    self.request_update.emit()
-                else:
-                    # 时间还没到，休眠一小会儿再检查
-                    sleep_time = max(0.001, (pts - elapsed) / 2)
-                    #print("in sleep...",sleep_time)
-                    time.sleep(sleep_time)
-                    
-            except IndexError:
-                # 队列空了，等解码
-                time.sleep(0.01)
+    def end_scrub(self, seconds):
+        """松开进度条：退出预览模式并做一次精确 seek"""
+        with self.seek_lock:
+            self.pending_scrub = None
+        self.scrubbing = False
+        self.seek_to(seconds, True)
 
     def seek_to(self, seconds,accurate=False):
         self.request_seek(seconds,accurate)
@@ -200,71 +676,70 @@ class VideoPanel(QOpenGLWidget, QOpenGLExtraFunctions):
         with self.seek_lock:
             self.pending_seek = seconds
             self.seek_accurate = accurate
+            self.pending_loop = False
+        self.frame_queue.notify()
 
     def current_second(self):
         # 单位：秒)
+        if self.pending_scrub is not None:
+            return int(self.pending_scrub)
         return int(self._current_pts if self.pending_seek is None else self.pending_seek)
     def current_ms(self):
         # 更新进度条 (单位：毫秒)
         return int(self.current_second() * 1000)
     
     def next_time(self):
-        if "play_sections" not in self.cfg or not self.cfg["play_sections"]:
+        """当前显示位置需要跳转到的区间起点，不需要跳转时返回 -1"""
+        if not self.timeline:
             return -1
-        
-        # 使用真实的浮点 PTS，增加 0.1s 的容差
-        curr_pts = self._current_pts 
-        sections = self.cfg["play_sections"]
-        
-        for i, one_section in enumerate(sections):
-            start = float(one_section["start_time"])
-            duration = float(one_section["duration"])
-            # 计算结束时间
-            if duration == -1:
-                end = float(self.decoder.duration)
-            else:
-                end = start + duration
+        return self.timeline.next_time(self._current_pts)
 
-            # 逻辑 1：如果你还没到这个区间的开始点（且不在之前的区间内）
-            if curr_pts < start - 0.1:
-                return start
-            
-            # 逻辑 2：如果你正处于这个区间内，正常播放
-            if start - 0.1 <= curr_pts <= end + 0.1:
-                return -1
-            
-            # 逻辑 3：如果你已经超过了这个区间，循环会进入下一个 i 检查下一个区间
-        
-        # 逻辑 4：如果你超过了所有区间，回到第一个区间
-        return float(sections[0]["start_time"])
-                    
-    
     def play(self):
-        self.paused = False
+        with self._cond:
+            if not self.paused:
+                return
+            self.paused = False
+            # 从暂停恢复：时钟顺延暂停的时长
+            if self.pause_time is not None and self.start_time is not None:
+                self.start_time += time.perf_counter() - self.pause_time
+            self.pause_time = None
+            self._cond.notify_all()
     
     def pause(self):
-        self.paused = True
+        with self._cond:
+            if self.paused:
+                return
+            self.paused = True
+            self.pause_time = time.perf_counter()
+            self._cond.notify_all()
 
     def toggle(self):
-        self.paused = not self.paused
+        if self.paused:
+            self.play()
+        else:
+            self.pause()
 
 
     def stop(self):
         """强制停止所有线程"""
+        if not self.running:
+            return
         self.running = False
-        # 唤醒可能阻塞在队列上的线程
+        if self._presenter is not None:
+            self._presenter.detach(self)
+            self._presenter = None
+        # 唤醒可能阻塞在帧池上的解码步骤，并等它结束后从调度器移除
+        self.frame_pool.close()
+        self._scheduler.unregister(self)
+        self._end_loop_span(None)
         try:
-            while not self.frame_queue.empty():
-                self.frame_queue.get_nowait()
+            self._drain_queue()
         except:
             pass
-        
-        # 等待线程结束
-        if hasattr(self, 'decode_thread') and self.decode_thread.is_alive():
-            self.decode_thread.join(timeout=1.0)
-        if hasattr(self, 'render_thread') and self.render_thread.is_alive():
-            self.render_thread.join(timeout=1.0)
-        print("VideoPanel threads stopped.")
+        Telemetry.instance().unregister(self)
+        # 解码步骤已全部结束，可以关闭容器并把线程份额还给其它面板
+        self.decoder.close()
+        print("VideoPanel stopped.")
 
     def initializeGL(self):
 
@@ -275,16 +750,22 @@ class VideoPanel(QOpenGLWidget, QOpenGLExtraFunctions):
         self._init_shader()
         self._init_geometry()
         
-        # 使用 GL 生成纹理
-        self._texture_id = GL.glGenTextures(1)
-        GL.glBindTexture(GL.GL_TEXTURE_2D, self._texture_id)
+        # 使用 GL 生成纹理：RGB / Y 平面 + U、V 平面
+        self._texture_id = self._create_texture()
+        self._plane_textures = [self._create_texture(), self._create_texture()]
+        self._uploader = create_uploader(self._use_pbo)
+
+        GL.glClearColor(0.0, 0.0, 0.0, 1.0)
+        self._initialized = True
+
+    def _create_texture(self):
+        tex_id = GL.glGenTextures(1)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, tex_id)
         GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MIN_FILTER, GL.GL_LINEAR)
         GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_MAG_FILTER, GL.GL_LINEAR)
         GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_S, GL.GL_CLAMP_TO_EDGE)
         GL.glTexParameteri(GL.GL_TEXTURE_2D, GL.GL_TEXTURE_WRAP_T, GL.GL_CLAMP_TO_EDGE)
-
-        GL.glClearColor(0.0, 0.0, 0.0, 1.0)
-        self._initialized = True
+        return tex_id
 
     def resizeGL(self, w, h):
         # 当窗口大小改变时，立即触发一次重绘
@@ -292,51 +773,104 @@ class VideoPanel(QOpenGLWidget, QOpenGLExtraFunctions):
         # if self._initialized and self._frame is not None:
         #     self.update() 
         super().resizeGL(w, h)
+        # 尺寸稳定一段时间后再调整解码输出尺寸
+        if self._auto_scale:
+            self._resize_timer.start()
+
+    def _framebuffer_size(self):
+        # 与 QOpenGLExtraFunctions 多重继承时直接调用 QPaintDevice 的方法会崩溃，经由屏幕取 DPR
+        dpr = self.screen().devicePixelRatio()
+        return int(self.width() * dpr), int(self.height() * dpr)
+
+    def _apply_output_size(self):
+        if not self._auto_scale or self._native_forced:
+            return
+        size = self._size_controller.update(*self._framebuffer_size())
+        if size is not None:
+            self.decoder.set_output_size(size)
+
+    def set_native_resolution(self, native):
+        """全窗/全屏时切回原始分辨率解码，退出后恢复按面板尺寸缩放"""
+        self._native_forced = native
+        if native:
+            self.decoder.set_output_size(None)
+            self._size_controller.reset_native()
+        else:
+            self._apply_output_size()
 
     def paintGL(self):
         if not self._initialized or self._texture_id is None:
             return
 
+        t0 = time.perf_counter() if Telemetry.enabled else None
         #GL.glClear(GL.GL_COLOR_BUFFER_BIT | GL.GL_DEPTH_BUFFER_BIT)
         GL.glClear(GL.GL_COLOR_BUFFER_BIT)
 
+        # 上传期间持有锁，防止缓冲区被归还后被解码线程改写
         with self._lock:
             if self._frame is None: return
-            frame = self._frame
-        
-        if frame is None:
-            return
+            self._paint_frame(self._frame)
+        self._painted += 1
+        if t0 is not None:
+            self.timings.add("paint", time.perf_counter() - t0)
 
-        h, w, _ = frame.shape
+        if not self._first_painted:
+            self._first_painted = True
+            startup_report.first_frame(self.startup_key)
 
+    def _paint_frame(self, frame):
         self.program.bind()
+        self.program.setUniformValue("tex", 0)
+        self.program.setUniformValue("texU", 1)
+        self.program.setUniformValue("texV", 2)
+
+        t0 = time.perf_counter() if Telemetry.enabled else None
+        if isinstance(frame, PlanarFrame) and frame.fmt != "rgb24":
+            w, h = frame.width, frame.height
+            self._upload_planar(frame)
+        else:
+            rgb = frame.planes[0] if isinstance(frame, PlanarFrame) else frame
+            h, w, _ = rgb.shape
+            self.program.setUniformValue("inputFormat", INPUT_FORMAT_RGB)
+            self._uploader.upload([PlaneUpload(self._texture_id, rgb, w, h, 0, GL.GL_RGB, GL.GL_RGB)])
+        if t0 is not None:
+            self.timings.add("upload", time.perf_counter() - t0)
+
+        textures = [self._texture_id] + self._plane_textures
+        for unit, tex_id in enumerate(textures):
+            GL.glActiveTexture(GL.GL_TEXTURE0 + unit)
+            GL.glBindTexture(GL.GL_TEXTURE_2D, tex_id)
+
         # 传入 uniform
         self.program.setUniformValue("videoSize", float(w), float(h))
         self.program.setUniformValue("widgetSize", float(self.width()), float(self.height()))
 
-        GL.glActiveTexture(GL.GL_TEXTURE0)
-        GL.glBindTexture(GL.GL_TEXTURE_2D, self._texture_id)
-
-        # 纹理上传
-        if w != self.video_width or h != self.video_height:
-            GL.glTexImage2D(
-                GL.GL_TEXTURE_2D, 0, GL.GL_RGB,
-                w, h, 0,
-                GL.GL_RGB, GL.GL_UNSIGNED_BYTE, frame
-            )
-            self.video_width, self.video_height = w, h
-        else:
-            GL.glTexSubImage2D(
-                GL.GL_TEXTURE_2D, 0, 0, 0, w, h,
-                GL.GL_RGB, GL.GL_UNSIGNED_BYTE, frame
-            )
-
         GL.glBindVertexArray(self.vao)
         GL.glDrawElements(GL.GL_TRIANGLES, 6, GL.GL_UNSIGNED_INT, None)
         GL.glBindVertexArray(0)
 
+        GL.glActiveTexture(GL.GL_TEXTURE0)
         self.program.release()
 
+    def _upload_planar(self, frame: PlanarFrame):
+        """按平面上传 YUV 数据，颜色转换在 shader 中完成"""
+        if frame.fmt == "nv12":
+            self.program.setUniformValue("inputFormat", INPUT_FORMAT_NV12)
+            layouts = [(GL.GL_R8, GL.GL_RED), (GL.GL_RG8, GL.GL_RG)]
+        else:
+            self.program.setUniformValue("inputFormat", INPUT_FORMAT_YUV420P)
+            layouts = [(GL.GL_R8, GL.GL_RED)] * 3
+        self.program.setUniformValue("colorMatrix", 1 if frame.matrix == "bt709" else 0)
+        self.program.setUniformValue("fullRange", 1 if frame.full_range else 0)
+
+        textures = [self._texture_id] + self._plane_textures
+        # 行跨度可能带有对齐填充，通过 UNPACK_ROW_LENGTH 跳过
+        self._uploader.upload([
+            PlaneUpload(tex_id, plane, width, plane.shape[0], plane.shape[1], internal, fmt)
+            for tex_id, plane, width, (internal, fmt)
+            in zip(textures, frame.planes, frame.plane_widths, layouts)
+        ])
+
     def _init_shader(self):
         self.program = QOpenGLShaderProgram(self)
         vs_src = self._load_shader("video.vert")
@@ -8,6 +8,7 @@ from PySide6.QtGui import QCursor,QKeyEvent,QMouseEvent
 from .video_panel import VideoPanel  # 确保路径正确
 
 from .little_widgets import SpeedMenu,VolumeMenu
+from .telemetry import Telemetry, format_overlay
 
 # 假设你的 VideoPanel 和 VideoDecoder 已经在之前的代码中定义好了
 # 这里通过一个包装类将它们组合起来
@@ -15,13 +16,13 @@ from .little_widgets import SpeedMenu,VolumeMenu
 class VideoPlayer(QWidget):
     request_fullwindow = Signal(object,int)  # 把自己传出去
     request_fullscreen = Signal(object,int)  # 把自己传出去
-    def __init__(self, path, config, hwaccel=None,parent=None,flag = 0):
+    def __init__(self, path, config, hwaccel=None,parent=None,flag = 0, decoder=None):
         super().__init__(parent)
         #self.setMouseTracking(True) # 开启鼠标追踪
         self.setContentsMargins(0, 0, 0, 0)
         
         # 1. 初始化视频渲染组件
-        self.video_panel = VideoPanel(path, config, hwaccel,self,flag)
+        self.video_panel = VideoPanel(path, config, hwaccel,self,flag,decoder)
         self.duration = float(self.video_panel.decoder.duration)
         
         # 2. 创建悬浮控制栏容器
@@ -45,6 +46,13 @@ class VideoPlayer(QWidget):
         
         # 控制栏初始状态
         self.control_widget.hide() 
+
+        # 流水线统计浮层（F3 切换，所有画面同时显示/隐藏）
+        self.stats_label = QLabel(self)
+        self.stats_label.setObjectName("stats_label")
+        if flag == 0:
+            self.stats_label.setAttribute(Qt.WA_NativeWindow, True)
+        self.stats_label.hide()
         
         # 定时器
         self.ui_timer = QTimer(self)
@@ -112,7 +120,6 @@ class VideoPlayer(QWidget):
         h_layout.addWidget(self.max_btn1)
         h_layout.setSpacing(3)
 
-        self.speed_btn.hide()
         self.vol_btn.hide()
 
         # 信号连接
@@ -162,6 +169,19 @@ class VideoPlayer(QWidget):
         self.cur_time_label.setText(cur_str)
         self.total_time_label.setText(total_str)
         self.play_btn.setText("ll" if not self.video_panel.paused else "▶")
+        self.update_stats_overlay()
+
+    def update_stats_overlay(self):
+        if not Telemetry.instance().overlay:
+            if self.stats_label.isVisible():
+                self.stats_label.hide()
+            return
+        self.stats_label.setText(format_overlay(self.video_panel.telemetry_last))
+        self.stats_label.adjustSize()
+        self.stats_label.move(10, 10)
+        if not self.stats_label.isVisible():
+            self.stats_label.raise_()
+            self.stats_label.show()
 
     def stop(self):
         self.video_panel.stop()
@@ -176,14 +196,16 @@ class VideoPlayer(QWidget):
 
     def on_slider_pressed(self):
         self.is_dragging = True
+        self.video_panel.begin_scrub()
     
     def on_slider_Moved(self,value):
+        # 拖动中只预览关键帧，请求会被合并为最新的位置
         if self.is_dragging:
-            self.seek_to(value)
+            self.video_panel.scrub_to(value / 1000.0)
 
     def on_slider_released(self):
         target = self.slider.value()
-        self.seek_to(target,True)
+        self.video_panel.end_scrub(target / 1000.0)
         self.is_dragging = False
     
     def seek_to(self,value,accurate = False):
@@ -214,6 +236,11 @@ class VideoPlayer(QWidget):
                 background: transparent;
                 font-size:11px;
             }
+            QLabel#stats_label {
+                background-color: rgba(0, 0, 0, 160);
+                font-family: Consolas, monospace;
+                padding: 4px;
+            }
 
             /* 按钮样式 */
             QPushButton {
@@ -315,11 +342,21 @@ class VideoPlayer(QWidget):
 
     def on_speed_change(self, val):
         print(f"切换倍速: {val}")
-        # 这里调用你解码器的 set_speed 方法
+        self.video_panel.set_speed(float(val.rstrip("倍")))
         # 同时更新按钮文字和颜色样式
         self.speed_btn.setText(val)
+        self.speed_menu.select(val)
         self.speed_menu.hide()
 
+    def step_speed(self, step):
+        """按倍速菜单的档位加快（step=1）或减慢（step=-1）"""
+        speeds = sorted(self.speed_menu.speeds, key=lambda s: float(s.rstrip("倍")))
+        values = [float(s.rstrip("倍")) for s in speeds]
+        current = min(range(len(values)), key=lambda i: abs(values[i] - self.video_panel.speed))
+        target = max(0, min(len(speeds) - 1, current + step))
+        if target != current:
+            self.on_speed_change(speeds[target])
+
     def on_volume_change(self, val):
         # 调整音量逻辑
         pass
@@ -343,6 +380,21 @@ class VideoPlayer(QWidget):
         elif event.key() == Qt.Key_Space:
             self.toggle_play()
             event.accept()
+
+        # ] / [：加快 / 减慢播放速度
+        elif event.key() == Qt.Key_BracketRight:
+            self.step_speed(1)
+            event.accept()
+
+        elif event.key() == Qt.Key_BracketLeft:
+            self.step_speed(-1)
+            event.accept()
+
+        # F3：显示/隐藏所有画面上的统计浮层
+        elif event.key() == Qt.Key_F3:
+            Telemetry.instance().toggle_overlay()
+            self.update_stats_overlay()
+            event.accept()
             
         else:
             super().keyPressEvent(event)
\ No newline at end of file
@@ -0,0 +1,73 @@
+import time
+
+from PySide6.QtCore import QObject, QTimer, Qt
+
+
+class VsyncPresenter(QObject):
+    """
+    每个 QScreen 一个呈现节拍器，跟随屏幕刷新率。
+    每次刷新为该屏幕上的所有面板取出最新的到期帧，有新帧的面板各自调用 update()。
+    一个计时器驱动一块屏幕上所有面板的重绘，不再由各面板各自按 PTS 触发；
+    但每个 QOpenGLWidget 仍然各自合成、各自交换缓冲，并没有合并成一次。
+    计时器在首个面板 frameSwapped（交换缓冲受垂直同步约束）后重新起算，使节拍对齐 vsync。
+    """
+    _instances = {}
+
+    @classmethod
+    def for_screen(cls, screen):
+        presenter = cls._instances.get(screen)
+        if presenter is None:
+            presenter = cls(screen)
+            cls._instances[screen] = presenter
+        return presenter
+
+    def __init__(self, screen):
+        super().__init__()
+        self.screen = screen
+        self.panels = []
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.timeout.connect(self._tick)
+        self._update_interval(screen.refreshRate())
+        screen.refreshRateChanged.connect(self._update_interval)
+
+        # 统计：节拍次数与实际重绘的面板次数
+        self.ticks = 0
+        self.repaints = 0
+
+    def _update_interval(self, rate):
+        rate = rate if rate and rate > 1 else 60.0
+        self.timer.setInterval(max(1, int(round(1000.0 / rate))))
+
+    def attach(self, panel):
+        if panel in self.panels:
+            return
+        if not self.panels:
+            panel.frameSwapped.connect(self._on_swapped)
+        self.panels.append(panel)
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def detach(self, panel):
+        if panel not in self.panels:
+            return
+        if self.panels[0] is panel:
+            panel.frameSwapped.disconnect(self._on_swapped)
+            if len(self.panels) > 1:
+                self.panels[1].frameSwapped.connect(self._on_swapped)
+        self.panels.remove(panel)
+        if not self.panels:
+            self.timer.stop()
+
+    def _on_swapped(self):
+        # 交换完成即刚过 vsync，从这里重新起算下一次节拍
+        self.timer.start()
+
+    def _tick(self):
+        self.ticks += 1
+        now = time.perf_counter()
+        for panel in self.panels:
+            if panel.present_latest(now):
+                self.repaints += 1
+                panel.update()
@@ -0,0 +1,10 @@
+#version 330 core
+in vec2 vTexCoord;
+flat in float vLayer;
+out vec4 FragColor;
+
+uniform sampler2DArray frames;   // 同尺寸画面的纹理数组，每路一层
+
+void main() {
+    FragColor = texture(frames, vec3(vTexCoord, vLayer));
+}
@@ -0,0 +1,26 @@
+#version 330 core
+layout (location = 0) in vec2 position;   // 单位矩形，(0,0) 为左下角
+layout (location = 1) in vec2 texCoord;
+layout (location = 2) in vec4 cell;       // 每个实例：格子的 x, y, 宽, 高（NDC）
+layout (location = 3) in vec3 video;      // 每个实例：视频宽、高，纹理数组中的层
+
+uniform vec2 viewportSize;
+
+out vec2 vTexCoord;
+flat out float vLayer;
+
+void main() {
+    // 按视频宽高比缩进格子里并居中，其余部分留给清屏色
+    vec2 cellPixels = cell.zw * 0.5 * viewportSize;
+    float videoAspect = video.x / video.y;
+    float cellAspect = cellPixels.x / cellPixels.y;
+    vec2 scale = videoAspect > cellAspect
+        ? vec2(1.0, cellAspect / videoAspect)
+        : vec2(videoAspect / cellAspect, 1.0);
+    vec2 size = cell.zw * scale;
+    vec2 origin = cell.xy + (cell.zw - size) * 0.5;
+
+    gl_Position = vec4(origin + position * size, 0.0, 1.0);
+    vTexCoord = texCoord;
+    vLayer = video.z;
+}
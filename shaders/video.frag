@@ -2,10 +2,52 @@
 in vec2 vTexCoord;
 out vec4 FragColor;
 
-uniform sampler2D tex;
+uniform sampler2D tex;     // RGB 纹理，或 YUV 模式下的 Y 平面
+uniform sampler2D texU;    // U 平面（NV12 时为交错的 UV 平面）
+uniform sampler2D texV;    // V 平面
 uniform vec2 videoSize;
 uniform vec2 widgetSize;
 
+uniform int inputFormat;   // 0: RGB, 1: YUV420P, 2: NV12
+uniform int colorMatrix;   // 0: BT.601, 1: BT.709
+uniform int fullRange;     // 0: 有限范围 (16-235), 1: 全范围
+
+vec3 yuvToRgb(float y, float u, float v) {
+    if (fullRange == 1) {
+        u -= 0.5;
+        v -= 0.5;
+    } else {
+        y = (y - 16.0 / 255.0) * (255.0 / 219.0);
+        u = (u - 128.0 / 255.0) * (255.0 / 224.0);
+        v = (v - 128.0 / 255.0) * (255.0 / 224.0);
+    }
+
+    vec3 rgb;
+    if (colorMatrix == 1) {
+        rgb = vec3(y + 1.5748 * v,
+                   y - 0.187324 * u - 0.468124 * v,
+                   y + 1.8556 * u);
+    } else {
+        rgb = vec3(y + 1.402 * v,
+                   y - 0.344136 * u - 0.714136 * v,
+                   y + 1.772 * u);
+    }
+    return clamp(rgb, 0.0, 1.0);
+}
+
+vec4 sampleVideo(vec2 uv) {
+    if (inputFormat == 0)
+        return texture(tex, uv);
+
+    float y = texture(tex, uv).r;
+    vec2 chroma;
+    if (inputFormat == 2)
+        chroma = texture(texU, uv).rg;
+    else
+        chroma = vec2(texture(texU, uv).r, texture(texV, uv).r);
+    return vec4(yuvToRgb(y, chroma.x, chroma.y), 1.0);
+}
+
 void main() {
     float videoAspect = videoSize.x / videoSize.y;
     float widgetAspect = widgetSize.x / widgetSize.y;
@@ -23,5 +65,5 @@ void main() {
     if (uv.x < 0.0 || uv.x > 1.0 || uv.y < 0.0 || uv.y > 1.0)
         FragColor = vec4(0, 0, 0, 1);
     else
-        FragColor = texture(tex, uv);
+        FragColor = sampleVideo(uv);
 }